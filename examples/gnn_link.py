@@ -4,9 +4,10 @@ import json
 import os
 import warnings
 from pathlib import Path
-from typing import Dict, Tuple
+from typing import Dict, List, Tuple
 
 import numpy as np
+import pandas as pd
 import torch
 import torch.nn.functional as F
 from model import Model
@@ -22,6 +23,8 @@ from relbench.base import Dataset, RecommendationTask, TaskType
 from relbench.datasets import get_dataset
 from relbench.modeling.graph import get_link_train_table_input, make_pkey_fkey_graph
 from relbench.modeling.loader import LinkNeighborLoader
+from relbench.modeling.metrics import evaluate_link_prediction
+from relbench.modeling.text_embedder import CachedTextEmbedder
 from relbench.modeling.utils import get_stype_proposal
 from relbench.tasks import get_task
 
@@ -83,9 +86,16 @@ data, col_stats_dict = make_pkey_fkey_graph(
     dataset.get_db(),
     col_to_stype_dict=col_to_stype_dict,
     text_embedder_cfg=TextEmbedderConfig(
-        text_embedder=GloveTextEmbedding(device='cpu'), batch_size=256
+        text_embedder=CachedTextEmbedder(
+            GloveTextEmbedding(device='cpu'),
+            cache_dir=f"{args.cache_dir}/text_embeddings",
+            name="glove.6B.300d",
+            batch_size=256,
+        ),
+        batch_size=None,
     ),
     cache_dir=f"{args.cache_dir}/{args.dataset}/materialized",
+    num_workers=args.num_workers,
 )
 
 num_neighbors = [int(args.num_neighbors // 2**i) for i in range(args.num_layers)]# 每层采样的邻居数量指数递减
@@ -107,37 +117,46 @@ train_loader = LinkNeighborLoader(
     num_workers=args.num_workers,
 )
 
-eval_loaders_dict: Dict[str, Tuple[NeighborLoader, NeighborLoader]] = {}
+# For every split, one (src_loader, dst_loader, row_index) triple per evaluation
+# time window, so that dst embeddings are computed once per cutoff.
+eval_loaders_dict: Dict[
+    str, List[Tuple[NeighborLoader, NeighborLoader, np.ndarray]]
+] = {}
 for split in ["val", "test"]:# 定义验证集和测试集的邻居采样器
-    timestamp = dataset.val_timestamp if split == "val" else dataset.test_timestamp
-    seed_time = int(timestamp.timestamp())
     target_table = task.get_table(split)
-    src_node_indices = torch.from_numpy(target_table.df[task.src_entity_col].values)
-    src_loader = NeighborLoader(
-        data,
-        num_neighbors=num_neighbors,
-        time_attr="time",
-        input_nodes=(task.src_entity_table, src_node_indices),
-        input_time=torch.full(
-            size=(len(src_node_indices),), fill_value=seed_time, dtype=torch.long
-        ),
-        batch_size=args.batch_size,
-        shuffle=False,
-        num_workers=args.num_workers,
-    )
-    dst_loader = NeighborLoader(
-        data,
-        num_neighbors=num_neighbors,
-        time_attr="time",
-        input_nodes=task.dst_entity_table,
-        input_time=torch.full(
-            size=(task.num_dst_nodes,), fill_value=seed_time, dtype=torch.long
-        ),
-        batch_size=args.batch_size,
-        shuffle=False,
-        num_workers=args.num_workers,
-    )
-    eval_loaders_dict[split] = (src_loader, dst_loader)
+    timestamps = target_table.df[task.time_col].to_numpy()
+    eval_loaders_dict[split] = []
+    for timestamp in np.unique(timestamps):
+        row_index = np.flatnonzero(timestamps == timestamp)
+        seed_time = int(pd.Timestamp(timestamp).timestamp())
+        src_node_indices = torch.from_numpy(
+            target_table.df[task.src_entity_col].values[row_index]
+        )
+        src_loader = NeighborLoader(
+            data,
+            num_neighbors=num_neighbors,
+            time_attr="time",
+            input_nodes=(task.src_entity_table, src_node_indices),
+            input_time=torch.full(
+                size=(len(src_node_indices),), fill_value=seed_time, dtype=torch.long
+            ),
+            batch_size=args.batch_size,
+            shuffle=False,
+            num_workers=args.num_workers,
+        )
+        dst_loader = NeighborLoader(
+            data,
+            num_neighbors=num_neighbors,
+            time_attr="time",
+            input_nodes=task.dst_entity_table,
+            input_time=torch.full(
+                size=(task.num_dst_nodes,), fill_value=seed_time, dtype=torch.long
+            ),
+            batch_size=args.batch_size,
+            shuffle=False,
+            num_workers=args.num_workers,
+        )
+        eval_loaders_dict[split].append((src_loader, dst_loader, row_index))
 
 model = Model(
     data=data,
@@ -205,24 +224,31 @@ def train() -> float:
 
 
 @torch.no_grad()
-def test(src_loader: NeighborLoader, dst_loader: NeighborLoader) -> np.ndarray:
+def test(
+    loaders: List[Tuple[NeighborLoader, NeighborLoader, np.ndarray]]
+) -> Tensor:
     model.eval()
 
-    dst_embs: list[Tensor] = []
-    for batch in tqdm(dst_loader):
-        batch = batch.to(device)
-        emb = model(batch, task.dst_entity_table).detach()
-        dst_embs.append(emb)
-    dst_emb = torch.cat(dst_embs, dim=0)
-    del dst_embs
-
-    pred_index_mat_list: list[Tensor] = []
-    for batch in tqdm(src_loader):
-        batch = batch.to(device)
-        emb = model(batch, task.src_entity_table)
-        _, pred_index_mat = torch.topk(emb @ dst_emb.t(), k=task.eval_k, dim=1)
-        pred_index_mat_list.append(pred_index_mat.cpu())
-    pred = torch.cat(pred_index_mat_list, dim=0).numpy()
+    num_rows = sum(len(row_index) for _, _, row_index in loaders)
+    pred = torch.zeros((num_rows, task.eval_k), dtype=torch.long, device=device)
+    for src_loader, dst_loader, row_index in loaders:
+        dst_embs: list[Tensor] = []
+        for batch in tqdm(dst_loader):
+            batch = batch.to(device)
+            emb = model(batch, task.dst_entity_table).detach()
+            dst_embs.append(emb)
+        dst_emb = torch.cat(dst_embs, dim=0)
+        del dst_embs
+
+        pred_index_mat_list: list[Tensor] = []
+        for batch in tqdm(src_loader):
+            batch = batch.to(device)
+            emb = model(batch, task.src_entity_table)
+            _, pred_index_mat = torch.topk(emb @ dst_emb.t(), k=task.eval_k, dim=1)
+            pred_index_mat_list.append(pred_index_mat)
+        pred[torch.from_numpy(row_index).to(device)] = torch.cat(
+            pred_index_mat_list, dim=0
+        )
     return pred
 
 
@@ -231,8 +257,8 @@ best_val_metric = 0
 for epoch in range(1, args.epochs + 1):
     train_loss = train()
     if epoch % args.eval_epochs_interval == 0:
-        val_pred = test(*eval_loaders_dict["val"])
-        val_metrics = task.evaluate(val_pred, task.get_table("val"))
+        val_pred = test(eval_loaders_dict["val"])
+        val_metrics = evaluate_link_prediction(task, val_pred, task.get_table("val"))
         print(
             f"Epoch: {epoch:02d}, Train loss: {train_loss}, "
             f"Val metrics: {val_metrics}"
@@ -244,10 +270,10 @@ for epoch in range(1, args.epochs + 1):
 
 
 model.load_state_dict(state_dict)
-val_pred = test(*eval_loaders_dict["val"])
-val_metrics = task.evaluate(val_pred, task.get_table("val"))
+val_pred = test(eval_loaders_dict["val"])
+val_metrics = evaluate_link_prediction(task, val_pred, task.get_table("val"))
 print(f"Best Val metrics: {val_metrics}")
 
-test_pred = test(*eval_loaders_dict["test"])
-test_metrics = task.evaluate(test_pred)
+test_pred = test(eval_loaders_dict["test"])
+test_metrics = evaluate_link_prediction(task, test_pred)
 print(f"Best test metrics: {test_metrics}")
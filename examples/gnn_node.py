@@ -20,6 +20,7 @@ from tqdm import tqdm
 from relbench.base import Dataset, EntityTask, TaskType
 from relbench.datasets import get_dataset
 from relbench.modeling.graph import get_node_train_table_input, make_pkey_fkey_graph
+from relbench.modeling.text_embedder import CachedTextEmbedder
 from relbench.modeling.utils import get_stype_proposal
 from relbench.tasks import get_task
 
@@ -71,9 +72,16 @@ data, col_stats_dict = make_pkey_fkey_graph(
     dataset.get_db(),
     col_to_stype_dict=col_to_stype_dict,
     text_embedder_cfg=TextEmbedderConfig(
-        text_embedder=GloveTextEmbedding(device='cpu'), batch_size=256
+        text_embedder=CachedTextEmbedder(
+            GloveTextEmbedding(device='cpu'),
+            cache_dir=f"{args.cache_dir}/text_embeddings",
+            name="glove.6B.300d",
+            batch_size=256,
+        ),
+        batch_size=None,
     ),
     cache_dir=f"{args.cache_dir}/{args.dataset}/materialized",
+    num_workers=args.num_workers,
 )
 
 clamp_min, clamp_max = None, None
@@ -6,7 +6,6 @@ import warnings
 from pathlib import Path
 from typing import Dict, Tuple
 
-import numpy as np
 import torch
 import torch.nn.functional as F
 from model import Model
@@ -23,6 +22,8 @@ from relbench.base import Dataset, RecommendationTask, TaskType
 from relbench.datasets import get_dataset
 from relbench.modeling.graph import get_link_train_table_input, make_pkey_fkey_graph
 from relbench.modeling.loader import SparseTensor
+from relbench.modeling.metrics import evaluate_link_prediction
+from relbench.modeling.text_embedder import CachedTextEmbedder
 from relbench.modeling.utils import get_stype_proposal
 from relbench.tasks import get_task
 
@@ -74,9 +75,16 @@ data, col_stats_dict = make_pkey_fkey_graph(
     dataset.get_db(),
     col_to_stype_dict=col_to_stype_dict,
     text_embedder_cfg=TextEmbedderConfig(
-        text_embedder=GloveTextEmbedding(device='cpu'), batch_size=256
+        text_embedder=CachedTextEmbedder(
+            GloveTextEmbedding(device='cpu'),
+            cache_dir=f"{args.cache_dir}/text_embeddings",
+            name="glove.6B.300d",
+            batch_size=256,
+        ),
+        batch_size=None,
     ),
     cache_dir=f"{args.cache_dir}/{args.dataset}/materialized",
+    num_workers=args.num_workers,
 )
 
 num_neighbors = [int(args.num_neighbors // 2**i) for i in range(args.num_layers)]
@@ -167,7 +175,7 @@ def train() -> float:
 
 
 @torch.no_grad()
-def test(loader: NeighborLoader) -> np.ndarray:
+def test(loader: NeighborLoader) -> Tensor:
     model.eval()
 
     pred_list: list[Tensor] = []
@@ -187,7 +195,7 @@ def test(loader: NeighborLoader) -> np.ndarray:
         ] = torch.sigmoid(out)
         _, pred_mini = torch.topk(scores, k=task.eval_k, dim=1)
         pred_list.append(pred_mini)
-    pred = torch.cat(pred_list, dim=0).cpu().numpy()
+    pred = torch.cat(pred_list, dim=0)
     return pred
 
 
@@ -197,7 +205,7 @@ for epoch in range(1, args.epochs + 1):
     train_loss = train()
     if epoch % args.eval_epochs_interval == 0:
         val_pred = test(loader_dict["val"])
-        val_metrics = task.evaluate(val_pred, task.get_table("val"))
+        val_metrics = evaluate_link_prediction(task, val_pred, task.get_table("val"))
         print(
             f"Epoch: {epoch:02d}, Train loss: {train_loss}, "
             f"Val metrics: {val_metrics}"
@@ -210,9 +218,9 @@ for epoch in range(1, args.epochs + 1):
 
 model.load_state_dict(state_dict)
 val_pred = test(loader_dict["val"])
-val_metrics = task.evaluate(val_pred, task.get_table("val"))
+val_metrics = evaluate_link_prediction(task, val_pred, task.get_table("val"))
 print(f"Best Val metrics: {val_metrics}")
 
 test_pred = test(loader_dict["test"])
-test_metrics = task.evaluate(test_pred)
+test_metrics = evaluate_link_prediction(task, test_pred)
 print(f"Best test metrics: {test_metrics}")
@@ -1,16 +1,28 @@
+from .activity import ActivityBitmap
+from .cache import CacheManager, cache_manager
 from .database import Database
 from .dataset import Dataset
+from .prediction import evaluate_predictions, read_predictions, save_predictions
+from .query import get_connection, run_query
 from .table import Table
 from .task_base import BaseTask, TaskType
 from .task_entity import EntityTask
 from .task_recommendation import RecommendationTask
 
 __all__ = [
+    "ActivityBitmap",
+    "CacheManager",
+    "cache_manager",
     "Database",
     "Dataset",
+    "get_connection",
+    "run_query",
     "Table",
     "BaseTask",
     "TaskType",
     "RecommendationTask",
     "EntityTask",
+    "save_predictions",
+    "read_predictions",
+    "evaluate_predictions",
 ]
@@ -0,0 +1,135 @@
+from typing import Optional, Union
+
+import numpy as np
+import pandas as pd
+from numpy.typing import NDArray
+from typing_extensions import Self
+
+from .table import Table
+
+
+class ActivityBitmap:
+    r"""A packed entity x time window activity bitmap.
+
+    Time is divided into windows of length `granularity` aligned with `anchor`,
+    where window `i` covers (anchor + i * granularity, anchor + (i + 1) *
+    granularity]. Bit `(i, e)` is set if entity `e` has at least one row in
+    window `i`. Bits are stored window-major and packed eight entities per byte,
+    so that the active entities at a cutoff are obtained by OR-ing a few rows.
+
+    Args:
+        bits: The packed bitmap of shape [num_windows, ceil(num_entities / 8)].
+        num_entities: The number of entities.
+        anchor: A window boundary.
+        granularity: The length of a window.
+        offset: The index of the first stored window.
+    """
+
+    def __init__(
+        self,
+        bits: NDArray[np.uint8],
+        num_entities: int,
+        anchor: pd.Timestamp,
+        granularity: pd.Timedelta,
+        offset: int,
+    ) -> None:
+        self.bits = bits
+        self.num_entities = num_entities
+        self.anchor = pd.Timestamp(anchor)
+        self.granularity = pd.Timedelta(granularity)
+        self.offset = offset
+
+    def __repr__(self) -> str:
+        return (
+            f"{self.__class__.__name__}(num_entities={self.num_entities}, "
+            f"num_windows={self.num_windows}, granularity={self.granularity})"
+        )
+
+    @property
+    def num_windows(self) -> int:
+        return len(self.bits)
+
+    @property
+    def nbytes(self) -> int:
+        return self.bits.nbytes
+
+    @classmethod
+    def from_table(
+        cls,
+        table: Table,
+        entity_col: str,
+        num_entities: int,
+        granularity: Union[str, pd.Timedelta],
+        anchor: Union[str, pd.Timestamp],
+    ) -> Self:
+        r"""Build the bitmap of an event table, where entities are given by
+        `entity_col` and times by the time column of the table."""
+
+        if table.time_col is None:
+            raise ValueError("The table has no time column.")
+        anchor = pd.Timestamp(anchor)
+        granularity = pd.Timedelta(granularity)
+
+        df = table.df[[entity_col, table.time_col]].dropna()
+        entity = df[entity_col].to_numpy().astype(np.int64)
+        # window index i such that time is in (anchor + i * g, anchor + (i + 1) * g]
+        # (the time column may be in any unit, granularity.value is in ns)
+        delta = (df[table.time_col] - anchor).to_numpy()
+        delta = delta.astype("timedelta64[ns]").astype(np.int64)
+        window = -((-delta) // granularity.value) - 1
+
+        # ignore invalid (e.g. dangling) entity ids
+        mask = (entity >= 0) & (entity < num_entities)
+        entity, window = entity[mask], window[mask]
+
+        offset = int(window.min()) if len(window) > 0 else 0
+        num_windows = int(window.max()) - offset + 1 if len(window) > 0 else 0
+        bits = np.zeros((num_windows, (num_entities + 7) // 8), dtype=np.uint8)
+
+        # set bits in packed form (big bit order, as in np.packbits)
+        key = np.unique((window - offset) * num_entities + entity)
+        window, entity = np.divmod(key, num_entities)
+        np.bitwise_or.at(
+            bits,
+            (window, entity >> 3),
+            (np.uint8(128) >> (entity & 7)).astype(np.uint8),
+        )
+
+        return cls(bits, num_entities, anchor, granularity, offset)
+
+    def is_boundary(self, timestamp: Union[str, pd.Timestamp]) -> bool:
+        r"""Return whether timestamp is a window boundary."""
+        return (pd.Timestamp(timestamp) - self.anchor) % self.granularity == (
+            pd.Timedelta(0)
+        )
+
+    def active_at(
+        self,
+        timestamp: Union[str, pd.Timestamp],
+        lookback: int = 1,
+    ) -> NDArray[np.int64]:
+        r"""Return the sorted ids of entities with activity in the `lookback`
+        windows before timestamp, i.e. in (timestamp - lookback * granularity,
+        timestamp].
+
+        Args:
+            timestamp: The cutoff, which needs to be a window boundary.
+            lookback: The number of windows to look back.
+        """
+
+        if not self.is_boundary(timestamp):
+            raise ValueError(
+                f"The timestamp {timestamp} is not a window boundary (anchor: "
+                f"{self.anchor}, granularity: {self.granularity})."
+            )
+
+        end = (pd.Timestamp(timestamp) - self.anchor) // self.granularity
+        start = max(end - lookback - self.offset, 0)
+        end = min(max(end - self.offset, 0), self.num_windows)
+        active = np.bitwise_or.reduce(
+            self.bits[start:end],
+            axis=0,
+            initial=0,
+        )
+        active = np.unpackbits(active, count=self.num_entities)
+        return np.flatnonzero(active)
@@ -0,0 +1,165 @@
+import sys
+import threading
+import warnings
+from collections import OrderedDict
+from typing import Any, Hashable, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from .database import Database
+from .table import Table
+
+_MISSING = object()
+
+
+def sizeof(value: Any) -> int:
+    r"""Return the approximate memory footprint of a cached value in bytes."""
+
+    if isinstance(value, Database):
+        return sum(sizeof(table) for table in value.table_dict.values())
+    if isinstance(value, Table):
+        return sizeof(value.df)
+    if isinstance(value, pd.Series):
+        value = value.to_frame()
+    if isinstance(value, pd.DataFrame):
+        return _frame_size(value)
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    return sys.getsizeof(value)
+
+
+def _frame_size(df: pd.DataFrame, sample_size: int = 1000) -> int:
+    r"""Estimate the memory footprint of a data frame, sampling at most
+    `sample_size` cells of each object column instead of walking all of them."""
+
+    nbytes = int(df.memory_usage(deep=False, index=True).sum())
+    for i in np.flatnonzero((df.dtypes == object).to_numpy()):
+        ser = df.iloc[:, i]
+        if len(ser) > 0:
+            sample = ser.iloc[:: max(1, len(ser) // sample_size)]
+            nbytes += int(np.mean([sys.getsizeof(v) for v in sample]) * len(ser))
+    return nbytes
+
+
+class CacheManager:
+    r"""An in-memory LRU cache with byte-size accounting.
+
+    Entries are keyed by tuples. By convention, the first element of the key is
+    the owner of the entry (e.g. a task or dataset object, or a registry name), so
+    that :meth:`release` can drop everything belonging to an owner at once.
+
+    Args:
+        max_bytes: Upper bound on the total size of cached values. Least recently
+            used entries are evicted once it is exceeded. The most recently put
+            entry is kept even if it exceeds max_bytes on its own, so that e.g. a
+            database larger than the bound is not reloaded on every access. If
+            None, the cache is unbounded.
+        max_entries: Upper bound on the number of cached entries. If None, the
+            number of entries is unbounded.
+    """
+
+    def __init__(
+        self,
+        max_bytes: Optional[int] = None,
+        max_entries: Optional[int] = None,
+    ) -> None:
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Tuple[Hashable, ...], Tuple[Any, int]]" = (
+            OrderedDict()
+        )
+        self._nbytes = 0
+        self._lock = threading.RLock()
+        self._warned_oversize = False
+
+    def __repr__(self) -> str:
+        return (
+            f"{self.__class__.__name__}(num_entries={len(self)}, "
+            f"nbytes={self.nbytes}, max_bytes={self.max_bytes}, "
+            f"max_entries={self.max_entries})"
+        )
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: Tuple[Hashable, ...]) -> bool:
+        return key in self._entries
+
+    @property
+    def nbytes(self) -> int:
+        r"""Return the total size of all cached values in bytes."""
+        return self._nbytes
+
+    def get(self, key: Tuple[Hashable, ...], default: Any = None) -> Any:
+        r"""Return the value cached under key and mark it as recently used."""
+
+        with self._lock:
+            entry = self._entries.get(key, _MISSING)
+            if entry is _MISSING:
+                return default
+            self._entries.move_to_end(key)
+            return entry[0]
+
+    def put(
+        self,
+        key: Tuple[Hashable, ...],
+        value: Any,
+        nbytes: Optional[int] = None,
+    ) -> None:
+        r"""Cache value under key and evict least recently used entries if needed.
+
+        A value larger than `max_bytes` on its own evicts all other entries, and
+        is kept until the next put.
+        """
+
+        if nbytes is None:
+            nbytes = sizeof(value)
+
+        with self._lock:
+            self._pop(key)
+            if (
+                self.max_bytes is not None
+                and nbytes > self.max_bytes
+                and not self._warned_oversize
+            ):
+                self._warned_oversize = True
+                warnings.warn(
+                    f"Caching a value of {nbytes} bytes, which exceeds max_bytes "
+                    f"({self.max_bytes}), by evicting all other entries. Increase "
+                    f"max_bytes to keep more than one such value in memory."
+                )
+            self._entries[key] = (value, nbytes)
+            self._nbytes += nbytes
+            self._evict()
+
+    def release(self, *prefix: Hashable) -> int:
+        r"""Drop all entries whose key starts with prefix.
+
+        Calling without arguments clears the whole cache. Returns the number of
+        released bytes.
+        """
+
+        with self._lock:
+            keys = [key for key in self._entries if key[: len(prefix)] == prefix]
+            return sum(self._pop(key) for key in keys)
+
+    def _pop(self, key: Tuple[Hashable, ...]) -> int:
+        entry = self._entries.pop(key, _MISSING)
+        if entry is _MISSING:
+            return 0
+        self._nbytes -= entry[1]
+        return entry[1]
+
+    def _evict(self) -> None:
+        # the most recently put entry is never evicted
+        while len(self._entries) > 1 and (
+            (self.max_bytes is not None and self._nbytes > self.max_bytes)
+            or (self.max_entries is not None and len(self._entries) > self.max_entries)
+        ):
+            self._pop(next(iter(self._entries)))
+
+
+# The cache shared by datasets, tasks and the registries. Unbounded by default,
+# set `cache_manager.max_bytes` to bound the memory used by long-running processes.
+cache_manager = CacheManager()
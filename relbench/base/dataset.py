@@ -1,11 +1,15 @@
+import json
 import time
-from functools import lru_cache
+from functools import cached_property
 from pathlib import Path
-from typing import Optional
+from typing import Dict, List, Optional, Union
 
 import numpy as np
 import pandas as pd
+import pyarrow.parquet as pq
 
+from .activity import ActivityBitmap
+from .cache import cache_manager
 from .database import Database
 
 
@@ -68,11 +72,11 @@ class Dataset:
                 if mask.any():
                     table.df.loc[mask, fkey_col] = None
 
-    @lru_cache(maxsize=None)
     def get_db(self, upto_test_timestamp=True) -> Database:
         r"""Return the database object.
 
-        The returned database object is cached in memory.
+        The returned database object is cached in memory by :obj:`cache_manager`.
+        Use :meth:`release` to free it.
 
         Args:
             upto_test_timestamp: If True, only return rows upto test_timestamp.
@@ -83,6 +87,14 @@ class Dataset:
         `upto_test_timestamp` is True by default to prevent test leakage.
         """
 
+        db = cache_manager.get((self, "db", upto_test_timestamp))
+        if db is None:
+            db = self._load_or_make_db(upto_test_timestamp)
+            cache_manager.put((self, "db", upto_test_timestamp), db)
+
+        return db
+
+    def _load_or_make_db(self, upto_test_timestamp: bool) -> Database:
         db_path = f"{self.cache_dir}/db"
         if self.cache_dir and Path(db_path).exists() and any(Path(db_path).iterdir()):
             print(f"Loading Database object from {db_path}...")
@@ -117,6 +129,139 @@ class Dataset:
 
         return db
 
+    @cached_property
+    def num_entities(self) -> Dict[str, int]:
+        r"""Return the number of rows of every table in :meth:`get_db`, i.e. upto
+        test_timestamp.
+
+        Counts are taken from the cached database if it is in memory, otherwise from
+        `num_entities.json` in cache_dir if it was written for the current parquet
+        files of the cached database (same sizes and modification times) and
+        test_timestamp, otherwise from these parquet files (reading only time
+        columns). The database is loaded only if none of these are available.
+        Counts are written to `num_entities.json`, so that evaluation processes
+        never need to load the database.
+        """
+
+        meta_path = Path(f"{self.cache_dir}/num_entities.json")
+        db_path = Path(f"{self.cache_dir}/db")
+        db_files = self._db_files()
+
+        db = cache_manager.get((self, "db", True))
+        if db is not None:
+            num_entities = {name: len(table) for name, table in db.table_dict.items()}
+        elif (
+            self.cache_dir
+            and meta_path.exists()
+            and self._is_valid_meta(meta_path, db_files)
+        ):
+            with open(meta_path, "r") as f:
+                return json.load(f)["num_entities"]
+        elif db_files:
+            num_entities = {
+                table_path.stem: self._count_rows(table_path)
+                for table_path in db_path.glob("*.parquet")
+            }
+        else:
+            db = self.get_db()
+            num_entities = {name: len(table) for name, table in db.table_dict.items()}
+            db_files = self._db_files()
+
+        if self.cache_dir:
+            meta = {
+                "test_timestamp": str(self.test_timestamp),
+                "db_files": db_files,
+                "num_entities": num_entities,
+            }
+            meta_path.parent.mkdir(parents=True, exist_ok=True)
+            with open(meta_path, "w") as f:
+                json.dump(meta, f, indent=2)
+
+        return num_entities
+
+    def _db_files(self) -> Dict[str, List[int]]:
+        r"""Return the size and modification time of each parquet file of the
+        cached database."""
+
+        if not self.cache_dir:
+            return {}
+        return {
+            path.name: [path.stat().st_size, path.stat().st_mtime_ns]
+            for path in sorted(Path(f"{self.cache_dir}/db").glob("*.parquet"))
+        }
+
+    def _is_valid_meta(self, meta_path: Path, db_files: Dict[str, List[int]]) -> bool:
+        with open(meta_path, "r") as f:
+            meta = json.load(f)
+        return (
+            meta.get("test_timestamp") == str(self.test_timestamp)
+            and meta.get("db_files") == db_files
+        )
+
+    def _count_rows(self, path: Path) -> int:
+        r"""Count the rows of a cached table upto test_timestamp without loading
+        the table."""
+
+        parquet_file = pq.ParquetFile(path)
+        time_col = json.loads(parquet_file.schema_arrow.metadata[b"time_col"])
+        if time_col is None:
+            return parquet_file.metadata.num_rows
+
+        ser = parquet_file.read(columns=[time_col]).column(time_col).to_pandas()
+        return int((ser <= self.test_timestamp).sum())
+
+    def get_activity_bitmap(
+        self,
+        table_name: str,
+        entity_col: str,
+        granularity: Union[str, pd.Timedelta],
+        anchor: Optional[Union[str, pd.Timestamp]] = None,
+        upto_test_timestamp: bool = True,
+    ) -> ActivityBitmap:
+        r"""Return the entity x time window activity bitmap of a table.
+
+        Args:
+            table_name: The table whose rows count as activity.
+            entity_col: The foreign key column holding the entities.
+            granularity: The length of a time window.
+            anchor: A window boundary. If None, use val_timestamp, so that the
+                cutoffs of tasks with timedelta equal to (a multiple of)
+                granularity are window boundaries.
+            upto_test_timestamp: Passed to :meth:`get_db`.
+
+        The bitmap is built once and cached in memory by :obj:`cache_manager`.
+        """
+
+        granularity = pd.Timedelta(granularity)
+        anchor = self.val_timestamp if anchor is None else pd.Timestamp(anchor)
+        key = (
+            self,
+            "activity",
+            table_name,
+            entity_col,
+            granularity,
+            anchor,
+            upto_test_timestamp,
+        )
+
+        bitmap = cache_manager.get(key)
+        if bitmap is None:
+            db = self.get_db(upto_test_timestamp)
+            table = db.table_dict[table_name]
+            num_entities = len(db.table_dict[table.fkey_col_to_pkey_table[entity_col]])
+            bitmap = ActivityBitmap.from_table(
+                table, entity_col, num_entities, granularity, anchor
+            )
+            cache_manager.put(key, bitmap, nbytes=bitmap.nbytes)
+
+        return bitmap
+
+    def release(self) -> None:
+        r"""Release all database objects (and activity bitmaps) of this dataset
+        cached in memory."""
+
+        cache_manager.release(self)
+
     def make_db(self) -> Database:
         r"""Make the database object from scratch, i.e. using raw data sources.
 
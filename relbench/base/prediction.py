@@ -0,0 +1,190 @@
+import os
+from typing import Callable, Dict, Iterator, List, Optional, Tuple, Union
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from numpy.typing import NDArray
+
+from .table import Table
+from .task_base import BaseTask
+from .task_entity import EntityTask
+from .task_recommendation import RecommendationTask
+
+PRED_COL = "pred"
+r"""The prediction column of a prediction file."""
+
+
+def _key_cols(task: BaseTask) -> List[str]:
+    r"""Return the columns identifying a row of the task table."""
+
+    if isinstance(task, EntityTask):
+        return [task.entity_col, task.time_col]
+    elif isinstance(task, RecommendationTask):
+        return [task.src_entity_col, task.time_col]
+    raise ValueError(f"Unsupported task {task}")
+
+
+def save_predictions(
+    task: BaseTask,
+    pred: NDArray,
+    path: Union[str, os.PathLike],
+    target_table: Optional[Table] = None,
+) -> None:
+    r"""Save predictions to a parquet prediction file.
+
+    A prediction file holds the key columns of the task table (the entity or
+    source entity column and the time column) and the prediction column `pred`.
+    Predictions of size (num_rows, ) are stored as floats, predictions of size
+    (num_rows, d) (class scores or top-k destination entities) as fixed size
+    lists. Rows may be in any order, see :func:`read_predictions`.
+
+    Args:
+        task: The task.
+        pred: Predictions, as passed to :meth:`BaseTask.evaluate`.
+        path: The path of the parquet file.
+        target_table: The table the predictions are made for. If None, use the
+            test table.
+    """
+    assert str(path).endswith(".parquet")
+
+    if target_table is None:
+        target_table = task.get_table("test")
+
+    pred = np.asarray(pred)
+    if len(pred) != len(target_table):
+        raise ValueError(
+            f"The length of pred and target_table must be the same (got "
+            f"{len(pred)} and {len(target_table)}, respectively)."
+        )
+
+    table = pa.Table.from_pandas(target_table.df[_key_cols(task)], preserve_index=False)
+    if pred.ndim == 1:
+        pred_array = pa.array(pred)
+    else:
+        pred_array = pa.FixedSizeListArray.from_arrays(
+            pa.array(pred.reshape(-1)), pred.shape[1]
+        )
+    table = table.append_column(PRED_COL, pred_array)
+    pq.write_table(table, path)
+
+
+def _iter_predictions(
+    path: Union[str, os.PathLike], key_cols: List[str], batch_size: int
+) -> Iterator[Tuple[pd.DataFrame, NDArray]]:
+    r"""Iterate over the keys and predictions of a prediction file in batches."""
+
+    parquet_file = pq.ParquetFile(path)
+    for batch in parquet_file.iter_batches(
+        batch_size=batch_size, columns=key_cols + [PRED_COL]
+    ):
+        keys = pa.Table.from_batches([batch]).select(key_cols).to_pandas()
+        column = batch.column(PRED_COL)
+        if pa.types.is_fixed_size_list(column.type):
+            pred = column.flatten().to_numpy().reshape(len(column), -1)
+        else:
+            pred = column.to_numpy()
+        yield keys, pred
+
+
+def _read_aligned_predictions(
+    path: Union[str, os.PathLike],
+    key_df: pd.DataFrame,
+    batch_size: int,
+) -> Optional[NDArray]:
+    r"""Read a prediction file whose rows are in the order of the target table,
+    as written by :func:`save_predictions`. Returns None if they are not."""
+
+    if pq.ParquetFile(path).metadata.num_rows != len(key_df):
+        return None
+
+    out: Optional[NDArray] = None
+    start = 0
+    for keys, pred in _iter_predictions(path, list(key_df.columns), batch_size):
+        expected = key_df.iloc[start : start + len(keys)]
+        for col in key_df.columns:
+            if not np.array_equal(keys[col].to_numpy(), expected[col].to_numpy()):
+                return None
+
+        if out is None:
+            out = np.empty((len(key_df),) + pred.shape[1:], dtype=pred.dtype)
+        out[start : start + len(keys)] = pred
+        start += len(keys)
+
+    return out
+
+
+def read_predictions(
+    task: BaseTask,
+    path: Union[str, os.PathLike],
+    target_table: Table,
+    batch_size: int = 1 << 16,
+) -> NDArray:
+    r"""Read a prediction file, aligned to the rows of a target table.
+
+    The file is read in batches of `batch_size` rows. If its rows are in the
+    order of the target table, predictions are aligned by position. Otherwise,
+    each batch is joined with the target table on the key columns, so that only
+    the aligned predictions are kept in memory, which requires the keys of the
+    target table to be unique.
+
+    Raises:
+        ValueError: If the file contains rows that are not in the target table,
+            duplicated rows, or does not cover all rows of the target table, or
+            if its rows are not in the order of a target table with duplicated
+            keys.
+    """
+
+    key_cols = _key_cols(task)
+    key_df = target_table.df[key_cols]
+    out = _read_aligned_predictions(path, key_df, batch_size)
+    if out is not None:
+        return out
+
+    index = pd.MultiIndex.from_frame(key_df)
+    if not index.is_unique:
+        raise ValueError(
+            f"The target table contains duplicated {tuple(key_cols)} keys, so "
+            f"the rows of {path} must be in the order of the target table."
+        )
+
+    filled = np.zeros(len(target_table), dtype=bool)
+    for keys, pred in _iter_predictions(path, key_cols, batch_size):
+        row_index = index.get_indexer(pd.MultiIndex.from_frame(keys))
+        if (row_index < 0).any():
+            raise ValueError(f"{path} contains rows that are not in the target table.")
+        if filled[row_index].any() or len(np.unique(row_index)) < len(row_index):
+            raise ValueError(f"{path} contains duplicated rows.")
+        filled[row_index] = True
+
+        if out is None:
+            out = np.empty((len(target_table),) + pred.shape[1:], dtype=pred.dtype)
+        out[row_index] = pred
+
+    if out is None or not filled.all():
+        raise ValueError(
+            f"{path} is missing predictions for {(~filled).sum()} rows of the "
+            f"target table."
+        )
+
+    return out
+
+
+def evaluate_predictions(
+    task: BaseTask,
+    path: Union[str, os.PathLike],
+    split: str = "test",
+    metrics: Optional[List[Callable[[NDArray, NDArray], float]]] = None,
+    batch_size: int = 1 << 16,
+    **kwargs,
+) -> Dict[str, float]:
+    r"""Evaluate a prediction file on a split of the task, see
+    :func:`read_predictions` and :meth:`BaseTask.evaluate`.
+
+    Additional keyword arguments are passed to :meth:`BaseTask.evaluate`.
+    """
+
+    target_table = task.get_table(split, mask_input_cols=False)
+    pred = read_predictions(task, path, target_table, batch_size)
+    return task.evaluate(pred, target_table, metrics, **kwargs)
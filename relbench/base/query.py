@@ -0,0 +1,153 @@
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional
+
+import duckdb
+import pandas as pd
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+_local = threading.local()
+
+
+def peak_memory() -> Optional[int]:
+    r"""Return the peak resident set size of the process in bytes, or None if it
+    is not available on this platform.
+
+    This is the high-water mark over the whole lifetime of the process, so it
+    never decreases. Use :func:`peak_memory_increase` to attribute memory to a
+    section of code.
+    """
+
+    if resource is None:
+        return None
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in kilobytes elsewhere
+    return maxrss if sys.platform == "darwin" else maxrss * 1024
+
+
+def peak_memory_increase(before: Optional[int]) -> Optional[int]:
+    r"""Return by how many bytes the peak resident set size of the process grew
+    since :func:`peak_memory` returned `before`.
+
+    This is a lower bound on the additional memory used in between: it is zero
+    if the memory use stayed below an earlier peak.
+    """
+
+    after = peak_memory()
+    if before is None or after is None:
+        return None
+    return after - before
+
+
+def get_connection() -> duckdb.DuckDBPyConnection:
+    r"""Return the persistent in-memory DuckDB connection of the current thread."""
+
+    con = getattr(_local, "con", None)
+    if con is None:
+        con = _local.con = duckdb.connect()
+    return con
+
+
+def run_query(
+    sql: str,
+    params: Optional[Dict[str, Any]] = None,
+    **tables: pd.DataFrame,
+) -> pd.DataFrame:
+    r"""Run a parameterized SQL query and return the result as a data frame.
+
+    Args:
+        sql: The query. Parameters are referenced by name, e.g. `$timedelta`.
+        params: The values bound to the query parameters.
+        **tables: Data frames to query, registered (without copying) as views
+            under their keyword names for the duration of the query.
+
+    Queries run on the persistent connection of :func:`get_connection`, so that
+    the SQL text is constant across calls and values are never interpolated
+    into it.
+    """
+
+    records = getattr(_local, "records", None)
+    if records is not None:
+        return _run_profiled_query(records, sql, params, tables)
+
+    con = get_connection()
+    for name, df in tables.items():
+        con.register(name, df)
+    try:
+        return con.execute(sql, params).df()
+    finally:
+        for name in tables:
+            con.unregister(name)
+
+
+@contextmanager
+def profile_queries() -> Iterator[List[Dict[str, Any]]]:
+    r"""Profile all :func:`run_query` calls of the current thread within the
+    context.
+
+    Yields a list which receives one record per query, holding the SQL, its
+    wall time in seconds, the number of rows of every input table and of the
+    output, the increase of the peak memory of the process during the query
+    (see :func:`peak_memory_increase`), and the analyzed query plan (as produced
+    by DuckDB's JSON profiler, i.e. the content of `EXPLAIN ANALYZE`).
+    """
+
+    prev_records = getattr(_local, "records", None)
+    records: List[Dict[str, Any]] = []
+    _local.records = records
+    try:
+        yield records
+    finally:
+        _local.records = prev_records
+
+
+def _run_profiled_query(
+    records: List[Dict[str, Any]],
+    sql: str,
+    params: Optional[Dict[str, Any]],
+    tables: Dict[str, pd.DataFrame],
+) -> pd.DataFrame:
+    con = get_connection()
+    fd, plan_path = tempfile.mkstemp(suffix=".json")
+    os.close(fd)
+    try:
+        for name, df in tables.items():
+            con.register(name, df)
+        try:
+            con.execute("PRAGMA enable_profiling='json'")
+            con.execute(f"PRAGMA profiling_output='{plan_path}'")
+            memory = peak_memory()
+            tic = time.perf_counter()
+            df = con.execute(sql, params).df()
+            toc = time.perf_counter()
+            memory = peak_memory_increase(memory)
+        finally:
+            con.execute("PRAGMA disable_profiling")
+            for name in tables:
+                con.unregister(name)
+
+        with open(plan_path, "r") as f:
+            plan = json.load(f)
+    finally:
+        os.remove(plan_path)
+
+    records.append(
+        {
+            "sql": sql,
+            "wall_time": toc - tic,
+            "rows_in": {name: len(table) for name, table in tables.items()},
+            "rows_out": len(df),
+            "peak_memory_increase": memory,
+            "plan": plan,
+        }
+    )
+    return df
@@ -1,6 +1,6 @@
 import json
 import os
-from functools import lru_cache
+from functools import cached_property
 from pathlib import Path
 from typing import Dict, Optional, Union
 
@@ -20,6 +20,11 @@ class Table:
             primary keys.
         pkey_col: The primary key column if it exists.
         time_col: The time column.
+
+    Foreign key columns may hold lists of keys (e.g., the destination entities of a
+    recommendation task). Such columns are stored as Arrow-backed list columns
+    (:class:`pd.ArrowDtype`), i.e., as offsets and values without per-row Python
+    objects, and are written to / read from parquet as native list columns.
     """
 
     def __init__(
@@ -53,6 +58,17 @@ class Table:
         Stores other attributes as parquet metadata.
         """
         assert str(path).endswith(".parquet")
+        table = self.to_arrow()
+
+        # Write the PyArrow Table to a Parquet file using pyarrow.parquet
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        pq.write_table(table, path)
+
+    def to_arrow(self) -> pa.Table:
+        r"""Convert the table to a PyArrow Table.
+
+        Stores other attributes as schema metadata, as read by :meth:`load`.
+        """
         metadata = {
             "fkey_col_to_pkey_table": self.fkey_col_to_pkey_table,
             "pkey_col": self.pkey_col,
@@ -67,14 +83,10 @@ class Table:
             key: json.dumps(value).encode("utf-8") for key, value in metadata.items()
         }
 
-        table = table.replace_schema_metadata(
+        return table.replace_schema_metadata(
             {**table.schema.metadata, **metadata_bytes}
         )
 
-        # Write the PyArrow Table to a Parquet file using pyarrow.parquet
-        Path(path).parent.mkdir(parents=True, exist_ok=True)
-        pq.write_table(table, path)
-
     @classmethod
     def load(cls, path: Union[str, os.PathLike]) -> Self:
         r"""Load a table from a parquet file."""
@@ -82,7 +94,6 @@ class Table:
 
         # Read the Parquet file using pyarrow
         table = pa.parquet.read_table(path)
-        df = table.to_pandas()
 
         # Extract metadata
         metadata_bytes = table.schema.metadata
@@ -91,6 +102,39 @@ class Table:
             for key, value in metadata_bytes.items()
             if key in [b"fkey_col_to_pkey_table", b"pkey_col", b"time_col"]
         }
+
+        # Keep list-valued foreign key columns in Arrow memory
+        list_cols = [
+            field.name
+            for field in table.schema
+            if field.name in metadata["fkey_col_to_pkey_table"]
+            and (pa.types.is_list(field.type) or pa.types.is_large_list(field.type))
+        ]
+        other = table.drop_columns(list_cols)
+        if list_cols and other.schema.pandas_metadata is not None:
+            # Drop the pandas metadata of list columns, as their ArrowDtype
+            # cannot be resolved by pyarrow
+            pandas_metadata = other.schema.pandas_metadata
+            pandas_metadata["columns"] = [
+                col
+                for col in pandas_metadata["columns"]
+                if col["name"] not in list_cols
+            ]
+            other = other.replace_schema_metadata(
+                {
+                    **other.schema.metadata,
+                    b"pandas": json.dumps(pandas_metadata).encode("utf-8"),
+                }
+            )
+        df = other.to_pandas()
+        for col in list_cols:
+            column = table[col]
+            if pa.types.is_large_list(column.type):
+                # pandas cannot explode large list columns
+                column = column.cast(pa.list_(column.type.value_type))
+            df[col] = pd.arrays.ArrowExtensionArray(column)
+        df = df[table.column_names]
+
         return cls(
             df=df,
             fkey_col_to_pkey_table=metadata["fkey_col_to_pkey_table"],
@@ -130,8 +174,7 @@ class Table:
             time_col=self.time_col,
         )
 
-    @property
-    @lru_cache(maxsize=None)
+    @cached_property
     def min_timestamp(self) -> pd.Timestamp:
         r"""Return the earliest time in the table."""
 
@@ -140,8 +183,7 @@ class Table:
 
         return self.df[self.time_col].min()
 
-    @property
-    @lru_cache(maxsize=None)
+    @cached_property
     def max_timestamp(self) -> pd.Timestamp:
         r"""Return the latest time in the table."""
 
@@ -1,14 +1,23 @@
+import json
+import os
 import time
+import weakref
+from contextlib import nullcontext
 from enum import Enum
-from functools import lru_cache
 from pathlib import Path
-from typing import Callable, List, Optional
+from typing import Any, Callable, Dict, Hashable, List, Optional, Sequence, Tuple, Union
 
+import numpy as np
 import pandas as pd
+import pyarrow.parquet as pq
 from numpy.typing import NDArray
 
+from ..metrics import grouped_metrics
+from .activity import ActivityBitmap
+from .cache import cache_manager
 from .database import Database
 from .dataset import Dataset
+from .query import peak_memory, peak_memory_increase, profile_queries
 from .table import Table
 
 
@@ -42,6 +51,31 @@ class BaseTask:
             (test_timestamp + (num_eval_timestamps - 1) * timedelta, test_timestamp
             + num_eval_timestamps * timedelta].
         metrics: The metrics to evaluate this task on.
+        num_windows_per_chunk: When writing task tables to cache_dir, labels are
+            generated for this many time windows at a time and streamed to the
+            parquet file, bounding peak memory by the chunk rather than the table
+            size. If None, all time windows are generated at once.
+        independent_windows: Whether the labels of a time window only depend on
+            that window. Tasks whose queries read other windows passed to
+            :meth:`make_table` (e.g. with window functions over the timestamps)
+            set it to False, so that all time windows are generated at once.
+        max_train_windows: The maximum number of training time windows. If None,
+            training windows span the whole database history.
+        train_window_sampling: How to choose max_train_windows training windows,
+            either "recent" (the most recent ones) or "uniform" (evenly spaced over
+            the whole history).
+        train_window_stride: Keep every k-th training window, counting from the
+            most recent one. Applied before max_train_windows.
+        profile: If True, making task tables records a report per split in
+            `profile_report` (and `profile.json` in cache_dir), with the wall
+            time, rows in / out, peak memory increase and analyzed plan of
+            every query (see :func:`relbench.base.query.peak_memory_increase`).
+
+    The training window policy is applied before labels are generated, so
+    discarded windows are never computed. For tasks without independent_windows,
+    labels are generated for all windows and then subsampled, so that the labels
+    of the kept windows are unchanged. Training tables cached in cache_dir are
+    named after the policy.
 
     Inherited by EntityTask and RecommendationTask.
     """
@@ -51,6 +85,12 @@ class BaseTask:
     timedelta: pd.Timedelta
     num_eval_timestamps: int = 1
     metrics: List[Callable[[NDArray, NDArray], float]]
+    num_windows_per_chunk: Optional[int] = 16
+    independent_windows: bool = True
+    max_train_windows: Optional[int] = None
+    train_window_sampling: str = "recent"
+    train_window_stride: int = 1
+    profile: bool = False
 
     def __init__(
         self,
@@ -68,6 +108,7 @@ class BaseTask:
         """
         self.dataset = dataset
         self.cache_dir = cache_dir
+        self.profile_report: Dict[str, Dict[str, Any]] = {}
 
         time_diff = self.dataset.test_timestamp - self.dataset.val_timestamp
         if time_diff < self.timedelta:
@@ -99,10 +140,8 @@ class BaseTask:
 
         raise NotImplementedError
 
-    def _get_table(self, split: str) -> Table:
-        r"""Helper function to get a table for a split."""
-
-        db = self.dataset.get_db(upto_test_timestamp=split != "test")
+    def _get_timestamps(self, split: str, db: Database) -> pd.DatetimeIndex:
+        r"""Helper function to get the timestamps of the time windows of a split."""
 
         if split == "train":
             start = self.dataset.val_timestamp - self.timedelta
@@ -149,12 +188,139 @@ class BaseTask:
                 f"({len(timestamps)} given)"
             )
 
+        if split == "train" and self.independent_windows:
+            timestamps = self._sample_train_timestamps(timestamps)
+
+        return timestamps
+
+    def _sample_train_timestamps(
+        self, timestamps: pd.DatetimeIndex
+    ) -> pd.DatetimeIndex:
+        r"""Helper function to apply the training window policy to training
+        timestamps, ordered from the most recent to the oldest."""
+
+        if self.train_window_stride < 1:
+            raise ValueError(
+                f"train_window_stride must be positive "
+                f"({self.train_window_stride} given)."
+            )
+        timestamps = timestamps[:: self.train_window_stride]
+
+        num_windows = self.max_train_windows
+        if num_windows is None or len(timestamps) <= num_windows:
+            return timestamps
+        if num_windows < 1:
+            raise ValueError(
+                f"max_train_windows must be positive ({num_windows} given)."
+            )
+
+        if self.train_window_sampling == "recent":
+            return timestamps[:num_windows]
+        elif self.train_window_sampling == "uniform":
+            index = np.linspace(0, len(timestamps) - 1, num_windows)
+            return timestamps[index.round().astype(int)]
+        else:
+            raise ValueError(
+                f"Unknown train_window_sampling "
+                f"'{self.train_window_sampling}' (expected 'recent' or 'uniform')."
+            )
+
+    def _get_table(self, split: str) -> Table:
+        r"""Helper function to get a table for a split."""
+
+        db = self.dataset.get_db(upto_test_timestamp=split != "test")
+        timestamps = self._get_timestamps(split, db)
+
         table = self.make_table(db, timestamps)
+        table = self._sample_train_rows(split, timestamps, table)
         table = self.filter_dangling_entities(table)
 
         return table
 
-    @lru_cache(maxsize=None)
+    def _sample_train_rows(
+        self, split: str, timestamps: pd.DatetimeIndex, table: Table
+    ) -> Table:
+        r"""Helper function to apply the training window policy to the rows of a
+        table generated for all training windows, for tasks without
+        independent_windows."""
+
+        if split != "train" or self.independent_windows:
+            return table
+
+        keep = self._sample_train_timestamps(timestamps)
+        if len(keep) < len(timestamps):
+            table.df = table.df[table.df[table.time_col].isin(keep)]
+            table.df = table.df.reset_index(drop=True)
+        return table
+
+    def _get_activity_bitmap(
+        self, db: Database, table_name: str, entity_col: str
+    ) -> Optional[ActivityBitmap]:
+        r"""Return the activity bitmap of a table of db, with windows of length
+        timedelta (see :meth:`Dataset.get_activity_bitmap`), or None if db is not
+        a database of the dataset cached by :meth:`Dataset.get_db`."""
+
+        for upto_test_timestamp in [True, False]:
+            if cache_manager.get((self.dataset, "db", upto_test_timestamp)) is db:
+                return self.dataset.get_activity_bitmap(
+                    table_name,
+                    entity_col,
+                    self.timedelta,
+                    upto_test_timestamp=upto_test_timestamp,
+                )
+        return None
+
+    def _table_path(self, split: str) -> str:
+        r"""Helper function to get the path of the cached table of a split, which
+        names the training window policy unless it is the default."""
+
+        name = split
+        if split == "train" and (
+            self.max_train_windows is not None or self.train_window_stride != 1
+        ):
+            name = (
+                f"train_{self.max_train_windows}_{self.train_window_sampling}"
+                f"_{self.train_window_stride}"
+            )
+        return f"{self.cache_dir}/{name}.parquet"
+
+    def _write_table(self, split: str, path: str) -> None:
+        r"""Helper function to make the table for a split and stream it to a
+        parquet file, `num_windows_per_chunk` time windows at a time.
+
+        The file is written under a temporary name and moved to path once complete.
+        """
+
+        db = self.dataset.get_db(upto_test_timestamp=split != "test")
+        timestamps = self._get_timestamps(split, db)
+        num_windows = max(len(timestamps), 1)
+        chunk_size = num_windows
+        if self.independent_windows and self.num_windows_per_chunk is not None:
+            chunk_size = self.num_windows_per_chunk
+
+        tmp_path = f"{path}.tmp"
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        writer = None
+        try:
+            try:
+                for start in range(0, num_windows, chunk_size):
+                    table = self.make_table(db, timestamps[start : start + chunk_size])
+                    table = self._sample_train_rows(split, timestamps, table)
+                    table = self.filter_dangling_entities(table).to_arrow()
+                    if writer is None:
+                        writer = pq.ParquetWriter(tmp_path, table.schema)
+                    else:
+                        table = table.cast(writer.schema)
+                    writer.write_table(table)
+            finally:
+                if writer is not None:
+                    writer.close()
+        except BaseException:
+            Path(tmp_path).unlink(missing_ok=True)
+            raise
+
+        os.replace(tmp_path, path)
+
     def get_table(self, split, mask_input_cols=None):
         r"""Get a table for a split.
 
@@ -167,13 +333,25 @@ class BaseTask:
         Returns:
             The task table for the split.
 
-        The table is cached in memory.
+        The unmasked table is cached in memory by :obj:`cache_manager`; masked
+        tables are derived from it on every call. Use :meth:`release` to free it.
         """
 
         if mask_input_cols is None:
             mask_input_cols = split == "test"
 
-        table_path = f"{self.cache_dir}/{split}.parquet"
+        table = cache_manager.get((self, "table", split))
+        if table is None:
+            table = self._load_or_make_table(split)
+            cache_manager.put((self, "table", split), table)
+
+        if mask_input_cols:
+            table = self._mask_input_cols(table)
+
+        return table
+
+    def _load_or_make_table(self, split: str) -> Table:
+        table_path = self._table_path(split)
         if self.cache_dir and Path(table_path).exists():
             table = Table.load(table_path)
         else:
@@ -183,18 +361,91 @@ class BaseTask:
                 "for tasks prepared by the RelBench team.)"
             )
             tic = time.time()
-            table = self._get_table(split)
+            memory = peak_memory()
+            with profile_queries() if self.profile else nullcontext() as records:
+                if self.cache_dir:
+                    self._write_table(split, table_path)
+                    table = Table.load(table_path)
+                else:
+                    table = self._get_table(split)
             toc = time.time()
             print(f"Done in {toc - tic:.2f} seconds.")
 
-            if self.cache_dir:
-                table.save(table_path)
-
-        if mask_input_cols:
-            table = self._mask_input_cols(table)
+            if self.profile:
+                memory = peak_memory_increase(memory)
+                self._save_profile(split, toc - tic, len(table), memory, records)
 
         return table
 
+    def _save_profile(
+        self,
+        split: str,
+        wall_time: float,
+        num_rows: int,
+        memory: Optional[int],
+        records: List[Dict[str, Any]],
+    ) -> None:
+        self.profile_report[split] = {
+            "wall_time": wall_time,
+            "num_rows": num_rows,
+            "peak_memory_increase": memory,
+            # the high-water mark of the process, not of this split
+            "process_peak_memory": peak_memory(),
+            "queries": records,
+        }
+
+        if self.cache_dir:
+            profile_path = Path(f"{self.cache_dir}/profile.json")
+            report = {}
+            if profile_path.exists():
+                with open(profile_path, "r") as f:
+                    report = json.load(f)
+            report[split] = self.profile_report[split]
+            profile_path.parent.mkdir(parents=True, exist_ok=True)
+            with open(profile_path, "w") as f:
+                json.dump(report, f, indent=2, default=str)
+
+    def release(self) -> None:
+        r"""Release all task tables of this task cached in memory."""
+
+        cache_manager.release(self)
+
+    def _cached_per_split(
+        self,
+        table: Table,
+        key: Tuple[Hashable, ...],
+        fn: Callable[[Table], Any],
+        nbytes: Callable[[Any], int],
+    ) -> Any:
+        r"""Return `fn(table)`, cached in memory by :obj:`cache_manager` if table
+        is a task table of this task, i.e. returned by :meth:`get_table` with
+        `mask_input_cols=False`.
+
+        Entries are keyed by split and hold a weak reference to the data frame
+        they were computed from, so that they are recomputed once `table.df` is
+        reassigned. Other tables are not cached.
+        """
+
+        split = next(
+            (
+                split
+                for split in ["train", "val", "test"]
+                if cache_manager.get((self, "table", split)) is table
+            ),
+            None,
+        )
+        if split is None:
+            return fn(table)
+
+        entry = cache_manager.get((self, *key, split))
+        if entry is not None and entry[0]() is table.df:
+            return entry[1]
+        value = fn(table)
+        cache_manager.put(
+            (self, *key, split), (weakref.ref(table.df), value), nbytes=nbytes(value)
+        )
+        return value
+
     def _mask_input_cols(self, table: Table) -> Table:
         input_cols = [
             table.time_col,
@@ -219,6 +470,8 @@ class BaseTask:
         pred: NDArray,
         target_table: Optional[Table] = None,
         metrics: Optional[List[Callable[[NDArray, NDArray], float]]] = None,
+        bootstrap: int = 0,
+        group_by: Optional[Union[str, NDArray, List[Union[str, NDArray]]]] = None,
     ):
         r"""Evaluate predictions on the task.
 
@@ -227,7 +480,59 @@ class BaseTask:
             target_table: The target table. If None, use the test table.
             metrics: The metrics to evaluate the prediction table. If None, use
                 the default metrics for the task.
+            bootstrap: If positive, the number of bootstrap resamples of the
+                target table rows used to additionally report 95% confidence
+                intervals of all metrics, as `<metric>/ci_lower` and
+                `<metric>/ci_upper` (see :func:`relbench.metrics.bootstrap_ci`).
+            group_by: A column of the target table or an array of group labels
+                per target table row (e.g., entity segments), or a list of these.
+                Metrics are additionally reported per group as `<metric>/<label>`,
+                computed for all groups in one grouped pass (see
+                :func:`relbench.metrics.grouped_metrics`).
 
         Implemented by EntityTask and RecommendationTask.
         """
         raise NotImplementedError
+
+    def _evaluate_groups(
+        self,
+        metrics: List[Callable[[NDArray, NDArray], float]],
+        true: NDArray,
+        pred: NDArray,
+        target_table: Table,
+        group_by: Sequence[Union[str, NDArray]],
+    ) -> Dict[str, float]:
+        r"""Compute metrics per group for each grouping of the target table rows,
+        keyed by `<metric>/<label>`."""
+
+        res = {}
+        for group in self._group_arrays(target_table, group_by):
+            is_time = np.issubdtype(group.dtype, np.datetime64)
+            for label, values in grouped_metrics(metrics, true, pred, group).items():
+                label = pd.Timestamp(label) if is_time else label
+                for name, value in values.items():
+                    res[f"{name}/{label}"] = value
+
+        return res
+
+    def _group_arrays(
+        self,
+        target_table: Table,
+        group_by: Sequence[Union[str, NDArray]],
+    ) -> List[NDArray]:
+        r"""Return the group labels per target table row of each grouping."""
+
+        groups = []
+        for group in group_by:
+            if isinstance(group, str):
+                group = target_table.df[group].to_numpy()
+            group = np.asarray(group)
+            if len(group) != len(target_table):
+                raise ValueError(
+                    f"The length of group_by and the target table must be the "
+                    f"same (got {len(group)} and {len(target_table)}, "
+                    f"respectively)."
+                )
+            groups.append(group)
+
+        return groups
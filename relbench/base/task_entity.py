@@ -1,14 +1,53 @@
 from __future__ import annotations
 
-from typing import Any, Callable, Dict, List, Optional
+from typing import Any, Callable, Dict, List, Optional, Sequence, Union
 
 import numpy as np
 import pandas as pd
 from numpy.typing import NDArray
 
+from ..metrics import (
+    accuracy,
+    auprc,
+    average_precision,
+    binary_classification_metrics,
+    bootstrap_ci,
+    f1,
+    label_matrix,
+    multilabel_auprc_macro,
+    multilabel_auprc_micro,
+    multilabel_auroc_macro,
+    multilabel_auroc_micro,
+    multilabel_classification_metrics,
+    multilabel_f1_macro,
+    multilabel_f1_micro,
+    multilabel_precision_macro,
+    multilabel_precision_micro,
+    multilabel_recall_macro,
+    multilabel_recall_micro,
+    roc_auc,
+)
+from .database import Database
 from .table import Table
 from .task_base import BaseTask, TaskType
 
+# Metrics computed at once by binary_classification_metrics
+_FUSED_BINARY_METRICS = {accuracy, auprc, average_precision, f1, roc_auc}
+
+# Metrics computed at once by multilabel_classification_metrics
+_FUSED_MULTILABEL_METRICS = {
+    multilabel_auprc_macro,
+    multilabel_auprc_micro,
+    multilabel_auroc_macro,
+    multilabel_auroc_micro,
+    multilabel_f1_macro,
+    multilabel_f1_micro,
+    multilabel_precision_macro,
+    multilabel_precision_micro,
+    multilabel_recall_macro,
+    multilabel_recall_micro,
+}
+
 
 class EntityTask(BaseTask):
     r"""A node prediction task on a dataset.
@@ -32,8 +71,7 @@ class EntityTask(BaseTask):
     num_eval_timestamps: int = 1
 
     def filter_dangling_entities(self, table: Table) -> Table:
-        db = self.dataset.get_db()
-        num_entities = len(db.table_dict[self.entity_table])
+        num_entities = self.dataset.num_entities[self.entity_table]
         filter_mask = table.df[self.entity_col] >= num_entities
 
         if filter_mask.any():
@@ -41,11 +79,98 @@ class EntityTask(BaseTask):
 
         return table
 
+    def labels_at(
+        self,
+        timestamp: Union[str, pd.Timestamp],
+        entities: Optional[Sequence[int]] = None,
+    ) -> Table:
+        r"""Compute labels for a single cutoff timestamp, i.e. over the time window
+        (timestamp, timestamp + timedelta], without generating a whole split.
+
+        Args:
+            timestamp: The cutoff timestamp.
+            entities: If specified, only return labels of these entities.
+
+        Returns:
+            The task table with one row per labeled entity, including the target
+            column.
+
+        The database is restricted to rows upto test_timestamp whenever the time
+        window ends before it, as for the train and val splits. If entities are
+        specified, the entity table and the rows of tables with a foreign key to it
+        are further restricted to these entities before calling :meth:`make_table`.
+        The remaining cost is that of one :meth:`make_table` call over all other
+        tables in full, e.g., the item table of a customer task, and of filtering
+        the restricted tables once. Tasks whose labels depend on rows of other
+        entities (e.g., a rank among all entities) must not be queried with
+        entities.
+        """
+
+        timestamp = pd.Timestamp(timestamp)
+        db = self.dataset.get_db(
+            upto_test_timestamp=timestamp + self.timedelta
+            <= self.dataset.test_timestamp
+        )
+        if timestamp + self.timedelta > db.max_timestamp:
+            raise RuntimeError(
+                f"timestamp + timedelta is larger than max timestamp "
+                f"({timestamp} + {self.timedelta} > {db.max_timestamp}). This "
+                f"would cause labels to be generated with insufficient "
+                f"aggregation time."
+            )
+
+        if entities is not None:
+            db = self._restrict_db(db, np.asarray(entities))
+
+        table = self.make_table(db, pd.DatetimeIndex([timestamp]))
+        table = self.filter_dangling_entities(table)
+
+        if entities is not None:
+            mask = np.isin(table.df[self.entity_col].to_numpy(), entities)
+            table.df = table.df[mask]
+        table.df = table.df.reset_index(drop=True)
+
+        return table
+
+    def _restrict_db(self, db: Database, entities: NDArray) -> Database:
+        r"""Return a database where the entity table and the rows of tables with
+        a foreign key to it are restricted to the given entities. Other tables are
+        shared with db."""
+
+        table_dict = {}
+        for name, table in db.table_dict.items():
+            if name == self.entity_table:
+                cols = [table.pkey_col] if table.pkey_col is not None else []
+            else:
+                cols = [
+                    col
+                    for col, pkey_table in table.fkey_col_to_pkey_table.items()
+                    if pkey_table == self.entity_table
+                ]
+            if len(cols) == 0:
+                table_dict[name] = table
+                continue
+
+            # keep rows referencing any of the entities
+            mask = np.zeros(len(table.df), dtype=bool)
+            for col in cols:
+                mask |= table.df[col].isin(entities).to_numpy()
+            table_dict[name] = Table(
+                df=table.df[mask],
+                fkey_col_to_pkey_table=table.fkey_col_to_pkey_table,
+                pkey_col=table.pkey_col,
+                time_col=table.time_col,
+            )
+
+        return Database(table_dict)
+
     def evaluate(
         self,
         pred: NDArray,
         target_table: Optional[Table] = None,
         metrics: Optional[List[Callable[[NDArray, NDArray], float]]] = None,
+        bootstrap: int = 0,
+        group_by: Optional[Union[str, NDArray, List[Union[str, NDArray]]]] = None,
     ) -> Dict[str, float]:
         if metrics is None:
             metrics = self.metrics
@@ -53,14 +178,78 @@ class EntityTask(BaseTask):
         if target_table is None:
             target_table = self.get_table("test", mask_input_cols=False)
 
-        target = target_table.df[self.target_col].to_numpy()
+        if self.task_type == TaskType.MULTILABEL_CLASSIFICATION:
+            target = self.get_label_matrix(target_table)
+        else:
+            target = target_table.df[self.target_col].to_numpy()
+        if (
+            self.task_type == TaskType.BINARY_CLASSIFICATION
+            and pred.ndim == 2
+            and pred.shape[1] == 1
+        ):
+            # evaluate a single score column as 1-D scores in all code paths
+            pred = pred.reshape(-1)
         if len(pred) != len(target):
             raise ValueError(
                 f"The length of pred and target must be the same (got "
                 f"{len(pred)} and {len(target)}, respectively)."
             )
 
-        return {fn.__name__: fn(target, pred) for fn in metrics}
+        # compute binary metrics sharing a single sort of the predictions, and
+        # multilabel metrics sharing a single column-wise sort
+        fused, fused_metrics = {}, set()
+        if (
+            self.task_type == TaskType.BINARY_CLASSIFICATION
+            and sum(fn in _FUSED_BINARY_METRICS for fn in metrics) > 1
+            and pred.ndim == 1
+            and len(np.unique(target)) == 2
+        ):
+            fused = binary_classification_metrics(target, pred)
+            fused_metrics = _FUSED_BINARY_METRICS
+        elif (
+            self.task_type == TaskType.MULTILABEL_CLASSIFICATION
+            and sum(fn in _FUSED_MULTILABEL_METRICS for fn in metrics) > 1
+        ):
+            fused = multilabel_classification_metrics(target, pred)
+            fused_metrics = _FUSED_MULTILABEL_METRICS
+
+        res = {
+            fn.__name__: (
+                fused[fn.__name__] if fn in fused_metrics else fn(target, pred)
+            )
+            for fn in metrics
+        }
+
+        if bootstrap > 0:
+            for name, (lower, upper) in bootstrap_ci(
+                metrics, target, pred, bootstrap
+            ).items():
+                res[f"{name}/ci_lower"] = lower
+                res[f"{name}/ci_upper"] = upper
+
+        if group_by is not None:
+            if not isinstance(group_by, list):
+                group_by = [group_by]
+            res.update(
+                self._evaluate_groups(metrics, target, pred, target_table, group_by)
+            )
+
+        return res
+
+    def get_label_matrix(self, table: Table) -> NDArray[np.int_]:
+        r"""Return the targets of a multilabel table as a dense
+        [num_rows, num_labels] matrix.
+
+        The result is cached in memory by :obj:`cache_manager` for the task
+        tables of this task.
+        """
+
+        return self._cached_per_split(
+            table,
+            ("label_matrix",),
+            lambda table: label_matrix(table.df[self.target_col].to_numpy()),
+            nbytes=lambda matrix: matrix.nbytes,
+        )
 
     def stats(self) -> Dict[str, Dict[str, Any]]:
         r"""Get train / val / test table statistics for each timestamp
@@ -74,82 +263,112 @@ class EntityTask(BaseTask):
             classes per entity. Number and index of classes having minimum
             and maximum number of classes.
         """
+        tables = {
+            split: self.get_table(split, mask_input_cols=False)
+            for split in ["train", "val", "test"]
+        }
         res = {}
-        for split in ["train", "val", "test"]:
-            table = self.get_table(split, mask_input_cols=False)
-            timestamps = table.df[self.time_col].unique()
-            split_stats = {}
-            for timestamp in timestamps:
-                temp_df = table.df[table.df[self.time_col] == timestamp]
-                stats = {
-                    "num_rows": len(temp_df),
-                    "num_unique_entities": temp_df[self.entity_col].nunique(),
-                }
-                self._set_stats(temp_df, stats)
-                split_stats[str(timestamp)] = stats
-            split_stats["total"] = {
-                "num_rows": len(table.df),
-                "num_unique_entities": table.df[self.entity_col].nunique(),
-            }
-            self._set_stats(table.df, split_stats["total"])
+        for split, table in tables.items():
+            split_stats = self._get_stats(table.df, table.df[self.time_col])
+            split_stats["total"] = self._get_stats(table.df)["total"]
             res[split] = split_stats
-        total_df = pd.concat(
-            [
-                table.df
-                for table in [
-                    self.get_table(split, mask_input_cols=False)
-                    for split in ["train", "val", "test"]
-                ]
-                if table is not None
-            ]
-        )
-        res["total"] = {}
-        self._set_stats(total_df, res["total"])
-        train_uniques = set(self.get_table("train").df[self.entity_col].unique())
-        test_uniques = set(
-            self.get_table("test", mask_input_cols=False).df[self.entity_col].unique()
-        )
-        ratio_train_test_entity_overlap = len(
-            train_uniques.intersection(test_uniques)
-        ) / len(test_uniques)
+
+        total_df = pd.concat([table.df for table in tables.values()])
+        res["total"] = self._get_stats(total_df)["total"]
+        del res["total"]["num_rows"], res["total"]["num_unique_entities"]
+
+        train_uniques = tables["train"].df[self.entity_col].unique()
+        test_uniques = tables["test"].df[self.entity_col].unique()
+        num_overlap = np.isin(test_uniques, train_uniques).sum()
+        ratio_train_test_entity_overlap = num_overlap / len(test_uniques)
         res["total"][
             "ratio_train_test_entity_overlap"
         ] = ratio_train_test_entity_overlap
         return res
 
-    def _set_stats(self, df: pd.DataFrame, stats: dict[str, Any]) -> None:
+    def _get_stats(
+        self,
+        df: pd.DataFrame,
+        group: Optional[pd.Series] = None,
+    ) -> Dict[str, Dict[str, Any]]:
+        r"""Compute statistics of all groups of df in a single grouped pass.
+
+        Rows are grouped by the values of `group` (keyed by their string
+        representation, in order of appearance). If None, all rows form a single
+        group with key "total".
+        """
+        if group is None:
+            codes, uniques = np.zeros(len(df), dtype=np.int64), ["total"]
+        else:
+            codes, uniques = pd.factorize(group, sort=False)
+        num_groups = len(uniques)
+
+        entity = df[self.entity_col]
+        pairs = pd.DataFrame({"group": codes, "entity": entity.to_numpy()})
+        pairs = pairs[entity.notna().to_numpy()].drop_duplicates()
+        stats = {
+            "num_rows": np.bincount(codes, minlength=num_groups),
+            "num_unique_entities": np.bincount(pairs["group"], minlength=num_groups),
+        }
+
         if self.task_type == TaskType.BINARY_CLASSIFICATION:
-            self._set_binary_stats(df, stats)
+            self._set_binary_stats(df, codes, num_groups, stats)
         elif self.task_type == TaskType.REGRESSION:
-            self._set_regression_stats(df, stats)
+            self._set_regression_stats(df, codes, num_groups, stats)
         elif self.task_type == TaskType.MULTILABEL_CLASSIFICATION:
-            self._set_multilabel_stats(df, stats)
+            self._set_multilabel_stats(df, codes, num_groups, stats)
         else:
             raise ValueError(f"Unsupported task type {self.task_type}")
 
-    def _set_binary_stats(self, df: pd.DataFrame, stats: dict[str, Any]) -> None:
-        stats["num_positives"] = (df[self.target_col] == 1).sum()
-        stats["num_negatives"] = (df[self.target_col] == 0).sum()
-
-    def _set_regression_stats(self, df: pd.DataFrame, stats: dict[str, Any]) -> None:
-        stats["min_target"] = df[self.target_col].min()
-        stats["max_target"] = df[self.target_col].max()
-        stats["mean_target"] = df[self.target_col].mean()
-        quantiles = df[self.target_col].quantile([0.25, 0.5, 0.75])
-        stats["quantile_25_target"] = quantiles.iloc[0]
-        stats["median_target"] = quantiles.iloc[1]
-        stats["quantile_75_target"] = quantiles.iloc[2]
-
-    def _set_multilabel_stats(self, df: pd.DataFrame, stats: dict[str, Any]) -> None:
-        arr = np.array([row for row in df[self.target_col]])
-        arr_row = arr.sum(1)
-        stats["mean_num_classes_per_entity"] = round(arr_row.mean(), 4)
-        stats["max_num_classes_per_entity"] = arr_row.max()
-        stats["min_num_classes_per_entity"] = arr_row.min()
-        arr_class = arr.sum(0)
-        max_num_class_idx = arr_class.argmax()
+        return {
+            str(key): {name: values[i] for name, values in stats.items()}
+            for i, key in enumerate(uniques)
+        }
+
+    def _set_binary_stats(
+        self,
+        df: pd.DataFrame,
+        codes: NDArray[np.int_],
+        num_groups: int,
+        stats: Dict[str, NDArray],
+    ) -> None:
+        target = df[self.target_col].to_numpy()
+        stats["num_positives"] = np.bincount(codes[target == 1], minlength=num_groups)
+        stats["num_negatives"] = np.bincount(codes[target == 0], minlength=num_groups)
+
+    def _set_regression_stats(
+        self,
+        df: pd.DataFrame,
+        codes: NDArray[np.int_],
+        num_groups: int,
+        stats: Dict[str, NDArray],
+    ) -> None:
+        index = pd.RangeIndex(num_groups)
+        grouped = df[self.target_col].groupby(codes)
+        stats["min_target"] = grouped.min().reindex(index).to_numpy()
+        stats["max_target"] = grouped.max().reindex(index).to_numpy()
+        stats["mean_target"] = grouped.mean().reindex(index).to_numpy()
+        quantiles = grouped.quantile([0.25, 0.5, 0.75]).unstack().reindex(index)
+        stats["quantile_25_target"] = quantiles[0.25].to_numpy()
+        stats["median_target"] = quantiles[0.5].to_numpy()
+        stats["quantile_75_target"] = quantiles[0.75].to_numpy()
+
+    def _set_multilabel_stats(
+        self,
+        df: pd.DataFrame,
+        codes: NDArray[np.int_],
+        num_groups: int,
+        stats: Dict[str, NDArray],
+    ) -> None:
+        arr = np.stack(df[self.target_col].to_numpy())
+        arr_row = pd.Series(arr.sum(1)).groupby(codes)
+        stats["mean_num_classes_per_entity"] = arr_row.mean().to_numpy().round(4)
+        stats["max_num_classes_per_entity"] = arr_row.max().to_numpy()
+        stats["min_num_classes_per_entity"] = arr_row.min().to_numpy()
+        arr_class = pd.DataFrame(arr).groupby(codes).sum().to_numpy()
+        max_num_class_idx = arr_class.argmax(1)
         stats["max_num_class_idx"] = max_num_class_idx
-        stats["max_num_class_num"] = arr_class[max_num_class_idx]
-        min_num_class_idx = arr_class.argmin()
+        stats["max_num_class_num"] = arr_class[np.arange(num_groups), max_num_class_idx]
+        min_num_class_idx = arr_class.argmin(1)
         stats["min_num_class_idx"] = min_num_class_idx
-        stats["min_num_class_num"] = arr_class[min_num_class_idx]
+        stats["min_num_class_num"] = arr_class[np.arange(num_groups), min_num_class_idx]
@@ -1,16 +1,99 @@
 from __future__ import annotations
 
-from typing import Callable, Dict, List, Optional
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple, Union
 
 import numpy as np
 import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
 from numpy.typing import NDArray
 
-from .dataset import Dataset
+from ..metrics import bootstrap_ci
+from .cache import cache_manager
 from .table import Table
 from .task_base import BaseTask, TaskType
 
 
+def _to_csr(ser: pd.Series) -> Tuple[NDArray[np.int64], NDArray]:
+    r"""Convert a list column into CSR format, i.e. a row pointer of size
+    `len(ser) + 1` and the flattened values.
+
+    Arrow-backed list columns are converted without copying the values.
+    """
+
+    if len(ser) == 0:
+        return np.zeros(1, dtype=np.int64), np.zeros(0, dtype=np.int64)
+
+    lists = pa.array(ser, from_pandas=True)
+    if isinstance(lists, pa.ChunkedArray):
+        lists = lists.combine_chunks()
+    count = pc.fill_null(pc.list_value_length(lists), 0).to_numpy()
+    ptr = np.concatenate([[0], np.cumsum(count)])
+    values = lists.flatten().to_numpy(zero_copy_only=False)
+    return ptr, values
+
+
+def _from_csr(
+    ptr: NDArray[np.int64], values: NDArray
+) -> pd.api.extensions.ExtensionArray:
+    r"""Convert CSR format into an Arrow-backed list column.
+
+    The column is of (32-bit offset) list type, which pandas can `explode`,
+    and is split into chunks of at most `2**31 - 1` values.
+    """
+
+    max_values = np.iinfo(np.int32).max
+    bounds = [0]
+    while bounds[-1] < len(ptr) - 1:
+        end = np.searchsorted(ptr, ptr[bounds[-1]] + max_values, side="right") - 1
+        bounds.append(max(int(end), bounds[-1] + 1))
+    if len(bounds) == 1:
+        bounds.append(0)
+
+    chunks = [
+        pa.ListArray.from_arrays(
+            pa.array(ptr[start : end + 1] - ptr[start], type=pa.int32()),
+            pa.array(values[ptr[start] : ptr[end]]),
+        )
+        for start, end in zip(bounds[:-1], bounds[1:])
+    ]
+    return pd.arrays.ArrowExtensionArray(pa.chunked_array(chunks))
+
+
+def _csr_isin(
+    pred: NDArray[np.int_],
+    ptr: NDArray[np.int64],
+    values: NDArray[np.int_],
+    chunk_size: int = 1 << 16,
+) -> NDArray[np.bool_]:
+    r"""Return a boolean array of the same shape as `pred`, indicating whether
+    `pred[i, j]` is contained in the `i`-th row of the CSR matrix.
+
+    Values need to be sorted within each row. Row / value pairs are encoded
+    into a single sorted key so that membership can be tested with one
+    `np.searchsorted` per chunk of `chunk_size` rows.
+    """
+
+    pred_isin = np.zeros(pred.shape, dtype=bool)
+    if len(values) == 0:
+        return pred_isin
+
+    num_values = int(values.max()) + 1
+    row_index = np.repeat(np.arange(len(ptr) - 1), np.diff(ptr))
+    keys = row_index * num_values + values.astype(np.int64)
+
+    for start in range(0, len(pred), chunk_size):
+        chunk = pred[start : start + chunk_size].astype(np.int64)
+        valid = (chunk >= 0) & (chunk < num_values)
+        rows = np.arange(start, start + len(chunk))[:, None]
+        query = rows * num_values + np.where(valid, chunk, 0)
+        index = np.searchsorted(keys, query).clip(max=len(keys) - 1)
+        pred_isin[start : start + chunk_size] = valid & (keys[index] == query)
+
+    return pred_isin
+
+
 class RecommendationTask(BaseTask):
     r"""A link prediction task on a dataset.
 
@@ -22,7 +105,14 @@ class RecommendationTask(BaseTask):
         time_col: The time column.
         eval_k: k for eval@k metrics.
 
-    Other attributes are inherited from BaseTask.
+    Other attributes are inherited from BaseTask. If num_eval_timestamps > 1, the
+    val / test tables contain one row per source entity and time window, and
+    :meth:`evaluate` additionally reports metrics per time window.
+
+    For sampled-candidate evaluation, :meth:`get_candidate_table` adds a fixed,
+    seeded candidate set per row (the destination entities plus sampled negatives)
+    as the `candidates` list column. Predictions then rank only these candidates,
+    and are evaluated by :meth:`evaluate` as usual.
     """
 
     src_entity_col: str
@@ -35,27 +125,26 @@ class RecommendationTask(BaseTask):
     timedelta: pd.Timedelta
     metrics: List[Callable[[NDArray, NDArray], float]]
     num_eval_timestamps: int = 1
-
-    def __init__(
-        self,
-        dataset: Dataset,
-        cache_dir: Optional[str] = None,
-    ):
-        if self.num_eval_timestamps != 1:
-            raise NotImplementedError(
-                "RecommendationTask currently only supports num_eval_timestamps=1."
-            )
-        super().__init__(dataset, cache_dir)
+    candidate_col: str = "candidates"
 
     def filter_dangling_entities(self, table: Table) -> Table:
-        # filter dangling destination entities from a list
-        table.df[self.dst_entity_col] = table.df[self.dst_entity_col].apply(
-            lambda x: [i for i in x if i < self.num_dst_nodes]
-        )
+        num_src_nodes = self.num_src_nodes
+        num_dst_nodes = self.num_dst_nodes
+
+        # filter dangling destination entities from a list, using the CSR
+        # representation of the list column, and store the result as an
+        # Arrow-backed list column
+        ptr, values = _to_csr(table.df[self.dst_entity_col])
+        row_index = np.repeat(np.arange(len(table.df)), np.diff(ptr))
+        keep = values < num_dst_nodes
+        dst_count = np.bincount(row_index[keep], minlength=len(table.df))
+        ptr = np.concatenate([[0], np.cumsum(dst_count)])
+        values = values[keep].astype(np.int64)
+        table.df[self.dst_entity_col] = _from_csr(ptr, values)
 
         # filter dangling source entities and empty list (after above filtering)
-        filter_mask = (table.df[self.src_entity_col] >= self.num_src_nodes) | (
-            ~table.df[self.dst_entity_col].map(bool)
+        filter_mask = (table.df[self.src_entity_col] >= num_src_nodes).to_numpy() | (
+            dst_count == 0
         )
 
         if filter_mask.any():
@@ -69,6 +158,8 @@ class RecommendationTask(BaseTask):
         pred: NDArray,
         target_table: Optional[Table] = None,
         metrics: Optional[List[Callable[[NDArray, NDArray], float]]] = None,
+        bootstrap: int = 0,
+        group_by: Optional[Union[str, NDArray, List[Union[str, NDArray]]]] = None,
     ) -> Dict[str, float]:
         if metrics is None:
             metrics = self.metrics
@@ -83,109 +174,237 @@ class RecommendationTask(BaseTask):
                 f"{pred.shape} given."
             )
 
-        pred_isin_list = []
-        dst_count_list = []
-        for true_dst_nodes, pred_dst_nodes in zip(
-            target_table.df[self.dst_entity_col],
-            pred,
-        ):
-            pred_isin_list.append(
-                np.isin(np.array(pred_dst_nodes), np.array(true_dst_nodes))
+        ptr, values = self.get_dst_csr(target_table)
+        pred_isin = _csr_isin(pred, ptr, values)
+        dst_count = np.diff(ptr)
+
+        res = {fn.__name__: fn(pred_isin, dst_count) for fn in metrics}
+
+        if bootstrap > 0:
+            for name, (lower, upper) in bootstrap_ci(
+                metrics, pred_isin, dst_count, bootstrap
+            ).items():
+                res[f"{name}/ci_lower"] = lower
+                res[f"{name}/ci_upper"] = upper
+
+        group_by = self._eval_group_by(group_by)
+        if group_by:
+            res.update(
+                self._evaluate_groups(
+                    metrics, pred_isin, dst_count, target_table, group_by
+                )
             )
-            dst_count_list.append(len(true_dst_nodes))
-        pred_isin = np.stack(pred_isin_list)
-        dst_count = np.array(dst_count_list)
 
-        return {fn.__name__: fn(pred_isin, dst_count) for fn in metrics}
+        return res
+
+    def _eval_group_by(
+        self, group_by: Optional[Union[str, NDArray, List[Union[str, NDArray]]]]
+    ) -> List[Union[str, NDArray]]:
+        r"""Return the groupings of the target table rows to report metrics for,
+        i.e. the evaluation time windows (if there are several) and `group_by`."""
+
+        if group_by is None:
+            group_by = []
+        elif not isinstance(group_by, list):
+            group_by = [group_by]
+        if self.num_eval_timestamps > 1:
+            group_by = [self.time_col] + group_by
+        return group_by
+
+    def get_dst_csr(self, table: Table) -> Tuple[NDArray[np.int64], NDArray[np.int_]]:
+        r"""Return the destination lists of a table in CSR format, with values
+        sorted within each row.
+
+        The result is cached in memory by :obj:`cache_manager` for the task
+        tables of this task.
+        """
+
+        def to_csr(table: Table) -> Tuple[NDArray[np.int64], NDArray[np.int_]]:
+            ptr, values = _to_csr(table.df[self.dst_entity_col])
+            row_index = np.repeat(np.arange(len(ptr) - 1), np.diff(ptr))
+            return ptr, values[np.lexsort((values, row_index))]
+
+        return self._cached_per_split(
+            table,
+            ("dst_csr",),
+            to_csr,
+            nbytes=lambda csr: csr[0].nbytes + csr[1].nbytes,
+        )
+
+    def get_candidate_table(
+        self,
+        split: str,
+        num_negatives: int = 100,
+        seed: int = 0,
+        mask_input_cols: Optional[bool] = None,
+    ) -> Table:
+        r"""Get the table of a split with a candidate set per row, see
+        :meth:`add_candidates`.
+
+        The unmasked table is cached in memory by :obj:`cache_manager`, and
+        stored as `{split}_candidates_{num_negatives}_{seed}.parquet` next to the
+        task tables if cache_dir is set.
+        """
+
+        if mask_input_cols is None:
+            mask_input_cols = split == "test"
+
+        key = (self, "candidate_table", split, num_negatives, seed)
+        table = cache_manager.get(key)
+        if table is None:
+            table_path = (
+                f"{self.cache_dir}/{split}_candidates_{num_negatives}_{seed}.parquet"
+            )
+            if self.cache_dir and Path(table_path).exists():
+                table = Table.load(table_path)
+            else:
+                table = self.add_candidates(
+                    self.get_table(split, mask_input_cols=False), num_negatives, seed
+                )
+                if self.cache_dir:
+                    table.save(table_path)
+            cache_manager.put(key, table)
+
+        if mask_input_cols:
+            table = self._mask_input_cols(table)
+
+        return table
+
+    def add_candidates(
+        self,
+        table: Table,
+        num_negatives: int = 100,
+        seed: int = 0,
+    ) -> Table:
+        r"""Return a copy of the table with a candidate set per row, stored as
+        the sorted list column `candidate_col`.
+
+        Candidates consist of the destination entities of the row and
+        `num_negatives` distinct negatives, sampled uniformly from the other
+        destination entities (fewer if not enough exist). Sampling is seeded, so
+        the candidates are fixed for a given table and seed.
+        """
+
+        rng = np.random.default_rng(seed)
+        ptr, values = self.get_dst_csr(table)
+        num_rows = len(ptr) - 1
+        row_index = np.repeat(np.arange(num_rows), np.diff(ptr))
+
+        # drop duplicated destination entities within a row
+        keep = np.ones(len(values), dtype=bool)
+        keep[1:] = (values[1:] != values[:-1]) | (row_index[1:] != row_index[:-1])
+        row_index, values = row_index[keep], values[keep].astype(np.int64)
+        pos_count = np.bincount(row_index, minlength=num_rows)
+        ptr = np.concatenate([[0], np.cumsum(pos_count)])
+
+        # sample negatives, resampling those that are positive or duplicated
+        neg_count = np.minimum(num_negatives, self.num_dst_nodes - pos_count)
+        active = np.arange(num_negatives) < neg_count[:, None]
+        neg = rng.integers(0, self.num_dst_nodes, size=(num_rows, num_negatives))
+        neg[~active] = -1
+        while True:
+            order = np.argsort(neg, axis=1, kind="stable")
+            sorted_neg = np.take_along_axis(neg, order, axis=1)
+            is_dup = np.zeros(neg.shape, dtype=bool)
+            np.put_along_axis(
+                is_dup, order[:, 1:], sorted_neg[:, 1:] == sorted_neg[:, :-1], axis=1
+            )
+            invalid = active & (is_dup | _csr_isin(neg, ptr, values))
+            if not invalid.any():
+                break
+            neg[invalid] = rng.integers(0, self.num_dst_nodes, size=invalid.sum())
+
+        neg_row_index, _ = np.nonzero(active)
+        row_index = np.concatenate([row_index, neg_row_index])
+        values = np.concatenate([values, neg[active]])
+        values = values[np.lexsort((values, row_index))]
+        ptr = np.concatenate([[0], np.cumsum(pos_count + neg_count)])
+
+        df = table.df.copy()
+        df[self.candidate_col] = _from_csr(ptr, values)
+        return Table(
+            df=df,
+            fkey_col_to_pkey_table={
+                **table.fkey_col_to_pkey_table,
+                self.candidate_col: self.dst_entity_table,
+            },
+            pkey_col=table.pkey_col,
+            time_col=table.time_col,
+        )
 
     @property
     def num_src_nodes(self) -> int:
-        return len(self.dataset.get_db().table_dict[self.src_entity_table])
+        return self.dataset.num_entities[self.src_entity_table]
 
     @property
     def num_dst_nodes(self) -> int:
-        return len(self.dataset.get_db().table_dict[self.dst_entity_table])
+        return self.dataset.num_entities[self.dst_entity_table]
 
     def stats(self) -> Dict[str, Dict[str, int]]:
         r"""Get train / val / test table statistics for each timestamp and the whole
         table, including number of unique source entities, number of unique destination
         entities, number of destination entities and number of rows."""
 
+        tables = {
+            split: self.get_table(split, mask_input_cols=False)
+            for split in ["train", "val", "test"]
+        }
         res = {}
-        for split in ["train", "val", "test"]:
-            split_stats = {}
-            table = self.get_table(split, mask_input_cols=False)
-            timestamps = table.df[self.time_col].unique()
-            for timestamp in timestamps:
-                temp_df = table.df[table.df[self.time_col] == timestamp]
-                (
-                    num_unique_src_entities,
-                    num_unique_dst_entities,
-                    num_dst_entities,
-                    num_rows,
-                ) = self._get_stats(temp_df)
-                split_stats[str(timestamp)] = {
-                    "num_unique_src_entities": num_unique_src_entities,
-                    "num_unique_dst_entities": num_unique_dst_entities,
-                    "num_dst_entities": num_dst_entities,
-                    "num_rows": num_rows,
-                }
-
-            (
-                num_unique_src_entities,
-                num_unique_dst_entities,
-                num_dst_entities,
-                num_rows,
-            ) = self._get_stats(table.df)
-            split_stats["total"] = {
-                "num_unique_src_entities": num_unique_src_entities,
-                "num_unique_dst_entities": num_unique_dst_entities,
-                "num_dst_entities": num_dst_entities,
-                "num_rows": num_rows,
-            }
+        for split, table in tables.items():
+            split_stats = self._get_stats(table.df, table.df[self.time_col])
+            split_stats["total"] = self._get_stats(table.df)["total"]
             res[split] = split_stats
-        total_df = pd.concat(
-            [
-                table.df
-                for table in [
-                    self.get_table("train"),
-                    self.get_table("val"),
-                    self.get_table("test"),
-                ]
-                if table is not None
-            ]
-        )
-        num_unique_src_entities, num_unique_dst_entities, num_dst_entities, num_rows = (
-            self._get_stats(total_df)
-        )
-        res["total"] = {
-            "num_unique_src_entities": num_unique_src_entities,
-            "num_unique_dst_entities": num_unique_dst_entities,
-            "num_dst_entities": num_dst_entities,
-            "num_rows": num_rows,
-        }
-        train_uniques = set(self.get_table("train").df[self.src_entity_col].unique())
-        if self.get_table("test") is None:
-            return res
-        test_uniques = set(self.get_table("test").df[self.src_entity_col].unique())
-        ratio_train_test_entity_overlap = len(
-            train_uniques.intersection(test_uniques)
-        ) / len(test_uniques)
+
+        total_df = pd.concat([table.df for table in tables.values()])
+        res["total"] = self._get_stats(total_df)["total"]
+
+        train_uniques = tables["train"].df[self.src_entity_col].unique()
+        test_uniques = tables["test"].df[self.src_entity_col].unique()
+        num_overlap = np.isin(test_uniques, train_uniques).sum()
+        ratio_train_test_entity_overlap = num_overlap / len(test_uniques)
         res["total"][
             "ratio_train_test_entity_overlap"
         ] = ratio_train_test_entity_overlap
         return res
 
-    def _get_stats(self, df: pd.DataFrame) -> List[int]:
-        num_unique_src_entities = df[self.src_entity_col].nunique()
-        num_unique_dst_entities = len(
-            set(value for row in df[self.dst_entity_col] for value in row)
-        )
-        num_dst_entities = sum(len(row) for row in df[self.dst_entity_col])
-        num_rows = len(df)
-        return (
-            num_unique_src_entities,
-            num_unique_dst_entities,
-            num_dst_entities,
-            num_rows,
-        )
+    def _get_stats(
+        self,
+        df: pd.DataFrame,
+        group: Optional[pd.Series] = None,
+    ) -> Dict[str, Dict[str, int]]:
+        r"""Compute statistics of all groups of df in a single grouped pass.
+
+        Rows are grouped by the values of `group` (keyed by their string
+        representation, in order of appearance). If None, all rows form a single
+        group with key "total". Destination lists are processed in flattened form.
+        """
+        if group is None:
+            codes, uniques = np.zeros(len(df), dtype=np.int64), ["total"]
+        else:
+            codes, uniques = pd.factorize(group, sort=False)
+        num_groups = len(uniques)
+
+        src = df[self.src_entity_col]
+        src_pairs = pd.DataFrame({"group": codes, "src": src.to_numpy()})
+        src_pairs = src_pairs[src.notna().to_numpy()].drop_duplicates()
+
+        ptr, values = _to_csr(df[self.dst_entity_col])
+        dst_codes = np.repeat(codes, np.diff(ptr))
+        dst_pairs = pd.DataFrame({"group": dst_codes, "dst": values})
+        dst_pairs = dst_pairs.drop_duplicates()
+
+        stats = {
+            "num_unique_src_entities": np.bincount(
+                src_pairs["group"], minlength=num_groups
+            ),
+            "num_unique_dst_entities": np.bincount(
+                dst_pairs["group"], minlength=num_groups
+            ),
+            "num_dst_entities": np.bincount(dst_codes, minlength=num_groups),
+            "num_rows": np.bincount(codes, minlength=num_groups),
+        }
+
+        return {
+            str(key): {name: int(values[i]) for name, values in stats.items()}
+            for i, key in enumerate(uniques)
+        }
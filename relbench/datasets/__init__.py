@@ -1,11 +1,11 @@
 import json
 import pkgutil
-from functools import lru_cache
 from typing import List
 
 import pooch
 
 from relbench.base import Dataset
+from relbench.base.cache import cache_manager
 from relbench.datasets import amazon, avito, event, f1, hm, stack, trial
 
 dataset_registry = {}
@@ -63,7 +63,6 @@ def download_dataset(name: str) -> None:
     )
 
 
-@lru_cache(maxsize=None)
 def get_dataset(name: str, download=False) -> Dataset:
     r"""Return a dataset object by name.
 
@@ -82,12 +81,18 @@ def get_dataset(name: str, download=False) -> Dataset:
     Once the database is cached, either because of download or processing from
     raw files, the cache will be used. `download=True` will verify that the
     cached database matches the RelBench version even in this case.
+
+    The dataset object is cached in memory by :obj:`cache_manager`.
     """
 
-    if download:
-        download_dataset(name)
-    cls, args, kwargs = dataset_registry[name]
-    dataset = cls(*args, **kwargs)
+    key = ("get_dataset", name, download)
+    dataset = cache_manager.get(key)
+    if dataset is None:
+        if download:
+            download_dataset(name)
+        cls, args, kwargs = dataset_registry[name]
+        dataset = cls(*args, **kwargs)
+        cache_manager.put(key, dataset)
     return dataset
 
 
@@ -0,0 +1,62 @@
+r"""Evaluate prediction files offline.
+
+Usage::
+
+    relbench-evaluate --dataset rel-amazon --task user-churn run1.parquet run2.parquet
+
+Prediction files are written by :func:`relbench.base.save_predictions`. Metrics
+of each file are printed as one JSON line.
+"""
+
+import argparse
+import json
+from typing import List, Optional
+
+from relbench import metrics as metrics_module
+from relbench.base import evaluate_predictions
+from relbench.tasks import get_task
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(
+        prog="relbench-evaluate", description="Evaluate RelBench prediction files."
+    )
+    parser.add_argument("--dataset", type=str, required=True)
+    parser.add_argument("--task", type=str, required=True)
+    parser.add_argument("--split", type=str, default="test", choices=["val", "test"])
+    parser.add_argument(
+        "--metrics",
+        type=str,
+        nargs="+",
+        default=None,
+        help="Names of metrics in relbench.metrics. Defaults to the task metrics.",
+    )
+    parser.add_argument("--bootstrap", type=int, default=0)
+    parser.add_argument("--batch_size", type=int, default=1 << 16)
+    parser.add_argument(
+        "--download",
+        action="store_true",
+        help="Download the task tables from the RelBench server.",
+    )
+    parser.add_argument("paths", type=str, nargs="+")
+    args = parser.parse_args(argv)
+
+    task = get_task(args.dataset, args.task, download=args.download)
+    metrics = None
+    if args.metrics is not None:
+        metrics = [getattr(metrics_module, name) for name in args.metrics]
+
+    for path in args.paths:
+        res = evaluate_predictions(
+            task,
+            path,
+            split=args.split,
+            metrics=metrics,
+            batch_size=args.batch_size,
+            bootstrap=args.bootstrap,
+        )
+        print(json.dumps({"path": path, **{k: float(v) for k, v in res.items()}}))
+
+
+if __name__ == "__main__":
+    main()
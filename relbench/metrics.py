@@ -1,4 +1,4 @@
-from typing import Tuple
+from typing import Any, Callable, Dict, List, Optional, Tuple
 
 import numpy as np
 import sklearn.metrics as skm
@@ -50,6 +50,67 @@ def auprc(true: NDArray[np.float64], pred: NDArray[np.float64]) -> float:
     return skm.auc(recall, precision)
 
 
+def _ranking_metrics_from_counts(
+    pos: NDArray[np.float64], neg: NDArray[np.float64]
+) -> Dict[str, NDArray[np.float64]]:
+    r"""Compute ranking metrics from the (possibly weighted) number of positive
+    and negative examples per score threshold, ordered by decreasing threshold
+    along the last axis. Results match roc_auc, average_precision and auprc."""
+
+    pos = np.asarray(pos, dtype=np.float64)
+    neg = np.asarray(neg, dtype=np.float64)
+    tps, fps = np.cumsum(pos, axis=-1), np.cumsum(neg, axis=-1)
+    num_pos = tps[..., -1] if tps.shape[-1] > 0 else np.zeros(tps.shape[:-1])
+    num_neg = fps[..., -1] if fps.shape[-1] > 0 else np.zeros(fps.shape[:-1])
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        # ties within a threshold count as half
+        roc_auc = ((tps - pos / 2) * neg).sum(axis=-1) / (num_pos * num_neg)
+        # empty thresholds repeat the previous point of the curves, and leading
+        # empty thresholds lie at (recall 0, precision 1)
+        precision = np.where(tps + fps > 0, tps / (tps + fps), 1.0)
+        recall = tps / num_pos[..., None]
+
+    delta_recall = np.diff(recall, axis=-1, prepend=0)
+    average_precision = (delta_recall * precision).sum(axis=-1)
+    prev_precision = np.concatenate(
+        [np.ones(precision.shape[:-1] + (1,)), precision[..., :-1]], axis=-1
+    )
+    auprc = (delta_recall * (precision + prev_precision) / 2).sum(axis=-1)
+
+    return {
+        "roc_auc": np.where((num_pos > 0) & (num_neg > 0), roc_auc, np.nan),
+        "average_precision": np.where(num_pos > 0, average_precision, np.nan),
+        "auprc": np.where(num_pos > 0, auprc, np.nan),
+    }
+
+
+def binary_classification_metrics(
+    true: NDArray[np.float64], pred: NDArray[np.float64]
+) -> Dict[str, float]:
+    r"""Compute roc_auc, average_precision, auprc, accuracy and f1 at once.
+
+    Predictions are sorted once, and all ranking metrics are derived from the
+    cumulative number of positive and negative examples per distinct score.
+    Results match the individual metric functions.
+    """
+    assert pred.ndim == 1 or pred.shape[1] == 1
+    true = np.asarray(true).reshape(-1).astype(bool)
+    pred = np.asarray(pred).reshape(-1)
+
+    thresholds, inverse = np.unique(pred, return_inverse=True)
+    count = np.bincount(inverse, minlength=len(thresholds))
+    pos = np.bincount(inverse[true], minlength=len(thresholds))
+    out = _ranking_metrics_from_counts(pos[::-1], (count - pos)[::-1])
+    out = {name: float(value) for name, value in out.items()}
+
+    label = pred >= 0.5
+    tp, fp, fn = (label & true).sum(), (label & ~true).sum(), (~label & true).sum()
+    out["accuracy"] = float(((pred > 0.5) == true).mean())
+    out["f1"] = float(2 * tp / (2 * tp + fp + fn)) if tp + fp + fn > 0 else 0.0
+    return out
+
+
 ### applicable to multiclass classification only
 
 
@@ -85,58 +146,150 @@ def r2(true: NDArray[np.float64], pred: NDArray[np.float64]) -> float:
 
 
 ####### Multilabel metrics
+def label_matrix(true: NDArray) -> NDArray[np.int_]:
+    r"""Convert multilabel targets, given as an object array of per-row label
+    arrays, into a dense [num_rows, num_labels] matrix. Targets that already are
+    a matrix are returned as is."""
+    true = np.asarray(true)
+    if true.dtype == object or true.ndim == 1:
+        return np.stack(true)
+    return true
+
+
 def multilabel_auprc_micro(true: NDArray[np.int_], pred: NDArray[np.float64]) -> float:
     # Flatten true and prediction arrays for micro-average computation
-    true_flat = np.ravel(np.stack(true))
+    true_flat = np.ravel(label_matrix(true))
     pred_flat = np.ravel(pred)
     return skm.average_precision_score(true_flat, pred_flat, average="micro")
 
 
 def multilabel_auprc_macro(true: NDArray[np.int_], pred: NDArray[np.float64]) -> float:
-    true = np.stack(true)
+    true = label_matrix(true)
     return skm.average_precision_score(true, pred, average="macro")
 
 
 def multilabel_auroc_micro(true: NDArray[np.int_], pred: NDArray[np.float64]) -> float:
     # Flatten true and prediction arrays for micro-average computation
-    true_flat = np.ravel(np.stack(true))
+    true_flat = np.ravel(label_matrix(true))
     pred_flat = np.ravel(pred)
     return skm.roc_auc_score(true_flat, pred_flat, average="micro")
 
 
 def multilabel_auroc_macro(true: NDArray[np.int_], pred: NDArray[np.float64]) -> float:
-    true = np.stack(true)
+    true = label_matrix(true)
     return skm.roc_auc_score(true, pred, average="macro")
 
 
 def multilabel_f1_micro(true: NDArray[np.int_], pred: NDArray[np.int_]) -> float:
-    return skm.f1_score(np.stack(true), (pred > 0.5).astype(int), average="micro")
+    return skm.f1_score(label_matrix(true), (pred > 0.5).astype(int), average="micro")
 
 
 def multilabel_f1_macro(true: NDArray[np.int_], pred: NDArray[np.int_]) -> float:
-    return skm.f1_score(np.stack(true), (pred > 0.5).astype(int), average="macro")
+    return skm.f1_score(label_matrix(true), (pred > 0.5).astype(int), average="macro")
 
 
 def multilabel_recall_micro(true: NDArray[np.int_], pred: NDArray[np.int_]) -> float:
-    return skm.recall_score(np.stack(true), (pred > 0.5).astype(int), average="micro")
+    return skm.recall_score(
+        label_matrix(true), (pred > 0.5).astype(int), average="micro"
+    )
 
 
 def multilabel_recall_macro(true: NDArray[np.int_], pred: NDArray[np.int_]) -> float:
-    return skm.recall_score(np.stack(true), (pred > 0.5).astype(int), average="macro")
+    return skm.recall_score(
+        label_matrix(true), (pred > 0.5).astype(int), average="macro"
+    )
 
 
 def multilabel_precision_micro(true: NDArray[np.int_], pred: NDArray[np.int_]) -> float:
     return skm.precision_score(
-        np.stack(true), (pred > 0.5).astype(int), average="micro"
+        label_matrix(true), (pred > 0.5).astype(int), average="micro"
     )
 
 
 def multilabel_precision_macro(true: NDArray[np.int_], pred: NDArray[np.int_]) -> float:
     return skm.precision_score(
-        np.stack(true), (pred > 0.5).astype(int), average="macro"
+        label_matrix(true), (pred > 0.5).astype(int), average="macro"
     )
 
 
+def _ranking_counts_per_label(
+    true: NDArray[np.bool_], pred: NDArray[np.float64]
+) -> Tuple[NDArray[np.int64], NDArray[np.int64]]:
+    r"""Sort all label columns at once and return the number of positive and
+    negative examples per distinct score, of shape [num_labels, num_rows] and
+    ordered by decreasing score. Tied scores are counted at the last row of their
+    group and other rows are zero, which leaves the curves unchanged."""
+    order = np.argsort(-pred, axis=0, kind="stable")
+    pred = np.take_along_axis(pred, order, axis=0)
+    tps = np.cumsum(np.take_along_axis(true, order, axis=0), axis=0)
+    total = np.arange(1, len(pred) + 1)[:, None]
+
+    is_last = np.ones(pred.shape, dtype=bool)
+    is_last[:-1] = pred[:-1] != pred[1:]
+    # cumulative counts at the end of the previous group of tied scores
+    prev_tps = np.zeros_like(tps)
+    prev_tps[1:] = np.maximum.accumulate(np.where(is_last, tps, 0)[:-1], axis=0)
+    prev_total = np.zeros_like(tps)
+    prev_total[1:] = np.maximum.accumulate(np.where(is_last, total, 0)[:-1], axis=0)
+
+    pos = np.where(is_last, tps - prev_tps, 0)
+    neg = np.where(is_last, total - prev_total, 0) - pos
+    return pos.T, neg.T
+
+
+def multilabel_classification_metrics(
+    true: NDArray, pred: NDArray[np.float64]
+) -> Dict[str, float]:
+    r"""Compute all multilabel metrics at once.
+
+    Targets are converted to a label matrix once, per-label AUROC / AUPRC are
+    computed for all labels from a single column-wise sort, and F1, precision and
+    recall from per-label confusion counts. Results match the individual metric
+    functions (labels without positives contribute an AUPRC of 0 and make the
+    macro AUROC undefined, as in scikit-learn).
+    """
+    true = label_matrix(true).astype(bool)
+    pred = np.asarray(pred, dtype=np.float64)
+
+    # micro averages rank all (row, label) pairs together
+    flat_pred = pred.ravel()
+    thresholds, inverse = np.unique(flat_pred, return_inverse=True)
+    count = np.bincount(inverse, minlength=len(thresholds))
+    pos = np.bincount(inverse[true.ravel()], minlength=len(thresholds))
+    micro = _ranking_metrics_from_counts(pos[::-1], (count - pos)[::-1])
+    macro = _ranking_metrics_from_counts(*_ranking_counts_per_label(true, pred))
+
+    out = {
+        "multilabel_auprc_micro": float(micro["average_precision"]),
+        "multilabel_auprc_macro": float(
+            np.nan_to_num(macro["average_precision"]).mean()
+        ),
+        "multilabel_auroc_micro": float(micro["roc_auc"]),
+        "multilabel_auroc_macro": float(macro["roc_auc"].mean()),
+    }
+
+    label = pred > 0.5
+    tp = (label & true).sum(axis=0)
+    fp = (label & ~true).sum(axis=0)
+    fn = (~label & true).sum(axis=0)
+    for average, (tp_, fp_, fn_) in [
+        ("micro", (tp.sum(), fp.sum(), fn.sum())),
+        ("macro", (tp, fp, fn)),
+    ]:
+        for name, value in [
+            ("f1", _safe_divide(2 * tp_, 2 * tp_ + fp_ + fn_)),
+            ("recall", _safe_divide(tp_, tp_ + fn_)),
+            ("precision", _safe_divide(tp_, tp_ + fp_)),
+        ]:
+            out[f"multilabel_{name}_{average}"] = float(np.mean(value))
+    return out
+
+
+def _safe_divide(a: NDArray, b: NDArray) -> NDArray[np.float64]:
+    a, b = np.broadcast_arrays(np.asarray(a, dtype=np.float64), b)
+    return np.divide(a, b, out=np.zeros(a.shape), where=b > 0)
+
+
 ####### Link prediction metrics
 """All link prediction metrics take two arguments
     - pred_isin: Numpy boolean array of size (num_src_nodes, eval_k)
@@ -156,58 +309,647 @@ def link_prediction_recall(
     pred_isin: NDArray[np.int_],
     dst_count: NDArray[np.int_],
 ) -> float:
-    pred_isin, dst_count = _filter(pred_isin, dst_count)
-    recalls = pred_isin.sum(axis=1) / dst_count
-    return recalls.mean()
+    return _link_prediction_recall_rows(*_filter(pred_isin, dst_count)).mean()
 
 
 def link_prediction_precision(
     pred_isin: NDArray[np.int_],
     dst_count: NDArray[np.int_],
 ) -> float:
-    pred_isin, dst_count = _filter(pred_isin, dst_count)
-    eval_k = pred_isin.shape[1]
-    precisions = pred_isin.sum(axis=-1) / eval_k
-    return precisions.mean()
+    return _link_prediction_precision_rows(*_filter(pred_isin, dst_count)).mean()
 
 
 def link_prediction_map(
     pred_isin: NDArray[np.int_],
     dst_count: NDArray[np.int_],
 ) -> float:
-    pred_isin, dst_count = _filter(pred_isin, dst_count)
+    return _link_prediction_map_rows(*_filter(pred_isin, dst_count)).mean()
+
+
+def link_prediction_ndcg(
+    pred_isin: NDArray[np.int_],
+    dst_count: NDArray[np.int_],
+) -> float:
+    return _link_prediction_ndcg_rows(*_filter(pred_isin, dst_count)).mean()
+
+
+# Per source node values of the link prediction metrics, for source nodes with at
+# least one destination node.
+
+
+def _link_prediction_recall_rows(
+    pred_isin: NDArray[np.int_],
+    dst_count: NDArray[np.int_],
+) -> NDArray[np.float64]:
+    recalls = pred_isin.sum(axis=1) / dst_count
+    return recalls
+
+
+def _link_prediction_precision_rows(
+    pred_isin: NDArray[np.int_],
+    dst_count: NDArray[np.int_],
+) -> NDArray[np.float64]:
+    eval_k = pred_isin.shape[1]
+    precisions = pred_isin.sum(axis=-1) / eval_k
+    return precisions
+
+
+def _link_prediction_map_rows(
+    pred_isin: NDArray[np.int_],
+    dst_count: NDArray[np.int_],
+) -> NDArray[np.float64]:
     eval_k = pred_isin.shape[1]
     clipped_dst_count = dst_count.clip(min=None, max=eval_k)
     precision_mat = np.cumsum(pred_isin, axis=1) / (np.arange(eval_k) + 1)
     maps = (precision_mat * pred_isin).sum(axis=1) / clipped_dst_count
-    return maps.mean()
+    return maps
 
-def link_prediction_ndcg(
+
+def _link_prediction_ndcg_rows(
     pred_isin: NDArray[np.int_],
     dst_count: NDArray[np.int_],
-) -> float:
-    pred_isin, dst_count = _filter(pred_isin, dst_count)
+) -> NDArray[np.float64]:
     eval_k = pred_isin.shape[1]
 
     # Compute the discounted multiplier (1 / log2(i + 2) for i = 0, ..., k-1)
-    discounted_multiplier = np.concatenate((
-        np.zeros(1),
-        1 / np.log2(np.arange(1, eval_k + 1) + 1)
-    ))
+    discounted_multiplier = np.concatenate(
+        (np.zeros(1), 1 / np.log2(np.arange(1, eval_k + 1) + 1))
+    )
 
     # Compute Discounted Cumulative Gain (DCG)
-    discounted_cumulative_gain = (pred_isin * discounted_multiplier[1:eval_k + 1]).sum(axis=1)
+    discounted_cumulative_gain = (
+        pred_isin * discounted_multiplier[1 : eval_k + 1]
+    ).sum(axis=1)
 
     # Clip dst_count to the range [0, eval_k]
     clipped_dst_count = np.clip(dst_count, 0, eval_k)
 
     # Compute Ideal Discounted Cumulative Gain (IDCG)
     ideal_discounted_multiplier_cumsum = np.cumsum(discounted_multiplier)
-    ideal_discounted_cumulative_gain = ideal_discounted_multiplier_cumsum[clipped_dst_count]
+    ideal_discounted_cumulative_gain = ideal_discounted_multiplier_cumsum[
+        clipped_dst_count
+    ]
 
     # Avoid division by zero
-    ideal_discounted_cumulative_gain = np.clip(ideal_discounted_cumulative_gain, 1e-10, None)
+    ideal_discounted_cumulative_gain = np.clip(
+        ideal_discounted_cumulative_gain, 1e-10, None
+    )
 
     # Compute NDCG
     ndcg_scores = discounted_cumulative_gain / ideal_discounted_cumulative_gain
-    return ndcg_scores.mean()
\ No newline at end of file
+    return ndcg_scores
+
+
+####### Weighted metrics
+"""Bootstrap resamples and groups of rows are both represented by a matrix of
+non-negative integer row weights of size (num_weightings, num_rows). Metrics with
+a kernel below are computed for all weightings at once from the weight matrix,
+others are computed per weighting on the repeated rows. Kernels map
+(true, pred, weight) to a dictionary of metric names to arrays of size
+weight.shape[0].
+"""
+
+
+def _accuracy_kernel(
+    true: NDArray, pred: NDArray, weight: NDArray[np.float64]
+) -> Dict[str, NDArray[np.float64]]:
+    label = pred > 0.5 if pred.ndim == 1 else pred.argmax(axis=1)
+    correct = _safe_divide(weight @ (label == true), weight.sum(axis=1))
+    # micro-averaged f1 of single-label predictions equals accuracy
+    return {"accuracy": correct, "micro_f1": correct}
+
+
+def _f1_kernel(
+    true: NDArray, pred: NDArray, weight: NDArray[np.float64]
+) -> Dict[str, NDArray[np.float64]]:
+    true = np.asarray(true).reshape(-1).astype(bool)
+    label = pred.reshape(-1) >= 0.5
+    confusion = np.stack([label & true, label & ~true, ~label & true], axis=1)
+    tp, fp, fn = (weight @ confusion).T
+    return {"f1": _safe_divide(2 * tp, 2 * tp + fp + fn)}
+
+
+def _macro_f1_kernel(
+    true: NDArray, pred: NDArray, weight: NDArray[np.float64]
+) -> Dict[str, NDArray[np.float64]]:
+    label = pred.argmax(axis=1)
+    f1_sum = np.zeros(len(weight))
+    num_classes = np.zeros(len(weight))
+    for c in np.union1d(true, label):
+        is_true, is_label = true == c, label == c
+        tp = weight @ (is_true & is_label)
+        fp = weight @ (~is_true & is_label)
+        fn = weight @ (is_true & ~is_label)
+        # as in f1_score, only classes present in a weighting are averaged
+        f1_sum += _safe_divide(2 * tp, 2 * tp + fp + fn)
+        num_classes += tp + fp + fn > 0
+    return {"macro_f1": _safe_divide(f1_sum, num_classes)}
+
+
+def _ranking_kernel(
+    true: NDArray, pred: NDArray, weight: NDArray[np.float64]
+) -> Dict[str, NDArray[np.float64]]:
+    true = np.asarray(true).reshape(-1).astype(bool)
+    pred = pred.reshape(-1)
+    order = np.argsort(-pred, kind="stable")
+    sorted_pred = pred[order]
+    starts = np.flatnonzero(np.r_[True, sorted_pred[1:] != sorted_pred[:-1]])
+    weight = weight[:, order]
+    pos = np.add.reduceat(weight * true[order], starts, axis=1)
+    count = np.add.reduceat(weight, starts, axis=1)
+    return _ranking_metrics_from_counts(pos, count - pos)
+
+
+def _regression_kernel(
+    true: NDArray, pred: NDArray, weight: NDArray[np.float64]
+) -> Dict[str, NDArray[np.float64]]:
+    true = np.asarray(true, dtype=np.float64)
+    error = true - pred
+    num = weight.sum(axis=1)
+    sse = weight @ error**2
+    mse = _safe_divide(sse, num)
+    mean = _safe_divide(weight @ true, num)
+    # centered second moment, which is stable for targets with a large mean
+    sst = (weight * (true - mean[:, None]) ** 2).sum(axis=1)
+    # as in r2_score, constant targets give 1 for a perfect fit and 0 otherwise,
+    # and fewer than two examples give nan
+    r2 = np.where(sst > 0, 1 - _safe_divide(sse, sst), np.where(sse > 0, 0.0, 1.0))
+    return {
+        "mae": _safe_divide(weight @ np.abs(error), num),
+        "mse": mse,
+        "rmse": np.sqrt(mse),
+        "r2": np.where(num >= 2, r2, np.nan),
+    }
+
+
+def _multilabel_kernel(
+    true: NDArray, pred: NDArray, weight: NDArray[np.float64]
+) -> Dict[str, NDArray[np.float64]]:
+    true = label_matrix(true).astype(bool)
+    label = pred > 0.5
+    # [num_samples, num_labels]
+    tp = weight @ (label & true)
+    fp = weight @ (label & ~true)
+    fn = weight @ (~label & true)
+
+    out = {}
+    for average, (tp_, fp_, fn_) in [
+        ("micro", (tp.sum(axis=1), fp.sum(axis=1), fn.sum(axis=1))),
+        ("macro", (tp, fp, fn)),
+    ]:
+        for name, value in [
+            ("f1", _safe_divide(2 * tp_, 2 * tp_ + fp_ + fn_)),
+            ("recall", _safe_divide(tp_, tp_ + fn_)),
+            ("precision", _safe_divide(tp_, tp_ + fp_)),
+        ]:
+            out[f"multilabel_{name}_{average}"] = (
+                value.mean(axis=1) if value.ndim > 1 else value
+            )
+    return out
+
+
+def _multilabel_ranking_kernel(
+    true: NDArray, pred: NDArray, weight: NDArray[np.float64]
+) -> Dict[str, NDArray[np.float64]]:
+    true = label_matrix(true).astype(bool)
+    pred = np.asarray(pred, dtype=np.float64)
+    num_labels = true.shape[1]
+
+    # macro averages rank each label separately
+    macro = [_ranking_kernel(true[:, j], pred[:, j], weight) for j in range(num_labels)]
+    out = {
+        "multilabel_auprc_macro": np.nan_to_num(
+            [m["average_precision"] for m in macro]
+        ).mean(axis=0),
+        "multilabel_auroc_macro": np.mean([m["roc_auc"] for m in macro], axis=0),
+    }
+
+    # micro averages rank all (row, label) pairs together, with row weights
+    # repeated per label, in chunks of weightings of about 4M entries
+    chunk_size = max(1, (1 << 22) // max(true.size, 1))
+    micro: Dict[str, List[NDArray[np.float64]]] = {"auprc": [], "auroc": []}
+    for start in range(0, len(weight), chunk_size):
+        values = _ranking_kernel(
+            true.ravel(),
+            pred.ravel(),
+            np.repeat(weight[start : start + chunk_size], num_labels, axis=1),
+        )
+        micro["auprc"].append(values["average_precision"])
+        micro["auroc"].append(values["roc_auc"])
+    out["multilabel_auprc_micro"] = np.concatenate(micro["auprc"])
+    out["multilabel_auroc_micro"] = np.concatenate(micro["auroc"])
+    return out
+
+
+def _link_prediction_kernel(
+    pred_isin: NDArray, dst_count: NDArray, weight: NDArray[np.float64]
+) -> Dict[str, NDArray[np.float64]]:
+    is_pos = dst_count > 0
+    weight = weight[:, is_pos]
+    num = weight.sum(axis=1)
+    pred_isin, dst_count = pred_isin[is_pos], dst_count[is_pos]
+    return {
+        "link_prediction_recall": _safe_divide(
+            weight @ _link_prediction_recall_rows(pred_isin, dst_count), num
+        ),
+        "link_prediction_precision": _safe_divide(
+            weight @ _link_prediction_precision_rows(pred_isin, dst_count), num
+        ),
+        "link_prediction_map": _safe_divide(
+            weight @ _link_prediction_map_rows(pred_isin, dst_count), num
+        ),
+        "link_prediction_ndcg": _safe_divide(
+            weight @ _link_prediction_ndcg_rows(pred_isin, dst_count), num
+        ),
+    }
+
+
+_WEIGHTED_KERNELS = {
+    accuracy: _accuracy_kernel,
+    micro_f1: _accuracy_kernel,
+    f1: _f1_kernel,
+    macro_f1: _macro_f1_kernel,
+    roc_auc: _ranking_kernel,
+    average_precision: _ranking_kernel,
+    auprc: _ranking_kernel,
+    mae: _regression_kernel,
+    mse: _regression_kernel,
+    rmse: _regression_kernel,
+    r2: _regression_kernel,
+    multilabel_auprc_micro: _multilabel_ranking_kernel,
+    multilabel_auprc_macro: _multilabel_ranking_kernel,
+    multilabel_auroc_micro: _multilabel_ranking_kernel,
+    multilabel_auroc_macro: _multilabel_ranking_kernel,
+    multilabel_f1_micro: _multilabel_kernel,
+    multilabel_f1_macro: _multilabel_kernel,
+    multilabel_recall_micro: _multilabel_kernel,
+    multilabel_recall_macro: _multilabel_kernel,
+    multilabel_precision_micro: _multilabel_kernel,
+    multilabel_precision_macro: _multilabel_kernel,
+    link_prediction_recall: _link_prediction_kernel,
+    link_prediction_precision: _link_prediction_kernel,
+    link_prediction_map: _link_prediction_kernel,
+    link_prediction_ndcg: _link_prediction_kernel,
+}
+
+
+def _weighted_metrics(
+    metrics: List[Callable[[NDArray, NDArray], float]],
+    true: NDArray,
+    pred: NDArray,
+    weight: NDArray[np.float64],
+) -> Dict[str, NDArray[np.float64]]:
+    r"""Compute metrics for each row of the weight matrix."""
+
+    kernel_out: Dict[Callable, Dict[str, NDArray[np.float64]]] = {}
+    out = {}
+    for fn in metrics:
+        kernel = _WEIGHTED_KERNELS.get(fn)
+        if kernel is not None:
+            if kernel not in kernel_out:
+                kernel_out[kernel] = kernel(true, pred, weight)
+            values = kernel_out[kernel][fn.__name__]
+        else:
+            values = []
+            for w in weight.astype(np.int64):
+                index = np.repeat(np.arange(len(true)), w)
+                values.append(fn(true[index], pred[index]))
+        out[fn.__name__] = np.asarray(values, dtype=np.float64)
+    return out
+
+
+def bootstrap_metrics(
+    metrics: List[Callable[[NDArray, NDArray], float]],
+    true: NDArray,
+    pred: NDArray,
+    num_samples: int,
+    seed: int = 0,
+) -> Dict[str, NDArray[np.float64]]:
+    r"""Compute metrics on num_samples Poisson bootstrap resamples of the rows.
+
+    Args:
+        metrics: The metrics to bootstrap.
+        true: The first argument of the metrics, e.g. targets or pred_isin.
+        pred: The second argument of the metrics, e.g. predictions or dst_count.
+        num_samples: The number of resamples.
+        seed: The random seed of the resampling.
+
+    Returns:
+        A dictionary of metric names to arrays of num_samples values.
+    """
+
+    rng = np.random.default_rng(seed)
+    num_rows = len(true)
+    # bound the weight matrix to about 4M entries
+    chunk_size = max(1, (1 << 22) // max(num_rows, 1))
+
+    out: Dict[str, List[NDArray[np.float64]]] = {fn.__name__: [] for fn in metrics}
+    for start in range(0, num_samples, chunk_size):
+        size = min(chunk_size, num_samples - start)
+        weight = rng.poisson(1.0, size=(size, num_rows)).astype(np.float64)
+        for name, values in _weighted_metrics(metrics, true, pred, weight).items():
+            out[name].append(values)
+
+    return {name: np.concatenate(values) for name, values in out.items()}
+
+
+def bootstrap_ci(
+    metrics: List[Callable[[NDArray, NDArray], float]],
+    true: NDArray,
+    pred: NDArray,
+    num_samples: int,
+    confidence: float = 0.95,
+    seed: int = 0,
+) -> Dict[str, Tuple[float, float]]:
+    r"""Return percentile bootstrap confidence intervals of metrics, see
+    :func:`bootstrap_metrics`. Undefined values of resamples (e.g. roc_auc of a
+    resample with a single class) are ignored."""
+
+    samples = bootstrap_metrics(metrics, true, pred, num_samples, seed)
+    q = [(1 - confidence) / 2 * 100, (1 + confidence) / 2 * 100]
+    out = {}
+    for name, values in samples.items():
+        values = values[~np.isnan(values)]
+        lower, upper = np.percentile(values, q) if len(values) > 0 else (np.nan,) * 2
+        out[name] = (float(lower), float(upper))
+    return out
+
+
+def grouped_metrics(
+    metrics: List[Callable[[NDArray, NDArray], float]],
+    true: NDArray,
+    pred: NDArray,
+    group: NDArray,
+) -> Dict[Any, Dict[str, float]]:
+    r"""Compute metrics separately for each group of rows in a single grouped
+    pass.
+
+    Args:
+        metrics: The metrics to compute.
+        true: The first argument of the metrics, e.g. targets or pred_isin.
+        pred: The second argument of the metrics, e.g. predictions or dst_count.
+        group: The group label of each row.
+
+    Returns:
+        A dictionary of group labels (in sorted order) to dictionaries of metric
+        names to values. Metrics that are undefined for a group (e.g. roc_auc of
+        a group with a single class) are nan.
+    """
+
+    uniques, codes = np.unique(np.asarray(group), return_inverse=True)
+    codes = codes.reshape(-1)
+    # bound the weight matrix to about 4M entries
+    chunk_size = max(1, (1 << 22) // max(len(codes), 1))
+
+    out: Dict[Any, Dict[str, float]] = {}
+    for start in range(0, len(uniques), chunk_size):
+        end = min(start + chunk_size, len(uniques))
+        weight = (codes == np.arange(start, end)[:, None]).astype(np.float64)
+        values = _weighted_metrics(metrics, true, pred, weight)
+        for i in range(start, end):
+            out[uniques[i]] = {
+                name: float(value[i - start]) for name, value in values.items()
+            }
+    return out
+
+
+####### Streaming metric accumulators
+"""Accumulators compute metrics over mini-batches with bounded memory. Each
+accumulator provides
+    - update(...): Add a mini-batch, with the same arguments as the metrics.
+    - merge(other): Add the state of another accumulator of the same
+        configuration, e.g. from another evaluation process.
+    - compute(): Return a dictionary of metric names to values, named as the
+        corresponding metric functions above.
+"""
+
+
+def _bin_index(pred: NDArray[np.float64], num_bins: int) -> NDArray[np.int64]:
+    if pred.size > 0 and not (pred.min() >= 0 and pred.max() <= 1):
+        raise ValueError(
+            f"Scores need to be in [0, 1] to be binned (got scores in "
+            f"[{pred.min()}, {pred.max()}]). Apply a sigmoid to logits first."
+        )
+    # round first, so that multiples of 1 / num_bins fall into their own bin
+    index = np.floor(np.round(pred * num_bins, 6)).astype(np.int64)
+    return index.clip(0, num_bins - 1)
+
+
+class BinaryAccumulator:
+    r"""Streaming accumulator of binary classification metrics.
+
+    Computes accuracy and f1 exactly from confusion counts. Ranking metrics
+    (roc_auc, average_precision, auprc) are computed from a histogram of
+    `num_bins` equal-width score bins over [0, 1], i.e. scores are treated as
+    ties within a bin. They are exact if all scores are multiples of
+    1 / num_bins, and otherwise accurate to the bin width. Scores therefore need
+    to be probabilities, e.g. sigmoid outputs rather than logits.
+    """
+
+    def __init__(self, num_bins: int = 10000) -> None:
+        self.num_bins = num_bins
+        self.pos = np.zeros(num_bins, dtype=np.int64)
+        self.neg = np.zeros(num_bins, dtype=np.int64)
+        # true positive, false positive, false negative at pred >= 0.5
+        self.confusion = np.zeros(3, dtype=np.int64)
+        self.num_correct = 0
+        self.num_examples = 0
+
+    def update(self, true: NDArray[np.float64], pred: NDArray[np.float64]) -> None:
+        true = np.asarray(true).reshape(-1).astype(bool)
+        pred = np.asarray(pred).reshape(-1)
+        index = _bin_index(pred, self.num_bins)
+        self.pos += np.bincount(index[true], minlength=self.num_bins)
+        self.neg += np.bincount(index[~true], minlength=self.num_bins)
+
+        label = pred >= 0.5
+        self.confusion += [
+            (label & true).sum(),
+            (label & ~true).sum(),
+            (~label & true).sum(),
+        ]
+        self.num_correct += int(((pred > 0.5) == true).sum())
+        self.num_examples += len(true)
+
+    def merge(self, other: "BinaryAccumulator") -> None:
+        assert self.num_bins == other.num_bins
+        self.pos += other.pos
+        self.neg += other.neg
+        self.confusion += other.confusion
+        self.num_correct += other.num_correct
+        self.num_examples += other.num_examples
+
+    def compute(self) -> Dict[str, float]:
+        tp, fp, fn = self.confusion
+        out = _ranking_metrics_from_counts(self.pos[::-1], self.neg[::-1])
+        out = {name: float(value) for name, value in out.items()}
+        out["accuracy"] = self.num_correct / self.num_examples
+        out["f1"] = float(2 * tp / (2 * tp + fp + fn)) if tp + fp + fn > 0 else 0.0
+        return out
+
+
+class RegressionAccumulator:
+    r"""Streaming accumulator of regression metrics (mae, mse, rmse and r2).
+
+    All metrics are exact. The variance of the targets is accumulated with
+    Chan et al.'s parallel algorithm for numerical stability.
+    """
+
+    def __init__(self) -> None:
+        self.num_examples = 0
+        self.sum_abs_error = 0.0
+        self.sum_squared_error = 0.0
+        self.mean = 0.0
+        self.m2 = 0.0
+
+    def update(self, true: NDArray[np.float64], pred: NDArray[np.float64]) -> None:
+        true = np.asarray(true, dtype=np.float64).reshape(-1)
+        pred = np.asarray(pred, dtype=np.float64).reshape(-1)
+        error = true - pred
+        other = RegressionAccumulator()
+        other.num_examples = len(true)
+        other.sum_abs_error = float(np.abs(error).sum())
+        other.sum_squared_error = float((error**2).sum())
+        if len(true) > 0:
+            other.mean = float(true.mean())
+            other.m2 = float(((true - other.mean) ** 2).sum())
+        self.merge(other)
+
+    def merge(self, other: "RegressionAccumulator") -> None:
+        num_examples = self.num_examples + other.num_examples
+        if num_examples == 0:
+            return
+        delta = other.mean - self.mean
+        self.m2 += (
+            other.m2 + delta**2 * self.num_examples * other.num_examples / num_examples
+        )
+        self.mean += delta * other.num_examples / num_examples
+        self.num_examples = num_examples
+        self.sum_abs_error += other.sum_abs_error
+        self.sum_squared_error += other.sum_squared_error
+
+    def compute(self) -> Dict[str, float]:
+        mse = self.sum_squared_error / self.num_examples
+        return {
+            "mae": self.sum_abs_error / self.num_examples,
+            "mse": mse,
+            "rmse": float(np.sqrt(mse)),
+            # as in r2_score, constant targets give 1 for a perfect fit
+            "r2": (
+                1 - self.sum_squared_error / self.m2
+                if self.m2 > 0
+                else float(self.sum_squared_error == 0)
+            ),
+        }
+
+
+class MultilabelAccumulator:
+    r"""Streaming accumulator of multilabel classification metrics.
+
+    F1, precision and recall (micro and macro, at pred > 0.5) are exact. AUROC
+    and AUPRC (micro and macro) are computed from per-label score histograms as
+    in :class:`BinaryAccumulator`, so scores need to be in [0, 1].
+    """
+
+    def __init__(self, num_labels: int, num_bins: int = 1000) -> None:
+        self.num_labels = num_labels
+        self.num_bins = num_bins
+        self.pos = np.zeros((num_labels, num_bins), dtype=np.int64)
+        self.neg = np.zeros((num_labels, num_bins), dtype=np.int64)
+        # true positive, false positive, false negative per label at pred > 0.5
+        self.confusion = np.zeros((3, num_labels), dtype=np.int64)
+
+    def update(self, true: NDArray[np.int_], pred: NDArray[np.float64]) -> None:
+        true = label_matrix(true).astype(bool)
+        pred = np.asarray(pred)
+        index = _bin_index(pred, self.num_bins)
+        index += np.arange(self.num_labels) * self.num_bins
+        size = self.num_labels * self.num_bins
+        self.pos += np.bincount(index[true], minlength=size).reshape(self.pos.shape)
+        self.neg += np.bincount(index[~true], minlength=size).reshape(self.neg.shape)
+
+        label = pred > 0.5
+        self.confusion += [
+            (label & true).sum(axis=0),
+            (label & ~true).sum(axis=0),
+            (~label & true).sum(axis=0),
+        ]
+
+    def merge(self, other: "MultilabelAccumulator") -> None:
+        assert self.pos.shape == other.pos.shape
+        self.pos += other.pos
+        self.neg += other.neg
+        self.confusion += other.confusion
+
+    def compute(self) -> Dict[str, float]:
+        micro = _ranking_metrics_from_counts(
+            self.pos.sum(axis=0)[::-1], self.neg.sum(axis=0)[::-1]
+        )
+        macro = _ranking_metrics_from_counts(self.pos[:, ::-1], self.neg[:, ::-1])
+        out = {
+            "multilabel_auprc_micro": float(micro["average_precision"]),
+            "multilabel_auprc_macro": float(
+                np.nan_to_num(macro["average_precision"]).mean()
+            ),
+            "multilabel_auroc_micro": float(micro["roc_auc"]),
+            "multilabel_auroc_macro": float(macro["roc_auc"].mean()),
+        }
+
+        def _div(a: NDArray, b: NDArray) -> NDArray:
+            return np.divide(a, b, out=np.zeros(np.shape(a)), where=b > 0)
+
+        tp, fp, fn = self.confusion
+        for average, (tp_, fp_, fn_) in [
+            ("micro", (tp.sum(), fp.sum(), fn.sum())),
+            ("macro", (tp, fp, fn)),
+        ]:
+            f1 = _div(2 * tp_, 2 * tp_ + fp_ + fn_)
+            out[f"multilabel_f1_{average}"] = float(np.mean(f1))
+            out[f"multilabel_recall_{average}"] = float(np.mean(_div(tp_, tp_ + fn_)))
+            out[f"multilabel_precision_{average}"] = float(
+                np.mean(_div(tp_, tp_ + fp_))
+            )
+        return out
+
+
+class LinkPredictionAccumulator:
+    r"""Streaming accumulator of link prediction metrics.
+
+    All link prediction metrics are means over source nodes with at least one
+    destination node, so they are accumulated exactly as sums.
+
+    Args:
+        metrics: The link prediction metrics to accumulate. If None, use recall,
+            precision and map.
+    """
+
+    def __init__(
+        self,
+        metrics: Optional[List[Callable[[NDArray, NDArray], float]]] = None,
+    ) -> None:
+        if metrics is None:
+            metrics = [
+                link_prediction_recall,
+                link_prediction_precision,
+                link_prediction_map,
+            ]
+        self.metrics = list(metrics)
+        self.sums = np.zeros(len(self.metrics))
+        self.num_examples = 0
+
+    def update(self, pred_isin: NDArray[np.int_], dst_count: NDArray[np.int_]) -> None:
+        num_examples = int((dst_count > 0).sum())
+        if num_examples == 0:
+            return
+        self.sums += [fn(pred_isin, dst_count) * num_examples for fn in self.metrics]
+        self.num_examples += num_examples
+
+    def merge(self, other: "LinkPredictionAccumulator") -> None:
+        self.sums += other.sums
+        self.num_examples += other.num_examples
+
+    def compute(self) -> Dict[str, float]:
+        return {
+            fn.__name__: float(value / self.num_examples)
+            for fn, value in zip(self.metrics, self.sums)
+        }
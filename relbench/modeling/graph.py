@@ -1,4 +1,6 @@
 import os
+import time
+from concurrent.futures import ThreadPoolExecutor
 from typing import Any, Dict, NamedTuple, Optional, Tuple
 
 import numpy as np
@@ -17,11 +19,45 @@ from relbench.base import Database, EntityTask, RecommendationTask, Table, TaskT
 from relbench.modeling.utils import remove_pkey_fkey, to_unix_time
 
 
+def _materialize_table(
+    table: Table,
+    col_to_stype: Dict[str, stype],
+    text_embedder_cfg: Optional[TextEmbedderConfig],
+    path: Optional[str],
+) -> Tuple[pd.DataFrame, Dataset]:
+    r"""Materialize a table into a tensor frame dataset. Returns the data frame
+    used for materialization, which contains the foreign key columns."""
+    df = table.df
+    # Ensure that pkey is consecutive.
+    if table.pkey_col is not None:
+        assert (df[table.pkey_col].values == np.arange(len(df))).all()
+
+    # Remove pkey, fkey columns since they will not be used as input
+    # feature.
+    remove_pkey_fkey(col_to_stype, table)
+
+    if len(col_to_stype) == 0:  # Add constant feature in case df is empty:
+        col_to_stype = {"__const__": stype.numerical}
+        # We need to add edges later, so we need to also keep the fkeys
+        fkey_dict = {key: df[key] for key in table.fkey_col_to_pkey_table}
+        df = pd.DataFrame({"__const__": np.ones(len(table.df)), **fkey_dict})
+
+    dataset = Dataset(
+        df=df,
+        col_to_stype=col_to_stype,
+        col_to_text_embedder_cfg=text_embedder_cfg,
+    ).materialize(path=path)
+
+    return df, dataset
+
+
 def make_pkey_fkey_graph(
     db: Database,
     col_to_stype_dict: Dict[str, Dict[str, stype]],
     text_embedder_cfg: Optional[TextEmbedderConfig] = None,
     cache_dir: Optional[str] = None,
+    num_workers: int = 0,
+    profile: bool = False,
 ) -> Tuple[HeteroData, Dict[str, Dict[str, Dict[StatType, Any]]]]:
     r"""Given a :class:`Database` object, construct a heterogeneous graph with primary-
     foreign key relationships, together with the column stats of each table.
@@ -35,6 +71,10 @@ def make_pkey_fkey_graph(
             frames. If specified, we will either cache the file or use the
             cached file. If not specified, we will not use cached file and
             re-process everything from scratch without saving the cache.
+        num_workers: The number of threads materializing tables concurrently.
+            If 0, tables are materialized one after the other. Note that the text
+            embedder may be called from multiple threads at once.
+        profile: If True, print the time taken to materialize each table.
 
     Returns:
         HeteroData: The heterogeneous :class:`PyG` object with
@@ -46,34 +86,37 @@ def make_pkey_fkey_graph(
     if cache_dir is not None:
         os.makedirs(cache_dir, exist_ok=True)
 
-    for table_name, table in db.table_dict.items():
-        # Materialize the tables into tensor frames:
-        df = table.df
-        # Ensure that pkey is consecutive.
-        if table.pkey_col is not None:
-            assert (df[table.pkey_col].values == np.arange(len(df))).all()
-
-        col_to_stype = col_to_stype_dict[table_name]
-
-        # Remove pkey, fkey columns since they will not be used as input
-        # feature.
-        remove_pkey_fkey(col_to_stype, table)
-
-        if len(col_to_stype) == 0:  # Add constant feature in case df is empty:
-            col_to_stype = {"__const__": stype.numerical}
-            # We need to add edges later, so we need to also keep the fkeys
-            fkey_dict = {key: df[key] for key in table.fkey_col_to_pkey_table}
-            df = pd.DataFrame({"__const__": np.ones(len(table.df)), **fkey_dict})
-
+    # Materialize the tables into tensor frames:
+    def materialize(table_name: str) -> Tuple[pd.DataFrame, Dataset]:
+        tic = time.time()
         path = (
             None if cache_dir is None else os.path.join(cache_dir, f"{table_name}.pt")
         )
+        out = _materialize_table(
+            db.table_dict[table_name],
+            col_to_stype_dict[table_name],
+            text_embedder_cfg,
+            path,
+        )
+        if profile:
+            print(
+                f"Materialized table {table_name} in {time.time() - tic:.2f} seconds."
+            )
+        return out
+
+    table_names = list(db.table_dict.keys())
+    if num_workers > 0:
+        with ThreadPoolExecutor(max_workers=num_workers) as executor:
+            materialized = dict(
+                zip(table_names, executor.map(materialize, table_names))
+            )
+    else:
+        materialized = {name: materialize(name) for name in table_names}
 
-        dataset = Dataset(
-            df=df,
-            col_to_stype=col_to_stype,
-            col_to_text_embedder_cfg=text_embedder_cfg,
-        ).materialize(path=path)
+    # Assemble the graph:
+    for table_name in table_names:
+        table = db.table_dict[table_name]
+        df, dataset = materialized.pop(table_name)
 
         data[table_name].tf = dataset.tensor_frame
         col_stats_dict[table_name] = dataset.col_stats
@@ -206,16 +249,13 @@ def get_link_train_table_input(
     src_node_idx: Tensor = torch.from_numpy(
         table.df[task.src_entity_col].astype(int).values
     )
-    exploded = table.df[task.dst_entity_col].explode()
-    coo_indices = torch.from_numpy(
-        np.stack([exploded.index.values, exploded.values.astype(int)])
-    )
-    sparse_coo = torch.sparse_coo_tensor(
-        coo_indices,
-        torch.ones(coo_indices.size(1), dtype=bool),
+    ptr, values = task.get_dst_csr(table)
+    dst_node_indices = torch.sparse_csr_tensor(
+        torch.from_numpy(ptr),
+        torch.from_numpy(values.astype(np.int64)),
+        torch.ones(len(values), dtype=bool),
         (len(src_node_idx), task.num_dst_nodes),
-    )# 构建稀疏矩阵，coo_indices表示坐标，第二个参数表示按顺序的坐标的对应值，第三个参数表示矩阵大小
-    dst_node_indices = sparse_coo.to_sparse_csr()
+    )
 
     time: Optional[Tensor] = None
     if table.time_col is not None:
@@ -0,0 +1,285 @@
+from typing import Callable, Dict, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+import pandas as pd
+import torch
+from numpy.typing import NDArray
+from torch import Tensor
+
+import relbench.metrics
+from relbench.base import RecommendationTask, Table
+
+####### Link prediction metrics
+"""Torch counterparts of the link prediction metrics in :mod:`relbench.metrics`.
+They take top-k destination indices of size (num_src_nodes, eval_k) and the
+ground-truth destination nodes in CSR format, i.e. a row pointer of size
+(num_src_nodes + 1, ) and the destination nodes sorted within each row, and
+process source nodes in chunks of `chunk_size` rows on the device of the
+indices. Results match the NumPy metrics on the corresponding hit matrix.
+"""
+
+
+def csr_isin(
+    pred_index: Tensor,
+    ptr: Tensor,
+    values: Tensor,
+) -> Tensor:
+    r"""Return a boolean tensor of the same shape as `pred_index`, indicating
+    whether `pred_index[i, j]` is contained in the `i`-th row of the CSR matrix.
+    Values need to be sorted within each row."""
+
+    pred_isin = torch.zeros(pred_index.shape, dtype=torch.bool, device=values.device)
+    if values.numel() == 0:
+        return pred_isin
+
+    num_values = int(values.max()) + 1
+    row_index = torch.repeat_interleave(
+        torch.arange(ptr.numel() - 1, device=ptr.device), ptr.diff()
+    )
+    keys = row_index * num_values + values
+
+    valid = (pred_index >= 0) & (pred_index < num_values)
+    rows = torch.arange(pred_index.size(0), device=pred_index.device).view(-1, 1)
+    query = rows * num_values + torch.where(valid, pred_index, 0)
+    index = torch.searchsorted(keys, query).clamp(max=keys.numel() - 1)
+    return valid & (keys[index] == query)
+
+
+def _recall_rows(pred_isin: Tensor, dst_count: Tensor) -> Tensor:
+    return pred_isin.sum(dim=1) / dst_count
+
+
+def _precision_rows(pred_isin: Tensor, dst_count: Tensor) -> Tensor:
+    eval_k = pred_isin.size(1)
+    return pred_isin.sum(dim=1) / eval_k
+
+
+def _map_rows(pred_isin: Tensor, dst_count: Tensor) -> Tensor:
+    eval_k = pred_isin.size(1)
+    clipped_dst_count = dst_count.clamp(max=eval_k)
+    rank = torch.arange(1, eval_k + 1, device=pred_isin.device)
+    precision_mat = pred_isin.cumsum(dim=1) / rank
+    return (precision_mat * pred_isin).sum(dim=1) / clipped_dst_count
+
+
+def _ndcg_rows(pred_isin: Tensor, dst_count: Tensor) -> Tensor:
+    eval_k = pred_isin.size(1)
+    rank = torch.arange(1, eval_k + 1, device=pred_isin.device, dtype=torch.float64)
+    # discounted multiplier 1 / log2(i + 2) for i = 0, ..., k-1
+    discounted_multiplier = 1 / torch.log2(rank + 1)
+    discounted_cumulative_gain = (pred_isin * discounted_multiplier).sum(dim=1)
+    ideal_discounted_cumulative_gain = torch.cat(
+        [discounted_multiplier.new_zeros(1), discounted_multiplier.cumsum(dim=0)]
+    )[dst_count.clamp(min=0, max=eval_k)]
+    return discounted_cumulative_gain / ideal_discounted_cumulative_gain.clamp(
+        min=1e-10
+    )
+
+
+_ROW_FUNCTIONS: Dict[str, Callable[[Tensor, Tensor], Tensor]] = {
+    "link_prediction_recall": _recall_rows,
+    "link_prediction_precision": _precision_rows,
+    "link_prediction_map": _map_rows,
+    "link_prediction_ndcg": _ndcg_rows,
+}
+
+
+def link_prediction_rows(
+    pred_index: Tensor,
+    ptr: Tensor,
+    values: Tensor,
+    metrics: Optional[Sequence[str]] = None,
+    chunk_size: int = 1 << 16,
+) -> Dict[str, Tensor]:
+    r"""Compute per source node values of the link prediction metrics.
+
+    Args:
+        pred_index: Top-k destination indices of size (num_src_nodes, eval_k).
+        ptr: Row pointer of the ground-truth destination nodes.
+        values: Ground-truth destination nodes, sorted within each row.
+        metrics: Names of the metrics to compute. Defaults to all of recall,
+            precision, map and ndcg.
+        chunk_size: Number of source nodes whose hit matrix is materialized at
+            once.
+
+    Returns:
+        A dictionary mapping metric names to float64 tensors of size
+        (num_src_nodes, ). Values of source nodes without destination nodes are
+        undefined and excluded by :func:`link_prediction_metrics`.
+    """
+    if metrics is None:
+        metrics = list(_ROW_FUNCTIONS.keys())
+    for name in metrics:
+        if name not in _ROW_FUNCTIONS:
+            raise ValueError(f"Unsupported link prediction metric '{name}'.")
+
+    device = pred_index.device
+    ptr, values = ptr.to(device), values.to(device)
+    dst_count = ptr.diff()
+    out = {
+        name: torch.empty(pred_index.size(0), dtype=torch.float64, device=device)
+        for name in metrics
+    }
+
+    for start in range(0, pred_index.size(0), chunk_size):
+        end = min(start + chunk_size, pred_index.size(0))
+        # only the destination nodes of this chunk are searched
+        chunk_ptr = ptr[start : end + 1]
+        chunk_values = values[chunk_ptr[0] : chunk_ptr[-1]]
+        pred_isin = csr_isin(
+            pred_index[start:end], chunk_ptr - chunk_ptr[0], chunk_values
+        )
+        pred_isin = pred_isin.to(torch.float64)
+        for name in metrics:
+            out[name][start:end] = _ROW_FUNCTIONS[name](pred_isin, dst_count[start:end])
+
+    return out
+
+
+def link_prediction_metrics(
+    pred_index: Tensor,
+    ptr: Tensor,
+    values: Tensor,
+    metrics: Optional[Sequence[str]] = None,
+    chunk_size: int = 1 << 16,
+) -> Dict[str, float]:
+    r"""Compute link prediction metrics averaged over source nodes with at least
+    one destination node. See :func:`link_prediction_rows` for the arguments."""
+    rows = link_prediction_rows(pred_index, ptr, values, metrics, chunk_size)
+    is_pos = ptr.to(pred_index.device).diff() > 0
+    return {name: float(value[is_pos].mean()) for name, value in rows.items()}
+
+
+def link_prediction_recall(
+    pred_index: Tensor, ptr: Tensor, values: Tensor, chunk_size: int = 1 << 16
+) -> float:
+    return link_prediction_metrics(
+        pred_index, ptr, values, ["link_prediction_recall"], chunk_size
+    )["link_prediction_recall"]
+
+
+def link_prediction_precision(
+    pred_index: Tensor, ptr: Tensor, values: Tensor, chunk_size: int = 1 << 16
+) -> float:
+    return link_prediction_metrics(
+        pred_index, ptr, values, ["link_prediction_precision"], chunk_size
+    )["link_prediction_precision"]
+
+
+def link_prediction_map(
+    pred_index: Tensor, ptr: Tensor, values: Tensor, chunk_size: int = 1 << 16
+) -> float:
+    return link_prediction_metrics(
+        pred_index, ptr, values, ["link_prediction_map"], chunk_size
+    )["link_prediction_map"]
+
+
+def link_prediction_ndcg(
+    pred_index: Tensor, ptr: Tensor, values: Tensor, chunk_size: int = 1 << 16
+) -> float:
+    return link_prediction_metrics(
+        pred_index, ptr, values, ["link_prediction_ndcg"], chunk_size
+    )["link_prediction_ndcg"]
+
+
+def get_dst_csr_tensor(
+    task: RecommendationTask,
+    table: Table,
+    device: Optional[Union[str, torch.device]] = None,
+) -> Tuple[Tensor, Tensor]:
+    r"""Return :meth:`RecommendationTask.get_dst_csr` as tensors on `device`.
+
+    The result is cached in memory by :obj:`cache_manager` per task table and
+    device, so that the ground truth is transferred only once across evaluations.
+    """
+
+    device = torch.device(device) if device is not None else torch.device("cpu")
+
+    def to_tensor(table: Table) -> Tuple[Tensor, Tensor]:
+        ptr, values = task.get_dst_csr(table)
+        return (
+            torch.from_numpy(ptr).to(device),
+            torch.from_numpy(values.astype(np.int64)).to(device),
+        )
+
+    return task._cached_per_split(
+        table,
+        ("dst_csr_tensor", str(device)),
+        to_tensor,
+        nbytes=lambda csr: sum(t.numel() * t.element_size() for t in csr),
+    )
+
+
+def evaluate_link_prediction(
+    task: RecommendationTask,
+    pred_index: Tensor,
+    target_table: Optional[Table] = None,
+    metrics: Optional[List[Callable]] = None,
+    chunk_size: int = 1 << 16,
+    bootstrap: int = 0,
+    group_by: Optional[Union[str, NDArray, List[Union[str, NDArray]]]] = None,
+) -> Dict[str, float]:
+    r"""Evaluate top-k destination indices of a recommendation task on their
+    device, e.g. the output of :func:`torch.topk`.
+
+    Takes the same arguments and returns the same metrics (including per time
+    window and per group metrics) as :meth:`RecommendationTask.evaluate`, except
+    that `pred_index` is a tensor. Bootstrap intervals and metrics other than
+    recall, precision, map and ndcg are computed by
+    :meth:`RecommendationTask.evaluate` on the CPU.
+    """
+
+    if metrics is None:
+        metrics = task.metrics
+
+    if target_table is None:
+        target_table = task.get_table("test", mask_input_cols=False)
+
+    expected_pred_shape = (len(target_table), task.eval_k)
+    if tuple(pred_index.shape) != expected_pred_shape:
+        raise ValueError(
+            f"The shape of pred must be {expected_pred_shape}, but "
+            f"{tuple(pred_index.shape)} given."
+        )
+
+    names = [fn.__name__ for fn in metrics]
+    if bootstrap > 0 or any(name not in _ROW_FUNCTIONS for name in names):
+        # use the NumPy counterparts of the metrics of this module
+        metrics = [
+            (
+                getattr(relbench.metrics, fn.__name__)
+                if fn.__name__ in _ROW_FUNCTIONS
+                else fn
+            )
+            for fn in metrics
+        ]
+        return task.evaluate(
+            pred_index.cpu().numpy(), target_table, metrics, bootstrap, group_by
+        )
+
+    ptr, values = get_dst_csr_tensor(task, target_table, pred_index.device)
+    rows = link_prediction_rows(pred_index, ptr, values, names, chunk_size)
+    is_pos = ptr.diff() > 0
+
+    res = {name: float(rows[name][is_pos].mean()) for name in names}
+
+    # per group means over source nodes with destination nodes, as in
+    # relbench.metrics.grouped_metrics
+    group_by = task._eval_group_by(group_by)
+    for group in task._group_arrays(target_table, group_by):
+        is_time = np.issubdtype(group.dtype, np.datetime64)
+        labels, codes = np.unique(group, return_inverse=True)
+        codes = torch.from_numpy(codes.reshape(-1)).to(is_pos.device)[is_pos]
+        count = torch.bincount(codes, minlength=len(labels))
+        means = {}
+        for name in names:
+            total = torch.zeros(len(labels), dtype=torch.float64, device=count.device)
+            total.index_add_(0, codes, rows[name][is_pos])
+            means[name] = torch.where(count > 0, total / count.clamp(min=1), 0.0)
+            means[name] = means[name].tolist()
+        for i, label in enumerate(labels):
+            label = pd.Timestamp(label) if is_time else label
+            for name in names:
+                res[f"{name}/{label}"] = means[name][i]
+
+    return res
@@ -0,0 +1,166 @@
+import hashlib
+import json
+import os
+import threading
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+import torch
+from torch import Tensor
+
+# one lock per store, shared by all embedders of this process
+_store_locks: Dict[str, threading.Lock] = {}
+_store_locks_lock = threading.Lock()
+
+
+def _store_lock(path: Path) -> threading.Lock:
+    with _store_locks_lock:
+        return _store_locks.setdefault(str(path.resolve()), threading.Lock())
+
+
+class CachedTextEmbedder:
+    r"""Wrap a text embedder with a deduplicated, persistent embedding store.
+
+    Only unique texts that are not in the store yet are embedded; all other
+    embeddings are read back from a memory-mapped file. Pass it as
+    :obj:`text_embedder` of a :class:`TextEmbedderConfig` (preferably with
+    `batch_size=None`, so that whole columns are deduplicated at once).
+
+    The store is located at `{cache_dir}/{name}` and consists of
+    `vectors.bin` (float32 embeddings, one row per text), `keys.bin` (16-byte
+    BLAKE2b digests of the texts, in the same order) and `meta.json`. It may be
+    shared across tables, datasets and runs, and by multiple embedders and
+    threads of one process, but not by concurrently writing processes.
+
+    Args:
+        text_embedder: The text embedder mapping a list of texts to a tensor of
+            size (num_texts, dim).
+        cache_dir: The directory of embedding stores.
+        name: Identifies the text embedder (e.g., model name and version).
+            Embedders with different outputs must use different names.
+        batch_size: The mini-batch size used for embedding unseen texts. If
+            None, all unseen texts are embedded at once.
+    """
+
+    def __init__(
+        self,
+        text_embedder: Callable[[List[str]], Tensor],
+        cache_dir: str,
+        name: str,
+        batch_size: Optional[int] = None,
+    ):
+        self.text_embedder = text_embedder
+        self.path = Path(cache_dir) / name
+        self.batch_size = batch_size
+
+        self.path.mkdir(parents=True, exist_ok=True)
+        self._lock = _store_lock(self.path)
+        self.dim: Optional[int] = None
+        self._index: Dict[bytes, int] = {}
+        with self._lock:
+            self._sync()
+
+    def _sync(self) -> None:
+        r"""Reload the index if the store was appended to since it was loaded,
+        e.g. by another embedder of the same store."""
+        if self.dim is None:
+            if not (self.path / "meta.json").exists():
+                return
+            with open(self.path / "meta.json") as f:
+                self.dim = json.load(f)["dim"]
+        sizes = [
+            os.path.getsize(path) if path.exists() else 0
+            for path in [self.path / "vectors.bin", self.path / "keys.bin"]
+        ]
+        # the store also disagrees with the index after interrupted writes
+        if sizes != [len(self._index) * 4 * self.dim, len(self._index) * 16]:
+            self._load_index()
+
+    def _load_index(self) -> None:
+        vectors_path, keys_path = self.path / "vectors.bin", self.path / "keys.bin"
+        vectors_path.touch()
+        keys_path.touch()
+        # only keep texts whose embedding and key were fully written, and drop
+        # the rest so that later appends stay aligned
+        num_rows = min(
+            os.path.getsize(vectors_path) // (4 * self.dim),
+            os.path.getsize(keys_path) // 16,
+        )
+        os.truncate(vectors_path, num_rows * 4 * self.dim)
+        os.truncate(keys_path, num_rows * 16)
+
+        data = keys_path.read_bytes()
+        self._index = {data[16 * i : 16 * (i + 1)]: i for i in range(num_rows)}
+
+    def __len__(self) -> int:
+        r"""Return the number of texts in the store."""
+        with self._lock:
+            self._sync()
+            return len(self._index)
+
+    def __call__(self, sentences: List[str]) -> Tensor:
+        keys = [
+            hashlib.blake2b(sentence.encode("utf-8"), digest_size=16).digest()
+            for sentence in sentences
+        ]
+
+        with self._lock:
+            self._sync()
+            unseen = {}
+            for key, sentence in zip(keys, sentences):
+                if key not in self._index and key not in unseen:
+                    unseen[key] = sentence
+        # the lock is not held while embedding, so that embedders of the same
+        # store (e.g., of different tables) run concurrently
+        if len(unseen) > 0:
+            self._embed(list(unseen.keys()), list(unseen.values()))
+
+        with self._lock:
+            self._sync()
+            rows = np.fromiter((self._index[key] for key in keys), dtype=np.int64)
+            if len(rows) == 0:
+                return torch.zeros(0, self.dim or 0)
+            vectors = np.memmap(
+                self.path / "vectors.bin",
+                dtype=np.float32,
+                mode="r",
+                shape=(len(self._index), self.dim),
+            )
+            return torch.from_numpy(vectors[rows])
+
+    def _embed(self, keys: List[bytes], sentences: List[str]) -> None:
+        batch_size = self.batch_size or len(sentences)
+        for start in range(0, len(sentences), batch_size):
+            emb = self.text_embedder(sentences[start : start + batch_size])
+            emb = emb.detach().cpu().numpy().astype(np.float32)
+            with self._lock:
+                self._append(keys[start : start + batch_size], emb)
+
+    def _append(self, keys: List[bytes], emb: np.ndarray) -> None:
+        r"""Append embeddings to the store. Must be called with the lock held."""
+        self._sync()
+        if self.dim is None:
+            self.dim = emb.shape[1]
+            with open(self.path / "meta.json", "w") as f:
+                json.dump({"dim": self.dim}, f)
+        assert emb.shape[1] == self.dim
+
+        # skip texts embedded by another embedder in the meantime
+        new = [i for i, key in enumerate(keys) if key not in self._index]
+        if len(new) == 0:
+            return
+        keys = [keys[i] for i in new]
+        emb = emb[new]
+
+        # vectors are written before their keys, so that interrupted writes
+        # leave no keys without embeddings
+        with open(self.path / "vectors.bin", "ab") as f:
+            f.write(emb.tobytes())
+        with open(self.path / "keys.bin", "ab") as f:
+            # row ids are taken from the store, which is aligned with the
+            # index after _sync
+            offset = f.tell() // 16
+            f.write(b"".join(keys))
+        for i, key in enumerate(keys):
+            self._index[key] = offset + i
@@ -1,12 +1,12 @@
 import json
 import pkgutil
 from collections import defaultdict
-from functools import lru_cache
 from typing import List
 
 import pooch
 
 from relbench.base import BaseTask
+from relbench.base.cache import cache_manager
 from relbench.datasets import get_dataset
 from relbench.tasks import amazon, avito, event, f1, hm, stack, trial
 
@@ -67,7 +67,6 @@ def download_task(dataset_name: str, task_name: str) -> None:
     )
 
 
-@lru_cache(maxsize=None)
 def get_task(dataset_name: str, task_name: str, download=False) -> BaseTask:
     r"""Return a task object by name.
 
@@ -87,13 +86,19 @@ def get_task(dataset_name: str, task_name: str, download=False) -> BaseTask:
     Once the task tables are cached, either because of download or computing from
     scratch, the cache will be used. `download=True` will verify that the
     cached task tables matches the RelBench version even in this case.
+
+    The task object is cached in memory by :obj:`cache_manager`.
     """
 
-    if download:
-        download_task(dataset_name, task_name)
-    dataset = get_dataset(dataset_name)
-    cls, args, kwargs = task_registry[dataset_name][task_name]
-    task = cls(dataset, *args, **kwargs)
+    key = ("get_task", dataset_name, task_name, download)
+    task = cache_manager.get(key)
+    if task is None:
+        if download:
+            download_task(dataset_name, task_name)
+        dataset = get_dataset(dataset_name)
+        cls, args, kwargs = task_registry[dataset_name][task_name]
+        task = cls(dataset, *args, **kwargs)
+        cache_manager.put(key, task)
     return task
 
 
@@ -1,7 +1,17 @@
-import duckdb
+from typing import Optional
+
+import numpy as np
 import pandas as pd
 
-from relbench.base import Database, EntityTask, RecommendationTask, Table, TaskType
+from relbench.base import (
+    ActivityBitmap,
+    Database,
+    EntityTask,
+    RecommendationTask,
+    Table,
+    TaskType,
+    run_query,
+)
 from relbench.metrics import (
     accuracy,
     average_precision,
@@ -16,6 +26,34 @@ from relbench.metrics import (
 )
 
 
+def _churn_from_bitmap(
+    bitmap: Optional[ActivityBitmap],
+    timestamps: "pd.Series[pd.Timestamp]",
+    entity_col: str,
+) -> Optional[pd.DataFrame]:
+    r"""Compute churn labels of entities active in the window before each
+    timestamp from an activity bitmap with windows of length timedelta. Returns
+    None if the timestamps are not window boundaries."""
+
+    if bitmap is None or not all(bitmap.is_boundary(t) for t in timestamps):
+        return None
+
+    dfs = []
+    for timestamp in timestamps:
+        active = bitmap.active_at(timestamp)
+        future = bitmap.active_at(timestamp + bitmap.granularity)
+        dfs.append(
+            pd.DataFrame(
+                {
+                    "timestamp": timestamp,
+                    entity_col: active,
+                    "churn": (~np.isin(active, future)).astype(np.int32),
+                }
+            )
+        )
+    return pd.concat(dfs, ignore_index=True)
+
+
 class UserChurnTask(EntityTask):
     r"""Churn for a customer is 1 if the customer does not review any product in the
     time window, else 0."""
@@ -34,35 +72,55 @@ class UserChurnTask(EntityTask):
         review = db.table_dict["review"].df
         timestamp_df = pd.DataFrame({"timestamp": timestamps})
 
-        df = duckdb.sql(
-            f"""
+        # entities with a review in the window before the timestamp, from the
+        # activity bitmap of the review table if the timestamps are boundaries
+        bitmap = self._get_activity_bitmap(db, "review", "customer_id")
+        df = _churn_from_bitmap(bitmap, timestamps, "customer_id")
+        if df is not None:
+            return Table(
+                df=df,
+                fkey_col_to_pkey_table={self.entity_col: self.entity_table},
+                pkey_col=None,
+                time_col=self.time_col,
+            )
+
+        df = run_query(
+            """
+            WITH
+            REVIEW_WINDOW AS (
+                SELECT
+                    t.timestamp,
+                    review.customer_id,
+                    review.review_time > t.timestamp AS is_future
+                FROM
+                    timestamp_df t
+                JOIN
+                    review
+                ON
+                    review.review_time > t.timestamp - $timedelta AND
+                    review.review_time <= t.timestamp + $timedelta
+            )
             SELECT
-                timestamp,
-                customer_id,
-                CAST(
-                    NOT EXISTS (
-                        SELECT 1
-                        FROM review
-                        WHERE
-                            review.customer_id = customer.customer_id AND
-                            review_time > timestamp AND
-                            review_time <= timestamp + INTERVAL '{self.timedelta}'
-                    ) AS INTEGER
-                ) AS churn
+                w.timestamp,
+                w.customer_id,
+                CAST(NOT BOOL_OR(w.is_future) AS INTEGER) AS churn
             FROM
-                timestamp_df,
-                customer,
-            WHERE
-                EXISTS (
-                    SELECT 1
-                    FROM review
-                    WHERE
-                        review.customer_id = customer.customer_id AND
-                        review_time > timestamp - INTERVAL '{self.timedelta}' AND
-                        review_time <= timestamp
-                )
-            """
-        ).df()
+                review_window w
+            JOIN
+                customer
+            ON
+                customer.customer_id = w.customer_id
+            GROUP BY
+                w.timestamp,
+                w.customer_id
+            HAVING
+                BOOL_OR(NOT w.is_future)
+            """,
+            params={"timedelta": self.timedelta},
+            customer=customer,
+            review=review,
+            timestamp_df=timestamp_df,
+        )
 
         return Table(
             df=df,
@@ -90,38 +148,49 @@ class UserLTVTask(EntityTask):
         review = db.table_dict["review"].df
         timestamp_df = pd.DataFrame({"timestamp": timestamps})
 
-        df = duckdb.sql(
-            f"""
+        df = run_query(
+            """
+            WITH
+            REVIEW_WINDOW AS (
+                SELECT
+                    t.timestamp,
+                    review.customer_id,
+                    review.product_id,
+                    review.review_time > t.timestamp AS is_future
+                FROM
+                    timestamp_df t
+                JOIN
+                    review
+                ON
+                    review.review_time > t.timestamp - $timedelta AND
+                    review.review_time <= t.timestamp + $timedelta
+            )
             SELECT
-                timestamp,
-                customer_id,
-                ltv,
+                w.timestamp,
+                w.customer_id,
+                COALESCE(SUM(product.price) FILTER (WHERE w.is_future), 0) AS ltv,
             FROM
-                timestamp_df,
-                customer,
-                (
-                    SELECT
-                        COALESCE(SUM(price), 0) as ltv,
-                    FROM
-                        review,
-                        product
-                    WHERE
-                        review.customer_id = customer.customer_id AND
-                        review.product_id = product.product_id AND
-                        review_time > timestamp AND
-                        review_time <= timestamp + INTERVAL '{self.timedelta}'
-                )
-            WHERE
-                EXISTS (
-                    SELECT 1
-                    FROM review
-                    WHERE
-                        review.customer_id = customer.customer_id AND
-                        review_time > timestamp - INTERVAL '{self.timedelta}' AND
-                        review_time <= timestamp
-                )
-            """
-        ).df()
+                review_window w
+            JOIN
+                customer
+            ON
+                customer.customer_id = w.customer_id
+            LEFT JOIN
+                product
+            ON
+                product.product_id = w.product_id
+            GROUP BY
+                w.timestamp,
+                w.customer_id
+            HAVING
+                BOOL_OR(NOT w.is_future)
+            """,
+            params={"timedelta": self.timedelta},
+            product=product,
+            customer=customer,
+            review=review,
+            timestamp_df=timestamp_df,
+        )
 
         return Table(
             df=df,
@@ -149,35 +218,55 @@ class ItemChurnTask(EntityTask):
         review = db.table_dict["review"].df
         timestamp_df = pd.DataFrame({"timestamp": timestamps})
 
-        df = duckdb.sql(
-            f"""
+        # entities with a review in the window before the timestamp, from the
+        # activity bitmap of the review table if the timestamps are boundaries
+        bitmap = self._get_activity_bitmap(db, "review", "product_id")
+        df = _churn_from_bitmap(bitmap, timestamps, "product_id")
+        if df is not None:
+            return Table(
+                df=df,
+                fkey_col_to_pkey_table={self.entity_col: self.entity_table},
+                pkey_col=None,
+                time_col=self.time_col,
+            )
+
+        df = run_query(
+            """
+            WITH
+            REVIEW_WINDOW AS (
+                SELECT
+                    t.timestamp,
+                    review.product_id,
+                    review.review_time > t.timestamp AS is_future
+                FROM
+                    timestamp_df t
+                JOIN
+                    review
+                ON
+                    review.review_time > t.timestamp - $timedelta AND
+                    review.review_time <= t.timestamp + $timedelta
+            )
             SELECT
-                timestamp,
-                product_id,
-                CAST(
-                    NOT EXISTS (
-                        SELECT 1
-                        FROM review
-                        WHERE
-                            review.product_id = product.product_id AND
-                            review_time > timestamp AND
-                            review_time <= timestamp + INTERVAL '{self.timedelta}'
-                    ) AS INTEGER
-                ) AS churn
+                w.timestamp,
+                w.product_id,
+                CAST(NOT BOOL_OR(w.is_future) AS INTEGER) AS churn
             FROM
-                timestamp_df,
-                product,
-            WHERE
-                EXISTS (
-                    SELECT 1
-                    FROM review
-                    WHERE
-                        review.product_id = product.product_id AND
-                        review_time > timestamp - INTERVAL '{self.timedelta}' AND
-                        review_time <= timestamp
-                )
-            """
-        ).df()
+                review_window w
+            JOIN
+                product
+            ON
+                product.product_id = w.product_id
+            GROUP BY
+                w.timestamp,
+                w.product_id
+            HAVING
+                BOOL_OR(NOT w.is_future)
+            """,
+            params={"timedelta": self.timedelta},
+            product=product,
+            review=review,
+            timestamp_df=timestamp_df,
+        )
 
         return Table(
             df=df,
@@ -205,25 +294,32 @@ class ItemLTVTask(EntityTask):
         review = db.table_dict["review"].df
         timestamp_df = pd.DataFrame({"timestamp": timestamps})
 
-        df = duckdb.sql(
-            f"""
+        df = run_query(
+            """
             SELECT
-                timestamp,
+                t.timestamp,
                 product.product_id,
                 COALESCE(SUM(price), 0) AS ltv,
             FROM
-                timestamp_df,
-                product,
+                timestamp_df t
+            JOIN
                 review
-            WHERE
-                review.product_id = product.product_id AND
-                review_time > timestamp AND
-                review_time <= timestamp + INTERVAL '{self.timedelta}'
+            ON
+                review.review_time > t.timestamp AND
+                review.review_time <= t.timestamp + $timedelta
+            JOIN
+                product
+            ON
+                review.product_id = product.product_id
             GROUP BY
-                timestamp,
+                t.timestamp,
                 product.product_id
-            """
-        ).df()
+            """,
+            params={"timedelta": self.timedelta},
+            product=product,
+            review=review,
+            timestamp_df=timestamp_df,
+        )
 
         return Table(
             df=df,
@@ -252,8 +348,8 @@ class UserItemPurchaseTask(RecommendationTask):
         review = db.table_dict["review"].df
         timestamp_df = pd.DataFrame({"timestamp": timestamps})
 
-        df = duckdb.sql(
-            f"""
+        df = run_query(
+            """
             SELECT
                 t.timestamp,
                 review.customer_id,
@@ -264,14 +360,17 @@ class UserItemPurchaseTask(RecommendationTask):
                 review
             ON
                 review.review_time > t.timestamp AND
-                review.review_time <= t.timestamp + INTERVAL '{self.timedelta} days'
+                review.review_time <= t.timestamp + $timedelta
             WHERE
                 review.customer_id is not null and review.product_id is not null
             GROUP BY
                 t.timestamp,
                 review.customer_id
-            """
-        ).df()
+            """,
+            params={"timedelta": self.timedelta},
+            review=review,
+            timestamp_df=timestamp_df,
+        )
 
         return Table(
             df=df,
@@ -303,8 +402,8 @@ class UserItemRateTask(RecommendationTask):
         review = db.table_dict["review"].df
         timestamp_df = pd.DataFrame({"timestamp": timestamps})
 
-        df = duckdb.sql(
-            f"""
+        df = run_query(
+            """
                 SELECT
                     t.timestamp,
                     review.customer_id,
@@ -315,7 +414,7 @@ class UserItemRateTask(RecommendationTask):
                     review
                 ON
                     review.review_time > t.timestamp AND
-                    review.review_time <= t.timestamp + INTERVAL '{self.timedelta} days'
+                    review.review_time <= t.timestamp + $timedelta
                 WHERE
                     review.customer_id IS NOT NULL
                     AND review.product_id IS NOT NULL
@@ -323,8 +422,11 @@ class UserItemRateTask(RecommendationTask):
                 GROUP BY
                     t.timestamp,
                     review.customer_id
-            """
-        ).df()
+            """,
+            params={"timedelta": self.timedelta},
+            review=review,
+            timestamp_df=timestamp_df,
+        )
 
         return Table(
             df=df,
@@ -360,8 +462,8 @@ class UserItemReviewTask(RecommendationTask):
             300  # minimum length of review to be considered as detailed review
         )
 
-        df = duckdb.sql(
-            f"""
+        df = run_query(
+            """
                 SELECT
                     t.timestamp,
                     review.customer_id,
@@ -372,16 +474,19 @@ class UserItemReviewTask(RecommendationTask):
                     review
                 ON
                     review.review_time > t.timestamp AND
-                    review.review_time <= t.timestamp + INTERVAL '{self.timedelta} days'
+                    review.review_time <= t.timestamp + $timedelta
                 WHERE
                     review.customer_id IS NOT NULL
                     AND review.product_id IS NOT NULL
-                    AND (LENGTH(review.review_text) > {REVIEW_LENGTH} AND review.review_text IS NOT NULL)
+                    AND (LENGTH(review.review_text) > $review_length AND review.review_text IS NOT NULL)
                 GROUP BY
                     t.timestamp,
                     review.customer_id
-            """
-        ).df()
+            """,
+            params={"timedelta": self.timedelta, "review_length": REVIEW_LENGTH},
+            review=review,
+            timestamp_df=timestamp_df,
+        )
 
         return Table(
             df=df,
@@ -1,7 +1,13 @@
-import duckdb
 import pandas as pd
 
-from relbench.base import Database, EntityTask, RecommendationTask, Table, TaskType
+from relbench.base import (
+    Database,
+    EntityTask,
+    RecommendationTask,
+    Table,
+    TaskType,
+    run_query,
+)
 from relbench.metrics import (
     accuracy,
     average_precision,
@@ -32,8 +38,8 @@ class AdCTRTask(EntityTask):
         ads_info = db.table_dict["AdsInfo"].df
         search_stream = db.table_dict["SearchStream"].df
         timestamp_df = pd.DataFrame({"timestamp": timestamps})
-        df = duckdb.sql(
-            f"""
+        df = run_query(
+            """
             SELECT
                 search_ads.AdID,
                 t.timestamp,
@@ -49,14 +55,18 @@ class AdCTRTask(EntityTask):
             ) search_ads
             ON
                 search_ads.SearchDate > t.timestamp AND
-                search_ads.SearchDate <= t.timestamp + INTERVAL '{self.timedelta} days'
+                search_ads.SearchDate <= t.timestamp + $timedelta
             GROUP BY
                 t.timestamp,
                 search_ads.AdID
             HAVING
                 SUM(search_ads.isClick) > 0
-            """
-        ).df()
+            """,
+            params={"timedelta": self.timedelta},
+            ads_info=ads_info,
+            search_stream=search_stream,
+            timestamp_df=timestamp_df,
+        )
 
         return Table(
             df=df,
@@ -81,8 +91,8 @@ class UserVisitsTask(EntityTask):
         user_info = db.table_dict["UserInfo"].df
         visits_stream = db.table_dict["VisitStream"].df
         timestamp_df = pd.DataFrame({"timestamp": timestamps})
-        df = duckdb.sql(
-            f"""
+        df = run_query(
+            """
             SELECT
                 visit_ads.UserID,
                 t.timestamp,
@@ -99,12 +109,16 @@ class UserVisitsTask(EntityTask):
             ) visit_ads
             ON
                 visit_ads.ViewDate > t.timestamp AND
-                visit_ads.ViewDate <= t.timestamp + INTERVAL '{self.timedelta} days'
+                visit_ads.ViewDate <= t.timestamp + $timedelta
             GROUP BY
                 t.timestamp,
                 visit_ads.UserID
-            """
-        ).df()
+            """,
+            params={"timedelta": self.timedelta},
+            user_info=user_info,
+            visits_stream=visits_stream,
+            timestamp_df=timestamp_df,
+        )
 
         return Table(
             df=df,
@@ -131,8 +145,8 @@ class UserClicksTask(EntityTask):
         search_info = db.table_dict["SearchInfo"].df
         search_stream = db.table_dict["SearchStream"].df
         timestamp_df = pd.DataFrame({"timestamp": timestamps})
-        df = duckdb.sql(
-            f"""
+        df = run_query(
+            """
             SELECT
                 search_ads.UserID,
                 t.timestamp,
@@ -156,12 +170,17 @@ class UserClicksTask(EntityTask):
             ) search_ads
             ON
                 search_ads.SearchDate > t.timestamp AND
-                search_ads.SearchDate <= t.timestamp + INTERVAL '{self.timedelta} days'
+                search_ads.SearchDate <= t.timestamp + $timedelta
             GROUP BY
                 t.timestamp,
                 search_ads.UserID
-            """
-        ).df()
+            """,
+            params={"timedelta": self.timedelta},
+            user_info=user_info,
+            search_info=search_info,
+            search_stream=search_stream,
+            timestamp_df=timestamp_df,
+        )
 
         return Table(
             df=df,
@@ -191,8 +210,8 @@ class UserAdVisitTask(RecommendationTask):
         visits_stream = db.table_dict["VisitStream"].df
         timestamp_df = pd.DataFrame({"timestamp": timestamps})
 
-        df = duckdb.sql(
-            f"""
+        df = run_query(
+            """
             SELECT
                 visit_ads.UserID,
                 t.timestamp,
@@ -209,12 +228,16 @@ class UserAdVisitTask(RecommendationTask):
             ) visit_ads
             ON
                 visit_ads.ViewDate > t.timestamp AND
-                visit_ads.ViewDate <= t.timestamp + INTERVAL '{self.timedelta} days'
+                visit_ads.ViewDate <= t.timestamp + $timedelta
             GROUP BY
                 t.timestamp,
                 visit_ads.UserID
-            """
-        ).df()
+            """,
+            params={"timedelta": self.timedelta},
+            user_info=user_info,
+            visits_stream=visits_stream,
+            timestamp_df=timestamp_df,
+        )
         return Table(
             df=df,
             fkey_col_to_pkey_table={
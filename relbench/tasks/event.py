@@ -1,7 +1,6 @@
-import duckdb
 import pandas as pd
 
-from relbench.base import Database, EntityTask, Table, TaskType
+from relbench.base import Database, EntityTask, Table, TaskType, run_query
 from relbench.metrics import accuracy, average_precision, f1, mae, r2, rmse, roc_auc
 
 
@@ -24,8 +23,8 @@ class UserAttendanceTask(EntityTask):
         event_interest = db.table_dict["event_interest"].df
         timestamp_df = pd.DataFrame({"timestamp": timestamps})
 
-        df = duckdb.sql(
-            f"""SELECT
+        df = run_query(
+            """SELECT
                 t.timestamp,
                 event_attendees.user_id AS user,
                 SUM(CASE WHEN event_attendees.status IN ('yes', 'maybe') THEN 1 ELSE 0 END) AS target
@@ -35,12 +34,15 @@ class UserAttendanceTask(EntityTask):
                 event_attendees
             ON
                 event_attendees.start_time > t.timestamp AND
-                event_attendees.start_time <= t.timestamp + INTERVAL '{self.timedelta} days'
+                event_attendees.start_time <= t.timestamp + $timedelta
             GROUP BY
                 t.timestamp,
                 event_attendees.user_id
-            """
-        ).df()
+            """,
+            params={"timedelta": self.timedelta},
+            event_attendees=event_attendees,
+            timestamp_df=timestamp_df,
+        )
         df = df.dropna(subset=["user"])
         df["user"] = df["user"].astype(int)
         df = df.reset_index()
@@ -66,6 +68,8 @@ class UserRepeatTask(EntityTask):
     timedelta = pd.Timedelta(days=7)
     metrics = [accuracy, average_precision, f1, roc_auc]
     target_col = "target"
+    # prev_target reads the preceding windows passed to make_table
+    independent_windows = False
 
     def make_table(self, db: Database, timestamps: "pd.Series[pd.Timestamp]") -> Table:
         users = db.table_dict["users"].df
@@ -86,8 +90,8 @@ class UserRepeatTask(EntityTask):
             )
             timestamp_df = pd.concat([new_row, timestamp_df], ignore_index=True)
 
-        df = duckdb.sql(
-            f"""
+        df = run_query(
+            """
             WITH tb AS(
                 SELECT
                     t.timestamp AS timestamp,
@@ -100,7 +104,7 @@ class UserRepeatTask(EntityTask):
                     event_attendees
                 ON
                     event_attendees.start_time > t.timestamp AND
-                    event_attendees.start_time <= t.timestamp + INTERVAL '{self.timedelta} days'
+                    event_attendees.start_time <= t.timestamp + $timedelta
                 GROUP BY
                     t.timestamp,
                     event_attendees.user_id
@@ -113,8 +117,11 @@ class UserRepeatTask(EntityTask):
                 tb
             WHERE
                 prev_target = 1;
-            """
-        ).df()
+            """,
+            params={"timedelta": self.timedelta},
+            event_attendees=event_attendees,
+            timestamp_df=timestamp_df,
+        )
 
         if eval_timestamp_len == 1:
             df = df[df.timestamp == df.timestamp.max()]
@@ -155,8 +162,8 @@ class UserIgnoreTask(EntityTask):
             new_row = pd.DataFrame({"timestamp": [timestamps[0] - self.timedelta]})
             timestamp_df = pd.concat([new_row, timestamp_df], ignore_index=True)
 
-        df = duckdb.sql(
-            f"""SELECT
+        df = run_query(
+            """SELECT
                     t.timestamp AS timestamp,
                     event_attendees.user_id AS user,
                     CASE
@@ -169,12 +176,15 @@ class UserIgnoreTask(EntityTask):
                     event_attendees
                 ON
                     event_attendees.start_time > t.timestamp AND
-                    event_attendees.start_time <= t.timestamp + INTERVAL '{self.timedelta} days'
+                    event_attendees.start_time <= t.timestamp + $timedelta
                 GROUP BY
                     t.timestamp,
                     event_attendees.user_id
-            """
-        ).df()
+            """,
+            params={"timedelta": self.timedelta},
+            event_attendees=event_attendees,
+            timestamp_df=timestamp_df,
+        )
 
         df = df.dropna(subset=["user"])
         df["user"] = df["user"].astype(int)
@@ -1,7 +1,6 @@
-import duckdb
 import pandas as pd
 
-from relbench.base import Database, EntityTask, Table, TaskType
+from relbench.base import Database, EntityTask, Table, TaskType, run_query
 from relbench.metrics import accuracy, average_precision, f1, mae, r2, rmse, roc_auc
 
 
@@ -25,8 +24,8 @@ class DriverPositionTask(EntityTask):
         drivers = db.table_dict["drivers"].df
         races = db.table_dict["races"].df
 
-        df = duckdb.sql(
-            f"""
+        df = run_query(
+            """
                 SELECT
                     t.timestamp as date,
                     dri.driverId as driverId,
@@ -36,7 +35,7 @@ class DriverPositionTask(EntityTask):
                 LEFT JOIN
                     results re
                 ON
-                    re.date <= t.timestamp + INTERVAL '{self.timedelta}'
+                    re.date <= t.timestamp + $timedelta
                     and re.date  > t.timestamp
                 LEFT JOIN
                     drivers dri
@@ -51,8 +50,12 @@ class DriverPositionTask(EntityTask):
                 GROUP BY t.timestamp, dri.driverId
 
             ;
-            """
-        ).df()
+            """,
+            params={"timedelta": self.timedelta},
+            timestamp_df=timestamp_df,
+            results=results,
+            drivers=drivers,
+        )
 
         return Table(
             df=df,
@@ -81,8 +84,8 @@ class DriverDNFTask(EntityTask):
         drivers = db.table_dict["drivers"].df
         races = db.table_dict["races"].df
 
-        df = duckdb.sql(
-            f"""
+        df = run_query(
+            """
                 SELECT
                     t.timestamp as date,
                     dri.driverId as driverId,
@@ -92,7 +95,7 @@ class DriverDNFTask(EntityTask):
                 LEFT JOIN
                     results re
                 ON
-                    re.date <= t.timestamp + INTERVAL '{self.timedelta}'
+                    re.date <= t.timestamp + $timedelta
                     and re.date  > t.timestamp
                 LEFT JOIN
                     drivers dri
@@ -107,8 +110,12 @@ class DriverDNFTask(EntityTask):
                 GROUP BY t.timestamp, dri.driverId
 
             ;
-            """
-        ).df()
+            """,
+            params={"timedelta": self.timedelta},
+            timestamp_df=timestamp_df,
+            results=results,
+            drivers=drivers,
+        )
 
         return Table(
             df=df,
@@ -137,8 +144,8 @@ class DriverTop3Task(EntityTask):
         qualifying = db.table_dict["qualifying"].df
         drivers = db.table_dict["drivers"].df
 
-        df = duckdb.sql(
-            f"""
+        df = run_query(
+            """
                 SELECT
                     t.timestamp as date,
                     dri.driverId as driverId,
@@ -151,7 +158,7 @@ class DriverTop3Task(EntityTask):
                 LEFT JOIN
                     qualifying qu
                 ON
-                    qu.date <= t.timestamp + INTERVAL '{self.timedelta}'
+                    qu.date <= t.timestamp + $timedelta
                     and qu.date > t.timestamp
                 LEFT JOIN
                     drivers dri
@@ -166,8 +173,12 @@ class DriverTop3Task(EntityTask):
                 GROUP BY t.timestamp, dri.driverId
 
             ;
-            """
-        ).df()
+            """,
+            params={"timedelta": self.timedelta},
+            timestamp_df=timestamp_df,
+            qualifying=qualifying,
+            drivers=drivers,
+        )
 
         df["qualifying"] = df["qualifying"].astype("int64")
 
@@ -1,7 +1,13 @@
-import duckdb
 import pandas as pd
 
-from relbench.base import Database, EntityTask, RecommendationTask, Table, TaskType
+from relbench.base import (
+    Database,
+    EntityTask,
+    RecommendationTask,
+    Table,
+    TaskType,
+    run_query,
+)
 from relbench.metrics import (
     accuracy,
     average_precision,
@@ -35,8 +41,8 @@ class UserItemPurchaseTask(RecommendationTask):
         transactions = db.table_dict["transactions"].df
         timestamp_df = pd.DataFrame({"timestamp": timestamps})
 
-        df = duckdb.sql(
-            f"""
+        df = run_query(
+            """
             SELECT
                 t.timestamp,
                 transactions.customer_id,
@@ -47,12 +53,15 @@ class UserItemPurchaseTask(RecommendationTask):
                 transactions
             ON
                 transactions.t_dat > t.timestamp AND
-                transactions.t_dat <= t.timestamp + INTERVAL '{self.timedelta} days'
+                transactions.t_dat <= t.timestamp + $timedelta
             GROUP BY
                 t.timestamp,
                 transactions.customer_id
-            """
-        ).df()
+            """,
+            params={"timedelta": self.timedelta},
+            transactions=transactions,
+            timestamp_df=timestamp_df,
+        )
 
         return Table(
             df=df,
@@ -81,8 +90,8 @@ class UserChurnTask(EntityTask):
         transactions = db.table_dict["transactions"].df
         timestamp_df = pd.DataFrame({"timestamp": timestamps})
 
-        df = duckdb.sql(
-            f"""
+        df = run_query(
+            """
             SELECT
                 timestamp,
                 customer_id,
@@ -93,7 +102,7 @@ class UserChurnTask(EntityTask):
                         WHERE
                             transactions.customer_id = customer.customer_id AND
                             t_dat > timestamp AND
-                            t_dat <= timestamp + INTERVAL '{self.timedelta}'
+                            t_dat <= timestamp + $timedelta
                     ) AS INTEGER
                 ) AS churn
             FROM
@@ -105,11 +114,15 @@ class UserChurnTask(EntityTask):
                     FROM transactions
                     WHERE
                         transactions.customer_id = customer.customer_id AND
-                        t_dat > timestamp - INTERVAL '{self.timedelta}' AND
+                        t_dat > timestamp - $timedelta AND
                         t_dat <= timestamp
                 )
-            """
-        ).df()
+            """,
+            params={"timedelta": self.timedelta},
+            customer=customer,
+            transactions=transactions,
+            timestamp_df=timestamp_df,
+        )
 
         return Table(
             df=df,
@@ -136,8 +149,8 @@ class ItemSalesTask(EntityTask):
         timestamp_df = pd.DataFrame({"timestamp": timestamps})
         article = db.table_dict["article"].df
 
-        df = duckdb.sql(
-            f"""
+        df = run_query(
+            """
             SELECT
                 timestamp,
                 article_id,
@@ -153,10 +166,14 @@ class ItemSalesTask(EntityTask):
                     WHERE
                         transactions.article_id = article.article_id AND
                         t_dat > timestamp AND
-                        t_dat <= timestamp + INTERVAL '{self.timedelta}'
+                        t_dat <= timestamp + $timedelta
                 )
-            """
-        ).df()
+            """,
+            params={"timedelta": self.timedelta},
+            transactions=transactions,
+            timestamp_df=timestamp_df,
+            article=article,
+        )
 
         return Table(
             df=df,
@@ -1,7 +1,13 @@
-import duckdb
 import pandas as pd
 
-from relbench.base import Database, EntityTask, RecommendationTask, Table, TaskType
+from relbench.base import (
+    Database,
+    EntityTask,
+    RecommendationTask,
+    Table,
+    TaskType,
+    run_query,
+)
 from relbench.metrics import (
     accuracy,
     average_precision,
@@ -36,8 +42,8 @@ class UserEngagementTask(EntityTask):
         posts = db.table_dict["posts"].df
         users = db.table_dict["users"].df
 
-        df = duckdb.sql(
-            f"""
+        df = run_query(
+            """
             WITH
             ALL_ENGAGEMENT AS (
                 SELECT
@@ -62,39 +68,67 @@ class UserEngagementTask(EntityTask):
                     comments c
             ),
 
+            FIRST_ENGAGEMENT AS (
+                SELECT
+                    a.userid,
+                    MIN(a.creationdate) AS first_engagement
+                FROM
+                    all_engagement a
+                GROUP BY
+                    a.userid
+            ),
+
             ACTIVE_USERS AS (
-                 SELECT
+                SELECT
+                    t.timestamp,
+                    u.id
+                FROM
+                    timestamp_df t
+                JOIN
+                    first_engagement f
+                ON
+                    f.first_engagement <= t.timestamp
+                JOIN
+                    users u
+                ON
+                    u.id = f.userid
+                WHERE
+                    u.id != -1
+            ),
+
+            FUTURE_ENGAGEMENT AS (
+                SELECT DISTINCT
                     t.timestamp,
-                    u.id,
-                    count(distinct a.id) as n_engagement
-                FROM timestamp_df t
-                CROSS JOIN users u
-                LEFT JOIN all_engagement a
-                ON u.id = a.UserId
-                    and a.CreationDate <= t.timestamp
-                WHERE u.id != -1
-                GROUP BY t.timestamp, u.id
-             )
+                    a.userid
+                FROM
+                    timestamp_df t
+                JOIN
+                    all_engagement a
+                ON
+                    a.CreationDate > t.timestamp AND
+                    a.CreationDate <= t.timestamp + $timedelta
+            )
                 SELECT
                     u.timestamp,
                     u.id as OwnerUserId,
-                    IF(count(distinct a.id) >= 1, 1, 0) as contribution
+                    IF(f.userid IS NOT NULL, 1, 0) as contribution
                 FROM
                     active_users u
                 LEFT JOIN
-                    all_engagement a
+                    future_engagement f
                 ON
-                    u.id = a.UserId AND
-                    a.CreationDate > u.timestamp AND
-                    a.CreationDate <= u.timestamp + INTERVAL '{self.timedelta}'
-                where
-                    u.n_engagement >= 1
-                GROUP BY
-                    u.timestamp, u.id
+                    u.id = f.userid AND
+                    u.timestamp = f.timestamp
             ;
 
-            """
-        ).df()
+            """,
+            params={"timedelta": self.timedelta},
+            timestamp_df=timestamp_df,
+            comments=comments,
+            votes=votes,
+            posts=posts,
+            users=users,
+        )
 
         return Table(
             df=df,
@@ -121,8 +155,8 @@ class PostVotesTask(EntityTask):
         votes = db.table_dict["votes"].df
         posts = db.table_dict["posts"].df
 
-        df = duckdb.sql(
-            f"""
+        df = run_query(
+            """
             SELECT
                 t.timestamp,
                 p.id AS PostId,
@@ -141,15 +175,19 @@ class PostVotesTask(EntityTask):
             ON
                 p.id = v.PostId AND
                 v.CreationDate > t.timestamp AND
-                v.CreationDate <= t.timestamp + INTERVAL '{self.timedelta}' AND
+                v.CreationDate <= t.timestamp + $timedelta AND
                 v.votetypeid = 2
             GROUP BY
                 t.timestamp,
                 p.id
             ;
 
-            """
-        ).df()
+            """,
+            params={"timedelta": self.timedelta},
+            timestamp_df=timestamp_df,
+            votes=votes,
+            posts=posts,
+        )
 
         return Table(
             df=df,
@@ -175,13 +213,26 @@ class UserBadgeTask(EntityTask):
         users = db.table_dict["users"].df
         badges = db.table_dict["badges"].df
 
-        df = duckdb.sql(
-            f"""
+        df = run_query(
+            """
+            WITH
+            FUTURE_BADGES AS (
+                SELECT DISTINCT
+                    t.timestamp,
+                    b.UserId
+                FROM
+                    timestamp_df t
+                JOIN
+                    badges b
+                ON
+                    b.Date > t.timestamp AND
+                    b.Date <= t.timestamp + $timedelta
+            )
             SELECT
                 t.timestamp,
                 u.Id as UserId,
             CASE WHEN
-                COUNT(b.Id) >= 1 THEN 1 ELSE 0 END AS WillGetBadge
+                fb.UserId IS NOT NULL THEN 1 ELSE 0 END AS WillGetBadge
             FROM
                 timestamp_df t
             LEFT JOIN
@@ -189,16 +240,16 @@ class UserBadgeTask(EntityTask):
             ON
                 u.CreationDate <= t.timestamp
             LEFT JOIN
-                badges b
+                future_badges fb
             ON
-                u.Id = b.UserID
-                AND b.Date > t.timestamp
-                AND b.Date <= t.timestamp + INTERVAL '{self.timedelta}'
-            GROUP BY
-                t.timestamp,
-                u.Id
-            """
-        ).df()
+                u.Id = fb.UserId AND
+                t.timestamp = fb.timestamp
+            """,
+            params={"timedelta": self.timedelta},
+            timestamp_df=timestamp_df,
+            users=users,
+            badges=badges,
+        )
 
         # remove any IderId rows that are NaN
         df = df.dropna(subset=["UserId"])
@@ -239,8 +290,8 @@ class UserPostCommentTask(RecommendationTask):
         posts = db.table_dict["posts"].df
         comments = db.table_dict["comments"].df
 
-        df = duckdb.sql(
-            f"""
+        df = run_query(
+            """
             SELECT
                 t.timestamp,
                 c.UserId as UserId,
@@ -256,7 +307,7 @@ class UserPostCommentTask(RecommendationTask):
             ON
                 p.id = c.PostId AND
                 c.CreationDate > t.timestamp AND
-                c.CreationDate <= t.timestamp + INTERVAL '{self.timedelta} days'
+                c.CreationDate <= t.timestamp + $timedelta
             WHERE
                 c.UserId is not null AND
                 p.owneruserid != -1 AND
@@ -264,8 +315,12 @@ class UserPostCommentTask(RecommendationTask):
             GROUP BY
                 t.timestamp,
                 c.UserId
-            """
-        ).df()
+            """,
+            params={"timedelta": self.timedelta},
+            timestamp_df=timestamp_df,
+            posts=posts,
+            comments=comments,
+        )
 
         return Table(
             df=df,
@@ -299,8 +354,8 @@ class PostPostRelatedTask(RecommendationTask):
         posts = db.table_dict["posts"].df
         postLinks = db.table_dict["postLinks"].df
 
-        df = duckdb.sql(
-            f"""
+        df = run_query(
+            """
                 SELECT
                     t.timestamp,
                     pl.PostId as PostId,
@@ -311,7 +366,7 @@ class PostPostRelatedTask(RecommendationTask):
                     postLinks pl
                 ON
                     pl.CreationDate > t.timestamp AND
-                    pl.CreationDate <= t.timestamp + INTERVAL '{self.timedelta} days'
+                    pl.CreationDate <= t.timestamp + $timedelta
                 LEFT JOIN
                     posts p1
                 ON
@@ -328,8 +383,12 @@ class PostPostRelatedTask(RecommendationTask):
                 GROUP BY
                     t.timestamp,
                     pl.PostId;
-            """
-        ).df()
+            """,
+            params={"timedelta": self.timedelta},
+            timestamp_df=timestamp_df,
+            posts=posts,
+            postLinks=postLinks,
+        )
 
         return Table(
             df=df,
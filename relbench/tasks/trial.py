@@ -1,7 +1,13 @@
-import duckdb
 import pandas as pd
 
-from relbench.base import Database, EntityTask, RecommendationTask, Table, TaskType
+from relbench.base import (
+    Database,
+    EntityTask,
+    RecommendationTask,
+    Table,
+    TaskType,
+    run_query,
+)
 from relbench.metrics import (
     accuracy,
     average_precision,
@@ -33,8 +39,8 @@ class StudyOutcomeTask(EntityTask):
         outcomes = db.table_dict["outcomes"].df
         outcome_analyses = db.table_dict["outcome_analyses"].df
 
-        df = duckdb.sql(
-            f"""
+        df = run_query(
+            """
             WITH TRIAL_INFO AS (
                 SELECT
                     oa.nct_id,
@@ -63,11 +69,16 @@ class StudyOutcomeTask(EntityTask):
             LEFT JOIN TRIAL_INFO tr
             ON tr.start_date <= t.timestamp
                 and tr.date > t.timestamp
-                and tr.date <= t.timestamp + INTERVAL '{self.timedelta}'
+                and tr.date <= t.timestamp + $timedelta
             WHERE tr.nct_id is not null
             GROUP BY t.timestamp, tr.nct_id;
-            """
-        ).df()
+            """,
+            params={"timedelta": self.timedelta},
+            timestamp_df=timestamp_df,
+            studies=studies,
+            outcomes=outcomes,
+            outcome_analyses=outcome_analyses,
+        )
 
         return Table(
             df=df,
@@ -94,8 +105,8 @@ class StudyAdverseTask(EntityTask):
         reported_event_totals = db.table_dict["reported_event_totals"].df
         studies = db.table_dict["studies"].df
 
-        df = duckdb.sql(
-            f"""
+        df = run_query(
+            """
             WITH TRIAL_INFO AS (
                 SELECT
                     r.nct_id,
@@ -118,11 +129,15 @@ class StudyAdverseTask(EntityTask):
             LEFT JOIN TRIAL_INFO tr
             ON tr.start_date <= t.timestamp
                 and tr.date > t.timestamp
-                and tr.date <= t.timestamp + INTERVAL '{self.timedelta}'
+                and tr.date <= t.timestamp + $timedelta
             WHERE tr.nct_id is not null and tr.subjects_affected is not null
             GROUP BY t.timestamp, tr.nct_id;
-            """
-        ).df()
+            """,
+            params={"timedelta": self.timedelta},
+            timestamp_df=timestamp_df,
+            reported_event_totals=reported_event_totals,
+            studies=studies,
+        )
 
         return Table(
             df=df,
@@ -151,8 +166,8 @@ class SiteSuccessTask(EntityTask):
         studies = db.table_dict["studies"].df
         outcomes = db.table_dict["outcomes"].df
 
-        df = duckdb.sql(
-            f"""
+        df = run_query(
+            """
             WITH TRIAL_INFO AS (
                 SELECT
                     oa.nct_id,
@@ -176,11 +191,16 @@ class SiteSuccessTask(EntityTask):
             LEFT JOIN TRIAL_INFO tr
             LEFT JOIN facility_study fs ON fs.nct_id = tr.nct_id
             ON tr.date > t.timestamp
-                and tr.date <= t.timestamp + INTERVAL '{self.timedelta}'
+                and tr.date <= t.timestamp + $timedelta
             WHERE fs.facility_id is not null
             GROUP BY t.timestamp, fs.facility_id;
-            """
-        ).df()
+            """,
+            params={"timedelta": self.timedelta},
+            timestamp_df=timestamp_df,
+            facility_study=facility_study,
+            outcome_analyses=outcome_analyses,
+            outcomes=outcomes,
+        )
 
         return Table(
             df=df,
@@ -208,8 +228,8 @@ class ConditionSponsorRunTask(RecommendationTask):
         sponsors_studies = db.table_dict["sponsors_studies"].df
         condition_study = db.table_dict["conditions_studies"].df
 
-        df = duckdb.sql(
-            f"""
+        df = run_query(
+            """
             SELECT
                 t.timestamp,
                 cs.condition_id,
@@ -218,10 +238,14 @@ class ConditionSponsorRunTask(RecommendationTask):
             LEFT JOIN condition_study cs
             LEFT JOIN sponsors_studies ss ON ss.nct_id = cs.nct_id
             ON cs.date > t.timestamp
-                and cs.date <= t.timestamp + INTERVAL '{self.timedelta}'
+                and cs.date <= t.timestamp + $timedelta
             GROUP BY t.timestamp, cs.condition_id;
-            """
-        ).df()
+            """,
+            params={"timedelta": self.timedelta},
+            timestamp_df=timestamp_df,
+            sponsors_studies=sponsors_studies,
+            condition_study=condition_study,
+        )
 
         return Table(
             df=df,
@@ -252,8 +276,8 @@ class SiteSponsorRunTask(RecommendationTask):
         sponsors_studies = db.table_dict["sponsors_studies"].df
         facility_study = db.table_dict["facilities_studies"].df
 
-        df = duckdb.sql(
-            f"""
+        df = run_query(
+            """
             SELECT
                 t.timestamp,
                 fs.facility_id,
@@ -262,10 +286,14 @@ class SiteSponsorRunTask(RecommendationTask):
             LEFT JOIN facility_study fs
             LEFT JOIN sponsors_studies ss ON ss.nct_id = fs.nct_id
             ON fs.date > t.timestamp
-                and fs.date <= t.timestamp + INTERVAL '{self.timedelta}'
+                and fs.date <= t.timestamp + $timedelta
             GROUP BY t.timestamp, fs.facility_id;
-            """
-        ).df()
+            """,
+            params={"timedelta": self.timedelta},
+            timestamp_df=timestamp_df,
+            sponsors_studies=sponsors_studies,
+            facility_study=facility_study,
+        )
 
         return Table(
             df=df,
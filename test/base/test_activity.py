@@ -0,0 +1,51 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from relbench.base import ActivityBitmap, Table
+from relbench.datasets.fake import FakeDataset
+from relbench.tasks.amazon import UserChurnTask
+
+
+@pytest.mark.parametrize("unit", ["s", "ms", "us", "ns"])
+def test_activity_bitmap(unit):
+    df = pd.DataFrame(
+        {
+            "user": [0, 2, 2, 3, -1, 5],
+            "time": pd.to_datetime(
+                [
+                    "2020-01-02",
+                    "2020-01-05",
+                    "2020-01-09",
+                    "2020-01-15",
+                    "2020-01-03",
+                    "2020-01-03",
+                ]
+            ).as_unit(unit),
+        }
+    )
+    table = Table(df=df, fkey_col_to_pkey_table={"user": "users"}, time_col="time")
+    bitmap = ActivityBitmap.from_table(
+        table, "user", num_entities=5, granularity="7D", anchor="2020-01-01"
+    )
+    assert bitmap.num_windows == 2
+    assert bitmap.active_at("2020-01-08").tolist() == [0, 2]
+    assert bitmap.active_at("2020-01-15").tolist() == [2, 3]
+    assert bitmap.active_at("2020-01-15", lookback=2).tolist() == [0, 2, 3]
+    assert bitmap.active_at("2019-12-04").tolist() == []
+    with pytest.raises(ValueError):
+        bitmap.active_at("2020-01-10")
+
+
+def test_dataset_activity_bitmap():
+    dataset = FakeDataset()
+    task = UserChurnTask(dataset)
+    bitmap = dataset.get_activity_bitmap("review", "customer_id", task.timedelta)
+    assert (
+        dataset.get_activity_bitmap("review", "customer_id", task.timedelta) is bitmap
+    )
+
+    # Customers with a review in the window before the cutoff are labeled:
+    val_df = task.get_table("val").df
+    active = bitmap.active_at(dataset.val_timestamp)
+    assert np.array_equal(active, np.sort(val_df["customer_id"].unique()))
@@ -0,0 +1,57 @@
+import pandas as pd
+import pytest
+
+from relbench.base import CacheManager, Table, cache_manager
+from relbench.base.cache import sizeof
+from relbench.datasets.fake import FakeDataset
+from relbench.tasks.amazon import UserChurnTask
+
+
+def test_cache_manager_eviction():
+    cache = CacheManager(max_bytes=100)
+    cache.put(("a", 1), "x", nbytes=40)
+    cache.put(("a", 2), "y", nbytes=40)
+    assert cache.get(("a", 1)) == "x"  # ("a", 2) is now least recently used.
+    cache.put(("b", 1), "z", nbytes=40)
+    assert ("a", 2) not in cache
+    assert cache.nbytes == 80
+
+    assert cache.release("a") == 40
+    assert len(cache) == 1
+
+    # Values larger than max_bytes are kept until the next put:
+    with pytest.warns(UserWarning):
+        cache.put(("c", 1), "too large", nbytes=101)
+    assert ("c", 1) in cache and len(cache) == 1
+    assert cache.nbytes == 101
+    cache.put(("a", 1), "x", nbytes=40)
+    assert ("c", 1) not in cache and len(cache) == 1
+    cache.release()
+    assert len(cache) == 0 and cache.nbytes == 0
+
+
+def test_cache_manager_table_size():
+    cache = CacheManager()
+    table = Table(df=pd.DataFrame({"x": range(100)}), fkey_col_to_pkey_table={})
+    cache.put(("table",), table)
+    assert cache.nbytes >= 800
+
+    df = pd.DataFrame({"x": ["a" * 100] * 10000})
+    assert sizeof(df) == pytest.approx(df.memory_usage(deep=True).sum(), rel=0.01)
+
+
+def test_task_release():
+    dataset = FakeDataset()
+    task = UserChurnTask(dataset)
+    train_table = task.get_table("train")
+    assert task.get_table("train") is train_table
+    assert set(task.get_table("train", mask_input_cols=True).df.columns) == {
+        "timestamp",
+        "customer_id",
+    }
+    assert (task, "table", "train") in cache_manager
+
+    task.release()
+    dataset.release()
+    assert (task, "table", "train") not in cache_manager
+    assert (dataset, "db", True) not in cache_manager
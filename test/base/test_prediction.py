@@ -0,0 +1,66 @@
+import numpy as np
+import pandas as pd
+import pyarrow.parquet as pq
+import pytest
+
+from relbench.base import (
+    Table,
+    evaluate_predictions,
+    read_predictions,
+    save_predictions,
+)
+from relbench.datasets.fake import FakeDataset
+from relbench.tasks.amazon import UserChurnTask, UserItemPurchaseTask
+
+
+def test_entity_predictions(tmp_path):
+    task = UserChurnTask(FakeDataset())
+    table = task.get_table("val")
+    pred = np.random.rand(len(table))
+    path = tmp_path / "pred.parquet"
+    save_predictions(task, pred, path, table)
+
+    # rows may be stored in any order
+    df = pd.read_parquet(path).sample(frac=1)
+    df.to_parquet(path, index=False)
+    assert np.allclose(read_predictions(task, path, table, batch_size=7), pred)
+    assert evaluate_predictions(task, path, split="val") == task.evaluate(
+        pred, task.get_table("val", mask_input_cols=False)
+    )
+
+    pq.write_table(pq.read_table(path).slice(1), path)
+    with pytest.raises(ValueError, match="missing predictions"):
+        read_predictions(task, path, table)
+
+
+def test_duplicated_key_predictions(tmp_path):
+    task = UserChurnTask(FakeDataset())
+    table = task.get_table("val")
+    table = Table(
+        df=pd.concat([table.df, table.df.iloc[:3]], ignore_index=True),
+        fkey_col_to_pkey_table=table.fkey_col_to_pkey_table,
+        pkey_col=table.pkey_col,
+        time_col=table.time_col,
+    )
+    pred = np.random.rand(len(table))
+    path = tmp_path / "pred.parquet"
+    save_predictions(task, pred, path, table)
+
+    # rows in the order of the target table are aligned by position
+    assert np.allclose(read_predictions(task, path, table, batch_size=7), pred)
+
+    df = pd.read_parquet(path).sample(frac=1)
+    df.to_parquet(path, index=False)
+    with pytest.raises(ValueError, match="target table contains duplicated"):
+        read_predictions(task, path, table)
+
+
+def test_link_predictions(tmp_path):
+    task = UserItemPurchaseTask(FakeDataset())
+    table = task.get_table("val")
+    pred = np.random.randint(0, 30, size=(len(table), task.eval_k))
+    path = tmp_path / "pred.parquet"
+    save_predictions(task, pred, path, table)
+
+    assert (read_predictions(task, path, table, batch_size=7) == pred).all()
+    assert evaluate_predictions(task, path, split="val") == task.evaluate(pred, table)
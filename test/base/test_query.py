@@ -0,0 +1,17 @@
+import pandas as pd
+
+from relbench.base import get_connection, run_query
+
+
+def test_run_query():
+    timestamp_df = pd.DataFrame({"timestamp": pd.date_range("2020-01-01", periods=3)})
+    df = run_query(
+        "SELECT t.timestamp + $timedelta AS timestamp FROM timestamp_df t",
+        params={"timedelta": pd.Timedelta(days=7)},
+        timestamp_df=timestamp_df,
+    )
+    assert df["timestamp"].tolist() == list(pd.date_range("2020-01-08", periods=3))
+
+    # Data frames are only registered for the duration of the query:
+    tables = get_connection().execute("SHOW TABLES").df()
+    assert "timestamp_df" not in tables["name"].tolist()
@@ -6,3 +6,15 @@ from relbench.base import Table
 def test_table():
     table = Table(df=pd.DataFrame(), fkey_col_to_pkey_table={})
     assert len(table) == 0
+
+
+def test_table_list_column_save_load(tmp_path):
+    df = pd.DataFrame({"src": [0, 1], "dst": [[0, 2], []]})
+    table = Table(df=df, fkey_col_to_pkey_table={"src": "a", "dst": "b"})
+    table.save(tmp_path / "table.parquet")
+
+    out = Table.load(tmp_path / "table.parquet")
+    assert list(out.df.columns) == ["src", "dst"]
+    assert isinstance(out.df["dst"].dtype, pd.ArrowDtype)
+    assert out.df["dst"].tolist() == [[0, 2], []]
+    assert out.df["src"].tolist() == [0, 1]
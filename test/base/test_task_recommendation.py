@@ -0,0 +1,92 @@
+import numpy as np
+import pandas as pd
+
+from relbench.base import Table, cache_manager
+from relbench.base.task_recommendation import _csr_isin, _from_csr, _to_csr
+from relbench.datasets.fake import FakeDataset
+from relbench.tasks.amazon import UserItemPurchaseTask
+
+
+def test_csr_isin():
+    true = [np.array([3, 1]), np.array([], dtype=int), np.array([0, 5, 2])]
+    ptr, values = _to_csr(_from_csr(np.array([0, 2, 2, 5]), np.concatenate(true)))
+    assert ptr.tolist() == [0, 2, 2, 5]
+    assert values.tolist() == [3, 1, 0, 5, 2]
+
+    values = np.array([1, 3, 0, 2, 5])
+    pred = np.array([[1, 2, 3], [1, 3, 0], [5, -1, 7]])
+    pred_isin = _csr_isin(pred, ptr, values, chunk_size=2)
+    expected = np.stack([np.isin(p, t) for p, t in zip(pred, true)])
+    assert (pred_isin == expected).all()
+
+
+def test_explode_dst_entities():
+    task = UserItemPurchaseTask(FakeDataset())
+    df = task.get_table("train").df
+    exploded = df.explode(task.dst_entity_col)
+    assert len(exploded) == sum(len(dst) for dst in df[task.dst_entity_col])
+    assert exploded[task.dst_entity_col].notna().all()
+    merged = exploded.merge(
+        exploded[[task.dst_entity_col]].drop_duplicates(), on=task.dst_entity_col
+    )
+    assert len(merged) == len(exploded)
+
+
+def test_multi_timestamp_evaluate():
+    class Task(UserItemPurchaseTask):
+        timedelta = pd.Timedelta(days=30)
+        num_eval_timestamps = 2
+
+    task = Task(FakeDataset())
+    val_table = task.get_table("val")
+    timestamps = val_table.df[task.time_col].unique()
+    assert len(timestamps) == 2
+
+    pred = np.random.randint(0, 30, size=(len(val_table), task.eval_k))
+    metrics = task.evaluate(pred, val_table)
+    for fn in task.metrics:
+        assert 0 <= metrics[fn.__name__] <= 1
+        for timestamp in timestamps:
+            assert 0 <= metrics[f"{fn.__name__}/{pd.Timestamp(timestamp)}"] <= 1
+
+
+def test_candidate_table(tmp_path):
+    task = UserItemPurchaseTask(FakeDataset(), cache_dir=str(tmp_path))
+    table = task.get_candidate_table("val", num_negatives=5, seed=1)
+    assert (tmp_path / "val_candidates_5_1.parquet").exists()
+
+    ptr, values = _to_csr(table.df[task.candidate_col])
+    expected = _to_csr(
+        task.add_candidates(task.get_table("val"), 5, 1).df["candidates"]
+    )
+    assert (ptr == expected[0]).all() and (values == expected[1]).all()
+
+    for i, dst in enumerate(table.df[task.dst_entity_col]):
+        candidates = values[ptr[i] : ptr[i + 1]]
+        assert len(np.unique(candidates)) == len(candidates)
+        assert np.isin(dst, candidates).all()
+        assert len(candidates) == len(set(dst)) + 5
+
+
+def test_dst_csr_cache():
+    task = UserItemPurchaseTask(FakeDataset())
+    table = task.get_table("val")
+    assert task.get_dst_csr(table) is task.get_dst_csr(table)
+
+    # the entry is recomputed once the table is filtered
+    num_bytes = cache_manager.nbytes
+    table.df = table.df.iloc[:5].reset_index(drop=True)
+    ptr, _ = task.get_dst_csr(table)
+    assert len(ptr) == 6
+    assert cache_manager.nbytes <= num_bytes
+
+    # other tables are not cached
+    other = Table(
+        df=table.df.copy(),
+        fkey_col_to_pkey_table=table.fkey_col_to_pkey_table,
+        time_col=table.time_col,
+    )
+    num_entries = len(cache_manager)
+    assert (task.get_dst_csr(other)[0] == ptr).all()
+    assert len(cache_manager) == num_entries
+    task.release()
@@ -1,7 +1,64 @@
 import copy
+import json
 
+import numpy as np
+import pandas as pd
+import pytest
+
+from relbench.base import Database, EntityTask, Table, TaskType, run_query
 from relbench.datasets.fake import FakeDataset
-from relbench.tasks.amazon import UserChurnTask
+from relbench.metrics import accuracy
+from relbench.tasks.amazon import ItemChurnTask, UserChurnTask, UserLTVTask
+
+
+class ReviewRepeatTask(EntityTask):
+    r"""Whether a customer reviews in a window, for customers who reviewed in
+    one of their two preceding windows with reviews (as in UserRepeatTask)."""
+
+    task_type = TaskType.BINARY_CLASSIFICATION
+    entity_col = "customer_id"
+    entity_table = "customer"
+    time_col = "timestamp"
+    target_col = "target"
+    timedelta = pd.Timedelta(days=30)
+    metrics = [accuracy]
+    independent_windows = False
+
+    def make_table(self, db: Database, timestamps: "pd.Series[pd.Timestamp]") -> Table:
+        df = run_query(
+            """
+            WITH tb AS (
+                SELECT
+                    t.timestamp,
+                    review.customer_id,
+                    MAX(CASE WHEN review.rating >= 3 THEN 1 ELSE 0 END) AS target,
+                    MAX(MAX(CASE WHEN review.rating >= 3 THEN 1 ELSE 0 END)) OVER (
+                        PARTITION BY review.customer_id ORDER BY t.timestamp
+                        ROWS BETWEEN 2 PRECEDING AND 1 PRECEDING
+                    ) AS prev_target
+                FROM
+                    timestamp_df t
+                JOIN
+                    review
+                ON
+                    review.review_time > t.timestamp AND
+                    review.review_time <= t.timestamp + $timedelta
+                GROUP BY
+                    t.timestamp,
+                    review.customer_id
+            )
+            SELECT timestamp, customer_id, target FROM tb WHERE prev_target = 1
+            """,
+            params={"timedelta": self.timedelta},
+            review=db.table_dict["review"].df,
+            timestamp_df=pd.DataFrame({"timestamp": timestamps}),
+        )
+        return Table(
+            df=df,
+            fkey_col_to_pkey_table={self.entity_col: self.entity_table},
+            pkey_col=None,
+            time_col=self.time_col,
+        )
 
 
 def test_fake_reviews_dataset():
@@ -46,3 +103,239 @@ def test_reindex():
             mask = arr < num_pkeys
             arr_indexed = table_indexed.df[fkey_col]
             assert (arr[mask] == arr_indexed[mask]).all()
+
+
+def test_fake_num_entities(tmp_path):
+    dataset = FakeDataset()
+    dataset.cache_dir = str(tmp_path)
+    db = dataset.get_db()
+    num_entities = {name: len(table) for name, table in db.table_dict.items()}
+    assert dataset.num_entities == num_entities
+
+    # Counts are read from the cached parquet files, without loading the db:
+    (tmp_path / "num_entities.json").unlink()
+    dataset = FakeDataset()
+    dataset.cache_dir = str(tmp_path)
+    assert dataset.num_entities == num_entities
+    assert (tmp_path / "num_entities.json").exists()
+
+    # The in-memory db takes precedence, and stale counts are not used:
+    with open(tmp_path / "num_entities.json", "r") as f:
+        meta = json.load(f)
+    meta["num_entities"] = {name: 0 for name in num_entities}
+    with open(tmp_path / "num_entities.json", "w") as f:
+        json.dump(meta, f)
+    dataset = FakeDataset()
+    dataset.cache_dir = str(tmp_path)
+    assert dataset.num_entities == {name: 0 for name in num_entities}
+    dataset = FakeDataset()
+    dataset.cache_dir = str(tmp_path)
+    dataset.get_db()
+    assert dataset.num_entities == num_entities
+
+    meta["num_entities"] = {name: 0 for name in num_entities}
+    meta["db_files"]["review.parquet"][1] += 1
+    with open(tmp_path / "num_entities.json", "w") as f:
+        json.dump(meta, f)
+    dataset = FakeDataset()
+    dataset.cache_dir = str(tmp_path)
+    assert dataset.num_entities == num_entities
+
+
+def test_fake_task_table_streaming(tmp_path):
+    dataset = FakeDataset()
+    table = UserChurnTask(dataset).get_table("train")
+
+    # Labels are streamed to the parquet file, one time window at a time:
+    task = UserChurnTask(dataset, cache_dir=str(tmp_path))
+    task.num_windows_per_chunk = 1
+    streamed_table = task.get_table("train")
+    assert (tmp_path / "train.parquet").exists()
+
+    cols = ["timestamp", "customer_id", "churn"]
+    df = table.df.sort_values(cols).reset_index(drop=True)
+    streamed_df = streamed_table.df.sort_values(cols).reset_index(drop=True)
+    assert df[cols].equals(streamed_df[cols])
+
+
+def test_fake_task_table_streaming_dependent_windows(tmp_path):
+    dataset = FakeDataset()
+    cols = ["timestamp", "customer_id", "target"]
+    df = ReviewRepeatTask(dataset).get_table("train").df
+    df = df[cols].sort_values(cols).reset_index(drop=True)
+    assert df["timestamp"].nunique() > 2
+
+    # Windows that read preceding windows are generated at once:
+    task = ReviewRepeatTask(dataset, cache_dir=str(tmp_path / "dependent"))
+    task.num_windows_per_chunk = 2
+    streamed_df = task.get_table("train").df
+    streamed_df = streamed_df[cols].sort_values(cols).reset_index(drop=True)
+    assert df.equals(streamed_df)
+
+    # Chunking them would drop the rows of the first windows of each chunk:
+    task = ReviewRepeatTask(dataset, cache_dir=str(tmp_path / "independent"))
+    task.num_windows_per_chunk = 2
+    task.independent_windows = True
+    assert len(task.get_table("train").df) < len(df)
+
+
+def test_fake_task_table_streaming_error(tmp_path):
+    class Task(UserChurnTask):
+        num_windows_per_chunk = 1
+
+        def make_table(self, db, timestamps):
+            if timestamps[0] < self.dataset.val_timestamp - 2 * self.timedelta:
+                raise RuntimeError("failed")
+            return super().make_table(db, timestamps)
+
+    with pytest.raises(RuntimeError):
+        Task(FakeDataset(), cache_dir=str(tmp_path)).get_table("train")
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_fake_train_window_policy():
+    dataset = FakeDataset()
+    task = UserChurnTask(dataset)
+    timestamps = task.get_table("train").df["timestamp"].unique()
+
+    task = UserChurnTask(dataset)
+    task.max_train_windows = 2
+    table = task.get_table("train")
+    assert set(table.df["timestamp"]) <= set(sorted(timestamps)[-2:])
+
+    task = UserChurnTask(dataset)
+    task.max_train_windows = 3
+    task.train_window_sampling = "uniform"
+    table = task.get_table("train")
+    assert table.df["timestamp"].max() == timestamps.max()
+    assert table.df["timestamp"].nunique() <= 3
+
+    task = UserChurnTask(dataset)
+    task.train_window_stride = 2
+    table = task.get_table("train")
+    assert set(table.df["timestamp"]) <= set(sorted(timestamps)[::-2])
+
+
+def test_fake_train_window_policy_cache(tmp_path):
+    dataset = FakeDataset()
+    num_rows = len(UserChurnTask(dataset, cache_dir=str(tmp_path)).get_table("train"))
+
+    # Tables of other policies are cached under their own names:
+    task = UserChurnTask(dataset, cache_dir=str(tmp_path))
+    task.max_train_windows = 2
+    assert len(task.get_table("train")) < num_rows
+    assert (tmp_path / "train.parquet").exists()
+    assert (tmp_path / "train_2_recent_1.parquet").exists()
+
+
+def test_fake_train_window_policy_dependent_windows():
+    dataset = FakeDataset()
+    df = ReviewRepeatTask(dataset).get_table("train").df
+
+    # The labels of kept windows do not depend on the policy:
+    task = ReviewRepeatTask(dataset)
+    task.train_window_stride = 2
+    sampled_df = task.get_table("train").df
+    assert sampled_df["timestamp"].nunique() < df["timestamp"].nunique()
+    expected_df = df[df["timestamp"].isin(sampled_df["timestamp"].unique())]
+    cols = ["timestamp", "customer_id", "target"]
+    assert (
+        sampled_df[cols]
+        .sort_values(cols)
+        .reset_index(drop=True)
+        .equals(expected_df[cols].sort_values(cols).reset_index(drop=True))
+    )
+    assert len(sampled_df) > 0
+
+
+def test_fake_labels_at():
+    dataset = FakeDataset()
+    task = UserChurnTask(dataset)
+    val_table = task.get_table("val")
+
+    table = task.labels_at(dataset.val_timestamp)
+    cols = ["customer_id", "churn"]
+    assert (
+        table.df[cols]
+        .sort_values(cols)
+        .reset_index(drop=True)
+        .equals(val_table.df[cols].sort_values(cols).reset_index(drop=True))
+    )
+
+    entities = val_table.df["customer_id"].to_numpy()[:3]
+    table = task.labels_at(dataset.val_timestamp, entities=entities)
+    assert sorted(table.df["customer_id"]) == sorted(entities)
+
+    # Restricting the database to the entities does not change their labels:
+    for task in [UserChurnTask(dataset), ItemChurnTask(dataset), UserLTVTask(dataset)]:
+        full_df = task.labels_at(dataset.val_timestamp).df
+        entities = full_df[task.entity_col].to_numpy()[::2]
+        expected_df = full_df[full_df[task.entity_col].isin(entities)]
+        df = task.labels_at(dataset.val_timestamp, entities=entities).df
+        assert (
+            df.sort_values(task.entity_col)
+            .reset_index(drop=True)
+            .equals(expected_df.sort_values(task.entity_col).reset_index(drop=True))
+        )
+
+
+def test_fake_task_profile(tmp_path):
+    task = UserLTVTask(FakeDataset(), cache_dir=str(tmp_path))
+    task.profile = True
+    task.num_windows_per_chunk = 4
+    table = task.get_table("train")
+
+    report = task.profile_report["train"]
+    assert report["num_rows"] == len(table)
+    assert len(report["queries"]) >= 1
+    assert sum(query["rows_out"] for query in report["queries"]) >= len(table)
+    assert "timestamp_df" in report["queries"][0]["rows_in"]
+    for query in report["queries"]:
+        assert query["peak_memory_increase"] is None or (
+            0 <= query["peak_memory_increase"] <= report["peak_memory_increase"]
+        )
+    assert (tmp_path / "profile.json").exists()
+
+
+def test_fake_binary_evaluate_score_column():
+    task = UserChurnTask(FakeDataset())
+    val_table = task.get_table("val")
+    pred = np.random.default_rng(0).random(len(val_table))
+
+    expected = task.evaluate(pred, val_table)
+    for metrics in [None, [accuracy]]:
+        out = task.evaluate(pred[:, None], val_table, metrics=metrics)
+        for name, value in out.items():
+            assert np.isclose(value, expected[name])
+
+
+def test_fake_churn_activity_bitmap():
+    dataset = FakeDataset()
+    for task_cls in [UserChurnTask, ItemChurnTask]:
+        task = task_cls(dataset)
+        cols = ["timestamp", task.entity_col, "churn"]
+        for split in ["train", "val", "test"]:
+            db = dataset.get_db(upto_test_timestamp=split != "test")
+            timestamps = task._get_timestamps(split, db)
+            bitmap = task._get_activity_bitmap(db, "review", task.entity_col)
+            if split != "test":
+                assert all(bitmap.is_boundary(t) for t in timestamps)
+            df = task.make_table(db, timestamps).df
+            assert len(df) > 0
+
+            # a copy of the database is not cached, so labels are queried with SQL
+            sql_db = copy.copy(db)
+            assert task._get_activity_bitmap(sql_db, "review", task.entity_col) is None
+            sql_df = task.make_table(sql_db, timestamps).df
+            assert (
+                df[cols]
+                .astype({"timestamp": "datetime64[ns]", "churn": int})
+                .sort_values(cols)
+                .reset_index(drop=True)
+                .equals(
+                    sql_df[cols]
+                    .astype({"timestamp": "datetime64[ns]", "churn": int})
+                    .sort_values(cols)
+                    .reset_index(drop=True)
+                )
+            )
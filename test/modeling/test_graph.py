@@ -1,9 +1,13 @@
-from torch_frame import TensorFrame
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from torch_frame import TensorFrame, stype
 from torch_frame.config import TextEmbedderConfig
 from torch_frame.testing.text_embedder import HashTextEmbedder
 
 from relbench.datasets.fake import FakeDataset
 from relbench.modeling.graph import make_pkey_fkey_graph
+from relbench.modeling.text_embedder import CachedTextEmbedder
 from relbench.modeling.utils import get_stype_proposal
 
 
@@ -42,3 +46,99 @@ def test_make_pkey_fkey_graph():
         assert edge_index.size(1) <= data["review"].num_nodes
         assert edge_index[0].max() <= data[src].num_nodes
         assert edge_index[1].max() <= data[dst].num_nodes
+
+
+def test_make_pkey_fkey_graph_num_workers():
+    db = FakeDataset().get_db()
+    text_embedder_cfg = TextEmbedderConfig(HashTextEmbedder(16), batch_size=None)
+
+    data, col_stats_dict = make_pkey_fkey_graph(
+        db, get_stype_proposal(db), text_embedder_cfg=text_embedder_cfg
+    )
+    parallel_data, parallel_col_stats_dict = make_pkey_fkey_graph(
+        db,
+        get_stype_proposal(db),
+        text_embedder_cfg=text_embedder_cfg,
+        num_workers=2,
+    )
+
+    assert parallel_data.node_types == data.node_types
+    assert parallel_data.edge_types == data.edge_types
+    assert parallel_col_stats_dict.keys() == col_stats_dict.keys()
+    for node_type in data.node_types:
+        assert parallel_data[node_type].num_nodes == data[node_type].num_nodes
+    for edge_type in data.edge_types:
+        assert parallel_data[edge_type].edge_index.equal(data[edge_type].edge_index)
+
+
+def test_make_pkey_fkey_graph_cached_text_embedder(tmp_path):
+    db = FakeDataset().get_db()
+    hash_text_embedder = HashTextEmbedder(16)
+    calls = []
+
+    def text_embedder(sentences):
+        calls.append(len(sentences))
+        return hash_text_embedder(sentences)
+
+    data, _ = make_pkey_fkey_graph(
+        db,
+        get_stype_proposal(db),
+        text_embedder_cfg=TextEmbedderConfig(hash_text_embedder, batch_size=None),
+    )
+    for _ in range(2):
+        cached_data, _ = make_pkey_fkey_graph(
+            db,
+            get_stype_proposal(db),
+            text_embedder_cfg=TextEmbedderConfig(
+                CachedTextEmbedder(text_embedder, str(tmp_path), "hash"),
+                batch_size=None,
+            ),
+        )
+        for node_type in data.node_types:
+            for key, value in data[node_type].tf.feat_dict.items():
+                if key == stype.embedding:
+                    assert value.values.equal(
+                        cached_data[node_type].tf.feat_dict[key].values
+                    )
+
+    # texts are embedded once, and only unique texts
+    num_texts = len(CachedTextEmbedder(text_embedder, str(tmp_path), "hash"))
+    assert sum(calls) == num_texts
+
+
+def test_shared_cached_text_embedder(tmp_path):
+    hash_text_embedder = HashTextEmbedder(16)
+    first = CachedTextEmbedder(hash_text_embedder, str(tmp_path), "hash")
+    second = CachedTextEmbedder(hash_text_embedder, str(tmp_path), "hash")
+
+    # both embedders append to the same store
+    first(["a", "b"])
+    second(["c"])
+    first(["d", "c"])
+    assert len(first) == len(second) == 4
+
+    sentences = ["a", "b", "c", "d"]
+    expected = hash_text_embedder(sentences)
+    assert first(sentences).equal(expected)
+    assert second(sentences).equal(expected)
+
+
+def test_concurrent_cached_text_embedder(tmp_path):
+    hash_text_embedder = HashTextEmbedder(16)
+    # both calls embed at the same time, which would time out if the store was
+    # locked while embedding
+    barrier = threading.Barrier(2, timeout=10)
+
+    def text_embedder(sentences):
+        barrier.wait()
+        return hash_text_embedder(sentences)
+
+    embedder = CachedTextEmbedder(text_embedder, str(tmp_path), "hash")
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        out = list(executor.map(embedder, [["a", "c"], ["b", "c"]]))
+
+    # texts embedded by both calls are stored once
+    assert len(embedder) == 3
+    assert out[0].equal(hash_text_embedder(["a", "c"]))
+    assert out[1].equal(hash_text_embedder(["b", "c"]))
+    assert embedder(["a", "b", "c"]).equal(hash_text_embedder(["a", "b", "c"]))
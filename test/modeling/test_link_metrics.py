@@ -0,0 +1,54 @@
+import numpy as np
+import pandas as pd
+import torch
+
+from relbench.datasets.fake import FakeDataset
+from relbench.modeling.metrics import evaluate_link_prediction, link_prediction_map
+from relbench.tasks.amazon import UserItemPurchaseTask
+
+
+def test_evaluate_link_prediction():
+    class Task(UserItemPurchaseTask):
+        timedelta = pd.Timedelta(days=30)
+        num_eval_timestamps = 2
+
+    task = Task(FakeDataset())
+    val_table = task.get_table("val")
+    pred = np.random.randint(0, 30, size=(len(val_table), task.eval_k))
+
+    expected = task.evaluate(pred, val_table)
+    metrics = evaluate_link_prediction(
+        task, torch.from_numpy(pred), val_table, chunk_size=3
+    )
+    assert list(metrics.keys()) == list(expected.keys())
+    for name, value in expected.items():
+        assert np.isclose(metrics[name], value)
+
+    # per group metrics on the device, and bootstrap intervals on the CPU
+    group = np.random.randint(0, 3, size=len(val_table))
+    for kwargs in [dict(group_by=group), dict(bootstrap=10, group_by=group)]:
+        expected = task.evaluate(pred, val_table, **kwargs)
+        metrics = evaluate_link_prediction(
+            task, torch.from_numpy(pred), val_table, **kwargs
+        )
+        assert list(metrics.keys()) == list(expected.keys())
+        for name, value in expected.items():
+            assert np.isclose(metrics[name], value)
+
+    # other metrics take the hit matrix and number of destination nodes
+    def num_hits(pred_isin, dst_count):
+        return pred_isin.sum()
+
+    metrics = evaluate_link_prediction(
+        task, torch.from_numpy(pred), val_table, metrics=[link_prediction_map, num_hits]
+    )
+    assert np.isclose(metrics["link_prediction_map"], expected["link_prediction_map"])
+    assert metrics["num_hits"] == task.evaluate(pred, val_table, [num_hits])["num_hits"]
+
+    ptr, values = task.get_dst_csr(val_table)
+    assert np.isclose(
+        link_prediction_map(
+            torch.from_numpy(pred), torch.from_numpy(ptr), torch.from_numpy(values)
+        ),
+        expected["link_prediction_map"],
+    )
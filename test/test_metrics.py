@@ -1,10 +1,37 @@
 import numpy as np
+import pytest
 
 from relbench.metrics import (
+    BinaryAccumulator,
+    LinkPredictionAccumulator,
+    MultilabelAccumulator,
+    RegressionAccumulator,
+    _regression_kernel,
+    accuracy,
+    auprc,
+    average_precision,
+    binary_classification_metrics,
+    bootstrap_ci,
+    bootstrap_metrics,
+    f1,
+    grouped_metrics,
     link_prediction_map,
+    link_prediction_ndcg,
     link_prediction_precision,
     link_prediction_recall,
-    link_prediction_ndcg,
+    macro_f1,
+    mae,
+    micro_f1,
+    multilabel_auprc_macro,
+    multilabel_auprc_micro,
+    multilabel_auroc_macro,
+    multilabel_auroc_micro,
+    multilabel_classification_metrics,
+    multilabel_f1_macro,
+    multilabel_recall_micro,
+    r2,
+    rmse,
+    roc_auc,
 )
 
 
@@ -21,3 +48,177 @@ def test_link_prediction_metrics():
     assert 0 <= precision <= 1
     assert 0 <= map <= 1
     assert 0 <= ndcg <= 1
+
+
+def test_streaming_accumulators():
+    rng = np.random.default_rng(0)
+    true = rng.integers(0, 2, size=1000)
+    # scores are multiples of 1 / num_bins, so ranking metrics are exact
+    pred = np.round(rng.random(1000) * 0.7 + true * 0.2, 3)
+    acc, other = BinaryAccumulator(num_bins=1000), BinaryAccumulator(num_bins=1000)
+    for start in range(0, 500, 128):
+        acc.update(
+            true[start : min(start + 128, 500)], pred[start : min(start + 128, 500)]
+        )
+    other.update(true[500:], pred[500:])
+    acc.merge(other)
+    out = acc.compute()
+    for fn in [accuracy, f1, roc_auc, average_precision, auprc]:
+        assert np.isclose(out[fn.__name__], fn(true, pred))
+
+    target = rng.normal(size=1000)
+    pred = target + rng.normal(size=1000)
+    acc = RegressionAccumulator()
+    for start in range(0, 1000, 300):
+        acc.update(target[start : start + 300], pred[start : start + 300])
+    out = acc.compute()
+    for fn in [mae, rmse, r2]:
+        assert np.isclose(out[fn.__name__], fn(target, pred))
+
+    # constant targets, as in r2_score
+    acc = RegressionAccumulator()
+    acc.update(np.ones(10), np.ones(10))
+    assert acc.compute()["r2"] == r2(np.ones(10), np.ones(10)) == 1.0
+    acc.update(np.ones(10), np.zeros(10))
+    assert acc.compute()["r2"] == 0.0
+
+    with pytest.raises(ValueError):
+        BinaryAccumulator().update(np.array([0, 1]), np.array([-2.0, 3.0]))
+    assert len(LinkPredictionAccumulator().metrics) == 3
+
+    true = rng.integers(0, 2, size=(1000, 4))
+    pred = np.round(rng.random((1000, 4)) * 0.7 + true * 0.2, 2)
+    acc = MultilabelAccumulator(num_labels=4, num_bins=100)
+    for start in range(0, 1000, 300):
+        acc.update(list(true[start : start + 300]), pred[start : start + 300])
+    out = acc.compute()
+    for fn in [multilabel_auprc_macro, multilabel_auroc_micro, multilabel_f1_macro]:
+        assert np.isclose(out[fn.__name__], fn(list(true), pred))
+
+    pred_isin = rng.integers(0, 2, size=(1000, 10)).astype(bool)
+    dst_count = pred_isin.sum(axis=1) + rng.integers(0, 3, size=1000)
+    acc = LinkPredictionAccumulator([link_prediction_map, link_prediction_ndcg])
+    for start in range(0, 1000, 300):
+        acc.update(pred_isin[start : start + 300], dst_count[start : start + 300])
+    out = acc.compute()
+    for fn in [link_prediction_map, link_prediction_ndcg]:
+        assert np.isclose(out[fn.__name__], fn(pred_isin, dst_count))
+
+
+def test_binary_classification_metrics():
+    rng = np.random.default_rng(0)
+    true = rng.integers(0, 2, size=1000)
+    # include ties among predictions
+    pred = np.round(rng.random(1000) * 0.7 + true * 0.2, 2)
+    out = binary_classification_metrics(true, pred)
+    for fn in [accuracy, f1, roc_auc, average_precision, auprc]:
+        assert np.isclose(out[fn.__name__], fn(true, pred))
+
+
+def test_multilabel_classification_metrics():
+    true = np.random.randint(0, 2, size=(200, 5))
+    # rounded scores to include ties
+    pred = np.random.rand(200, 5).round(1)
+    rows = np.empty(len(true), dtype=object)
+    rows[:] = list(true)
+    out = multilabel_classification_metrics(rows, pred)
+    for fn in [
+        multilabel_auprc_macro,
+        multilabel_auroc_micro,
+        multilabel_f1_macro,
+        multilabel_recall_micro,
+    ]:
+        assert np.isclose(out[fn.__name__], fn(rows, pred))
+        assert np.isclose(out[fn.__name__], fn(true, pred))
+
+
+def test_bootstrap():
+    rng = np.random.default_rng(0)
+    true = rng.integers(0, 2, size=500)
+    pred = rng.random(500) * 0.7 + true * 0.2
+    metrics = [roc_auc, accuracy, f1]
+    samples = bootstrap_metrics(metrics, true, pred, num_samples=100)
+    assert all(len(values) == 100 for values in samples.values())
+    ci = bootstrap_ci(metrics, true, pred, num_samples=100)
+    for fn in metrics:
+        lower, upper = ci[fn.__name__]
+        assert lower <= fn(true, pred) <= upper
+
+    pred_isin = rng.integers(0, 2, size=(500, 10)).astype(bool)
+    dst_count = pred_isin.sum(axis=1) + rng.integers(0, 3, size=500)
+    ci = bootstrap_ci([link_prediction_map], pred_isin, dst_count, num_samples=100)
+    lower, upper = ci["link_prediction_map"]
+    assert lower <= link_prediction_map(pred_isin, dst_count) <= upper
+
+
+def test_weighted_r2():
+    rng = np.random.default_rng(0)
+    # targets with a large mean
+    true = 1e9 + rng.normal(size=200)
+    pred = true + rng.normal(scale=0.5, size=200)
+    weight = rng.poisson(1.0, size=(20, 200)).astype(np.float64)
+    out = _regression_kernel(true, pred, weight)["r2"]
+    for w, value in zip(weight.astype(np.int64), out):
+        index = np.repeat(np.arange(len(true)), w)
+        assert np.isclose(value, r2(true[index], pred[index]))
+
+    # constant targets
+    true = np.zeros(10)
+    pred = rng.random(10)
+    weight = np.ones((1, 10))
+    assert _regression_kernel(true, true, weight)["r2"][0] == r2(true, true) == 1.0
+    assert _regression_kernel(true, pred, weight)["r2"][0] == r2(true, pred) == 0.0
+
+
+def test_grouped_metrics():
+    rng = np.random.default_rng(0)
+    true = rng.integers(0, 2, size=300)
+    pred = rng.random(300)
+    group = rng.choice(["a", "b", "c"], size=300)
+    metrics = [roc_auc, accuracy, auprc]
+    out = grouped_metrics(metrics, true, pred, group)
+    assert list(out.keys()) == ["a", "b", "c"]
+    for label, values in out.items():
+        mask = group == label
+        for fn in metrics:
+            assert np.isclose(values[fn.__name__], fn(true[mask], pred[mask]))
+
+    # regression, with a group of constant targets
+    true = np.where(group == "a", 0.0, rng.random(300))
+    pred = rng.random(300)
+    out = grouped_metrics([mae, rmse, r2], true, pred, group)
+    for label, values in out.items():
+        mask = group == label
+        for fn in [mae, rmse, r2]:
+            assert np.isclose(values[fn.__name__], fn(true[mask], pred[mask]))
+
+    # multiclass, with classes missing from some groups
+    true = np.where(group == "a", rng.integers(0, 2, 300), rng.integers(0, 4, 300))
+    pred = rng.random((300, 4))
+    pred[group == "a", 2:] = 0
+    out = grouped_metrics([macro_f1, micro_f1], true, pred, group)
+    for label, values in out.items():
+        mask = group == label
+        for fn in [macro_f1, micro_f1]:
+            assert np.isclose(values[fn.__name__], fn(true[mask], pred[mask]))
+
+
+def test_grouped_multilabel_metrics():
+    rng = np.random.default_rng(0)
+    true = rng.integers(0, 2, size=(300, 4))
+    pred = np.round(rng.random((300, 4)), 1)
+    group = rng.choice(["a", "b"], size=300)
+    metrics = [
+        multilabel_auprc_macro,
+        multilabel_auprc_micro,
+        multilabel_auroc_macro,
+        multilabel_auroc_micro,
+    ]
+    out = grouped_metrics(metrics, true, pred, group)
+    for label, values in out.items():
+        mask = group == label
+        for fn in metrics:
+            assert np.isclose(values[fn.__name__], fn(true[mask], pred[mask]))
+
+    samples = bootstrap_metrics(metrics, true, pred, num_samples=20)
+    assert all(len(values) == 20 for values in samples.values())